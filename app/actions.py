@@ -25,7 +25,6 @@ except NameError:
 
 import bisect
 import curses.ascii
-import difflib
 import binascii
 import io
 import os
@@ -39,9 +38,12 @@ import app.bookmark
 import app.config
 import app.curses_util
 import app.history
+import app.literal_pattern
 import app.log
 import app.mutator
+import app.parse_cache
 import app.parser
+import app.regex
 import app.selectable
 
 
@@ -59,6 +61,14 @@ class Actions(app.mutator.Mutator):
         self.fileHistory = {}
         self.lastChecksum = None
         self.lastFileSize = 0
+        # The path the dictionary was set up for in the prior spell_check().
+        self.spellCheckPath = None
+        # The (text, flags) of the current find, if it's a literal string (see
+        # find()).
+        self.findLiteral = None
+        # A find waiting on the match index, as (regex, offset, penRow, penCol)
+        # (see index_matches()).
+        self.pendingFind = None
         self.file_filter(u"")
 
     def get_matching_bracket_row_col(self):
@@ -342,9 +352,8 @@ class Actions(app.mutator.Mutator):
         else:
             offset = self.parser.data_offset(self.penRow, self.penCol)
             if offset is None:
-                change = (u"b", self.parser.data[-1])
-            else:
-                change = (u"b", self.parser.data[offset - 1])
+                offset = self.parser.data_length()
+            change = (u"b", self.parser.data_slice(offset - 1, offset))
             self.redo_add_change(change)
             self.redo()
 
@@ -990,6 +999,7 @@ class Actions(app.mutator.Mutator):
         self.rootGrammar = self._determine_root_grammar(
             *os.path.splitext(self.fullPath)
         )
+        self.restore_parse()
         self.parse_grammars()
 
         # Restore all user history.
@@ -999,6 +1009,18 @@ class Actions(app.mutator.Mutator):
         self.selection_all()
         self.edit_paste_lines(tuple(clip))
 
+    def restore_parse(self):
+        """Restore the parse of a large document from the parse cache, if the
+        document is unchanged since it was last parsed."""
+        parser = self.parser
+        if parser.data_length() < app.parse_cache.kMinDocumentLength:
+            return
+        if parser.checksum is None:
+            parser.checksum = app.history.calculate_checksum(
+                self.fullPath, parser.data
+            )
+        self.program.parseCache.load(parser, self.rootGrammar)
+
     def restore_user_history(self):
         """This function restores all stored history of the file into the
         TextBuffer object. If there does not exist a stored history of the file,
@@ -1242,12 +1264,16 @@ class Actions(app.mutator.Mutator):
         row = max(0, min(row, self.parser.row_count() - 1))
         row_width = self.parser.row_width(row)
         col = max(0, min(col, row_width))
-        endCol = col + length
-        inView = self.is_in_view(row, endCol, row, endCol)
+        self.select_range(row, col, row, col + length, mode)
+
+    def select_range(self, row, col, endRow, endCol, mode):
+        """Select from (row, col) to (endRow, endCol), leaving the pen at the
+        start and the marker at the end."""
+        inView = self.is_in_view(endRow, endCol, endRow, endCol)
         self.do_selection_mode(app.selectable.kSelectionNone)
-        self.cursor_move(row - self.penRow, endCol - self.penCol)
+        self.cursor_move(endRow - self.penRow, endCol - self.penCol)
         self.do_selection_mode(mode)
-        self.cursor_move(0, -length)
+        self.cursor_move(row - endRow, col - endCol)
         if not inView:
             self.scroll_to_optimal_scroll_position()
 
@@ -1259,29 +1285,55 @@ class Actions(app.mutator.Mutator):
         app.log.info(searchFor, direction)
         if not len(searchFor):
             self.findRe = None
+            self.findLiteral = None
             self.do_selection_mode(app.selectable.kSelectionNone)
             return
+        text = searchFor
         editorPrefs = self.program.prefs.editor
-        flags = 0
+        # The search runs over the whole document, so have ^ and $ match at
+        # each line (as they did when the search went a line at a time).
+        flags = re.MULTILINE
         flags |= editorPrefs.get(u"findIgnoreCase") and re.IGNORECASE or 0
         flags |= editorPrefs.get(u"findMultiLine") and re.MULTILINE or 0
         flags |= editorPrefs.get(u"findLocale") and re.LOCALE or 0
         flags |= editorPrefs.get(u"findDotAll") and re.DOTALL or 0
         flags |= editorPrefs.get(u"findVerbose") and re.VERBOSE or 0
         flags |= editorPrefs.get(u"findUnicode") and re.UNICODE or 0
-        if not editorPrefs.get(u"findUseRegex"):
-            searchFor = re.escape(searchFor)
-        if editorPrefs.get(u"findWholeWord"):
-            searchFor = r"\b%s\b" % searchFor
-        # app.log.info(searchFor, flags)
-        with warnings.catch_warnings():
-            # Ignore future warning with '[[' regex.
-            warnings.simplefilter("ignore")
-            # The saved re is also used for highlighting.
-            self.findRe = re.compile(searchFor, flags)
-            self.findBackRe = re.compile(
-                u"%s(?!.*%s.*)" % (searchFor, searchFor), flags
-            )
+        isLiteral = not (
+            editorPrefs.get(u"findWholeWord")
+            or flags & (re.VERBOSE | re.LOCALE)
+            or editorPrefs.get(u"findUseRegex")
+            and app.regex.kReRegexSpecial.search(text)
+        )
+        if isLiteral:
+            # Plain text is found with str.find() where that beats a regex.
+            findRe = app.literal_pattern.compile(text, bool(flags & re.IGNORECASE))
+        else:
+            if not editorPrefs.get(u"findUseRegex"):
+                searchFor = re.escape(searchFor)
+            if editorPrefs.get(u"findWholeWord"):
+                searchFor = r"\b%s\b" % searchFor
+            # app.log.info(searchFor, flags)
+            with warnings.catch_warnings():
+                # Ignore future warning with '[[' regex.
+                warnings.simplefilter("ignore")
+                # The saved re is also used for highlighting.
+                findRe = re.compile(searchFor, flags)
+        priorRe = self.findRe
+        prior = self.findLiteral
+        self.findRe = findRe
+        self.findLiteral = None
+        if isLiteral:
+            self.findLiteral = (text, flags)
+            matchIndex = self.parser.matchIndex
+            if (
+                prior is not None
+                and prior[1] == flags
+                and text.startswith(prior[0])
+                and matchIndex.pattern is priorRe
+            ):
+                # Typing more of the text; each match is within a prior match.
+                matchIndex.narrow(findRe, self.parser)
         self.find_current_pattern(direction)
 
     def replace_found(self, replaceWith):
@@ -1302,8 +1354,8 @@ class Actions(app.mutator.Mutator):
             self.edit_paste_data(replaceWith)
 
     def find_plain_text(self, text):
-        searchFor = re.escape(text)
-        self.findRe = re.compile(u"()^" + searchFor)
+        """Find |text| at the start of a line."""
+        self.findRe = app.literal_pattern.compile(text, lineStart=True)
         self.find_current_pattern(0)
 
     def find_replace_flags(self, tokens):
@@ -1351,110 +1403,251 @@ class Actions(app.mutator.Mutator):
             self.set_message(u"An exchange needs three " + separator + u" separators")
             return
         _, find, replace, flags = splitCmd
-        data = self.find_replace_text(find, replace, flags, self.parser.data)
-        self.apply_document_update(data)
+        findRe = re.compile(find, self.find_replace_flags(flags))
+        self.apply_line_diff(self.find_replace_line_diff(findRe, replace))
 
     def find_replace_text(self, find, replace, flags, text):
         flags = self.find_replace_flags(flags)
         return re.sub(find, replace, text, flags=flags)
 
-    def apply_document_update(self, data):
-        lines = self.doDataToLines(self.parser.data)
-        diff = difflib.ndiff(lines, self.doDataToLines(data))
-        ndiff = []
-        counter = 0
-        for i in diff:
-            if i[0] != u" ":
-                if counter:
-                    ndiff.append(counter)
-                    counter = 0
-                if i[0] in [u"+", u"-"]:
-                    ndiff.append(i)
-            else:
-                counter += 1
-        if counter:
-            ndiff.append(counter)
-        if len(ndiff) == 1 and type(ndiff[0]) is type(0):
+    def find_replace_line_diff(self, findRe, replace):
+        """Substitute |replace| for each match of |findRe| in the document.
+
+        The change is built from the match spans as the matches are found
+        (rather than by diffing the old and new lines), so it takes about one
+        pass of the regex.
+
+        Returns:
+            A line diff, as for an "ld" change: a tuple of counts of unchanged
+            lines, and lines to remove ("- " prefix) or add ("+ " prefix).
+        """
+        data = self.parser.data
+        lineDiff = []
+        # Unchanged lines not yet in |lineDiff|.
+        unchanged = 0
+        # The text before |pos| is accounted for.
+        pos = 0
+        # The offsets of the lines with matches that are being replaced; and
+        # the text replacing them, up to |copyFrom|.
+        hunkBegin = hunkEnd = -1
+        out = []
+        copyFrom = 0
+        # As with re.sub(), a |replace| without a backslash is used as is.
+        literal = u"\\" not in replace
+        for found in findRe.finditer(data):
+            begin, end = found.span()
+            if begin > hunkEnd:
+                if hunkBegin >= 0:
+                    out.append(data[copyFrom:hunkEnd])
+                    unchanged = self._add_hunk(
+                        lineDiff, unchanged, data[hunkBegin:hunkEnd], u"".join(out)
+                    )
+                    pos = hunkEnd + 1
+                hunkBegin = data.rfind(u"\n", pos, begin) + 1 or pos
+                unchanged += data.count(u"\n", pos, hunkBegin)
+                out = []
+                copyFrom = hunkBegin
+            out.append(data[copyFrom:begin])
+            out.append(replace if literal else found.expand(replace))
+            copyFrom = end
+            hunkEnd = data.find(u"\n", end)
+            if hunkEnd < 0:
+                hunkEnd = len(data)
+        if hunkBegin >= 0:
+            out.append(data[copyFrom:hunkEnd])
+            unchanged = self._add_hunk(
+                lineDiff, unchanged, data[hunkBegin:hunkEnd], u"".join(out)
+            )
+            pos = hunkEnd + 1
+        if pos <= len(data):
+            unchanged += data.count(u"\n", pos) + 1
+        if unchanged:
+            lineDiff.append(unchanged)
+        return tuple(lineDiff)
+
+    def _add_hunk(self, lineDiff, unchanged, old, new):
+        """Add the lines of |old| and |new| to |lineDiff| (see
+        find_replace_line_diff()).
+
+        Returns:
+            The count of unchanged lines not yet in |lineDiff|.
+        """
+        if old == new:
+            return unchanged + old.count(u"\n") + 1
+        if unchanged:
+            lineDiff.append(unchanged)
+        if u"\n" in old or u"\n" in new:
+            lineDiff.extend([u"- " + line for line in old.split(u"\n")])
+            lineDiff.extend([u"+ " + line for line in new.split(u"\n")])
+        else:
+            lineDiff.append(u"- " + old)
+            lineDiff.append(u"+ " + new)
+        return 0
+
+    def apply_line_diff(self, lineDiff):
+        """Make (and record) an "ld" change. See find_replace_line_diff()."""
+        if len(lineDiff) <= 1 and (not lineDiff or type(lineDiff[0]) is type(0)):
             # Nothing was changed. The only entry is a 'skip these lines'
             self.set_message(u"No matches found")
             return
-        ndiff = tuple(ndiff)
-        if 0:
-            for i in ndiff:
-                app.log.info(i)
-        self.redo_add_change((u"ld", ndiff))
+        # Move the pen to the first changed line (which is where it is in both
+        # the old and new text, so that undo and redo are simple).
+        firstChangedRow = lineDiff[0] if type(lineDiff[0]) is type(0) else 0
+        self.selection_none()
+        self.cursor_move(firstChangedRow - self.penRow, -self.penCol)
+        self.redo_add_change((u"ld", lineDiff))
         self.redo()
+        if not self.is_selection_in_view():
+            self.scroll_to_optimal_scroll_position()
 
     def find_current_pattern(self, direction):
+        """Select the next match of self.findRe, wrapping around the ends of
+        the document.
+
+        The document is searched as a whole (rather than a line at a time), so
+        a match may span lines.
+
+        Args:
+            direction (int): -1 to search up the document, 0 to search from
+                the pen, 1 to search down from just after the pen.
+        """
         localRe = self.findRe
-        offset = self.penCol + direction
-        if direction < 0:
-            localRe = self.findBackRe
         if localRe is None:
             app.log.info(u"localRe is None")
             return
-        # Check part of current line.
-        text = self.parser.row_text(self.penRow)
+        parser = self.parser
+        offset = parser.data_offset(self.penRow, self.penCol)
+        if offset is None:
+            # The pen is past the end of the line.
+            offset = parser.data_offset(self.penRow + 1, 0)
+            if offset is None:
+                offset = parser.data_length()
+        matchIndex = parser.matchIndex
+        matchIndex.set_pattern(localRe)
+        self.pendingFind = None
         if direction >= 0:
-            text = text[offset:]
-        else:
-            text = text[: self.penCol]
-            offset = 0
-        # app.log.info(u'find() searching', repr(text))
-        found = localRe.search(text)
-        rowFound = self.penRow
-        if not found:
-            offset = 0
-            row_count = self.parser.row_count()
-            # To end of file.
-            if direction >= 0:
-                theRange = range(self.penRow + 1, row_count)
+            if direction == 0 and self.program.bg is not None and self.view:
+                # As the search is typed, only the rest of the screen is
+                # searched right away. The rest of the document is searched in
+                # the background (see index_matches()), which stops for the
+                # next key.
+                view = self.view
+                endOffset = parser.data_offset(view.scrollRow + view.rows, 0)
+                if endOffset is None:
+                    endOffset = parser.data_length()
+                found = matchIndex.search(parser, offset, endOffset)
+                if not found and not matchIndex.complete:
+                    self.do_selection_mode(app.selectable.kSelectionNone)
+                    if endOffset >= parser.data_length():
+                        # There's no match after the pen.
+                        self.set_message(u"Find wrapped around.")
+                        offset = 0
+                    self.pendingFind = (localRe, offset, self.penRow, self.penCol)
+                    return
             else:
-                theRange = range(self.penRow - 1, -1, -1)
-            for i in theRange:
-                found = localRe.search(self.parser.row_text(i))
-                if found:
-                    if 0:
-                        for k in found.regs:
-                            app.log.info(u"AAA", k[0], k[1])
-                        app.log.info(u"b found on line", i, repr(found))
-                    rowFound = i
-                    break
+                found = matchIndex.search(parser, offset + direction)
             if not found:
-                # Wrap around to the opposite side of the file.
+                # Wrap around to the top of the file.
                 self.set_message(u"Find wrapped around.")
-                if direction >= 0:
-                    theRange = range(self.penRow)
-                else:
-                    theRange = range(row_count - 1, self.penRow, -1)
-                for i in theRange:
-                    found = localRe.search(self.parser.row_text(i))
-                    if found:
-                        rowFound = i
-                        break
-                if not found:
-                    # Check the rest of the current line
-                    if direction >= 0:
-                        text = self.parser.row_text(self.penRow)
-                    else:
-                        text = self.parser.row_text(self.penRow)[self.penCol :]
-                        offset = self.penCol
-                    found = localRe.search(text)
-                    rowFound = self.penRow
+                found = matchIndex.search(parser)
+        else:
+            # Take the last match that ends before the pen.
+            found = matchIndex.search_back(parser, 0, offset)
+            if not found:
+                # Wrap around to the bottom of the file.
+                self.set_message(u"Find wrapped around.")
+                found = matchIndex.search_back(
+                    parser, offset, parser.data_length()
+                )
         if found:
-            # app.log.info(u'c found on line', rowFound, repr(found.regs))
-            start = found.regs[0][0]
-            end = found.regs[0][1]
-            self.select_text(
-                rowFound,
-                offset + start,
-                end - start,
-                app.selectable.kSelectionCharacter,
+            row, col = self._data_offset_row_col(found[0])
+            endRow, endCol = self._data_offset_row_col(found[1])
+            self.select_range(
+                row, col, endRow, endCol, app.selectable.kSelectionCharacter
             )
             return
         app.log.info(u"find not found")
         self.do_selection_mode(app.selectable.kSelectionNone)
 
+    def index_matches(self, windowLimit=None):
+        """Find the matches of self.findRe, for counting, navigating, and
+        highlighting them.
+
+        Args:
+            windowLimit (int): see MatchIndex.update().
+
+        Returns:
+            Whether all the matches are found.
+        """
+        matchIndex = self.parser.matchIndex
+        matchIndex.set_pattern(self.findRe)
+        pendingFind = self.pendingFind
+        if pendingFind is None:
+            return matchIndex.update(self.parser, self.program.bg, windowLimit)
+        complete = matchIndex.update(
+            self.parser, self.program.bg, windowLimit, pendingFind[1]
+        )
+        self.finish_pending_find()
+        return complete
+
+    def finish_pending_find(self):
+        """Select the match for a find that was waiting on the match index, if
+        it has been found."""
+        localRe, offset, penRow, penCol = self.pendingFind
+        if (
+            localRe is not self.findRe
+            or penRow != self.penRow
+            or penCol != self.penCol
+        ):
+            # The find was replaced (or the pen moved).
+            self.pendingFind = None
+            return
+        matchIndex = self.parser.matchIndex
+        found = matchIndex.next_match(offset)
+        if not found and matchIndex.complete and offset:
+            # Wrap around to the top of the file.
+            self.set_message(u"Find wrapped around.")
+            found = matchIndex.next_match(0)
+        if found:
+            row, col = self._data_offset_row_col(found[0])
+            endRow, endCol = self._data_offset_row_col(found[1])
+            self.select_range(
+                row, col, endRow, endCol, app.selectable.kSelectionCharacter
+            )
+        elif not matchIndex.complete:
+            return
+        self.pendingFind = None
+        # Draw the selection without waiting for the rest of the matches.
+        self.program.request_frame()
+
+    def match_position(self):
+        """Get (n, count) where the pen is at the n'th of |count| matches of
+        self.findRe. |n| is one based, or zero if the pen isn't at a match.
+
+        Returns:
+            (n, count) or None if the matches aren't all found yet.
+        """
+        matchIndex = self.parser.matchIndex
+        if (
+            self.findRe is None
+            or matchIndex.pattern is not self.findRe
+            or not matchIndex.complete
+        ):
+            return None
+        offset = self.parser.data_offset(self.penRow, self.penCol)
+        if offset is None:
+            return 0, len(matchIndex)
+        return matchIndex.position(offset), len(matchIndex)
+
+    def _data_offset_row_col(self, offset):
+        """Like parser.data_offset_row_col() except that the end of the
+        document is the end of the last row (rather than None)."""
+        rowCol = self.parser.data_offset_row_col(offset)
+        if rowCol is None:
+            row = self.parser.row_count() - 1
+            return row, self.parser.row_width(row)
+        return rowCol
+
     def find_again(self):
         """Find the current pattern, searching down the document."""
         self.find_current_pattern(1)
@@ -1762,6 +1955,15 @@ class Actions(app.mutator.Mutator):
         self.findRe = None
         self.view.normalize()
 
+    def append_incoming(self):
+        """Add the text that has arrived from elsewhere (e.g. the results of a
+        project search) to the document.
+
+        Returns:
+            Whether no more text is expected.
+        """
+        return True
+
     def parse_screen_maybe(self):
         begin = self.parser.resumeAtRow
         end = self.view.scrollRow + self.view.rows + 1
@@ -1780,6 +1982,23 @@ class Actions(app.mutator.Mutator):
         end = self.view.scrollRow + self.view.rows + 1
         self.do_parse(self.parser.resumeAtRow, end)
 
+    def spell_check(self, beginRow, endRow):
+        """Find the misspelled words in the parsed rows from |beginRow| up to
+        |endRow|. The results are drawn by the renderer.
+
+        Returns:
+            Whether the rows are checked.
+        """
+        if not self.program.prefs.editor.get(u"spellChecking", True):
+            return True
+        dictionary = self.program.dictionary
+        if self.fullPath != self.spellCheckPath:
+            # The words allowed depend on the path.
+            self.spellCheckPath = self.fullPath
+            self.parser.forget_misspellings()
+        dictionary.set_up_words_for_path(self.fullPath)
+        return self.parser.spell_check(dictionary, beginRow, endRow, self.program.bg)
+
     def do_selection_mode(self, mode):
         if self.selectionMode != mode:
             self.redo_add_change(
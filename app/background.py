@@ -23,13 +23,10 @@ except NameError:
     unicode = str
     unichr = chr
 
-import os
-
 try:
     import Queue as queue
 except ImportError:
     import queue
-import signal
 import sys
 import threading
 import time
@@ -51,12 +48,6 @@ class InstructionQueue(queue.Queue):
             assert isinstance(result[0], unicode), repr(result[0])
         return result[0], result[1]
 
-    def empty(self, *args, **keywords):
-        # This thread yield (time.sleep(0)) dramatically improves Python3
-        # performance. Without this line empty() will be called far too often.
-        time.sleep(0)
-        return queue.Queue.empty(self, *args, **keywords)
-
     def put(self, instruction, message):
         if app.config.strict_debug:
             assert isinstance(instruction, unicode), repr(instruction)
@@ -77,6 +68,10 @@ class BackgroundThread(threading.Thread):
         return not self._fromBackground.empty()
 
     def has_user_event(self):
+        # The long running tasks call this between steps. Yielding here lets
+        # the main thread take the GIL promptly when it has woken up with a
+        # key press (rather than waiting out the interpreter switch interval).
+        time.sleep(0)
         return not self._toBackground.empty()
 
     def put(self, instruction, message):
@@ -85,9 +80,9 @@ class BackgroundThread(threading.Thread):
     def run(self):
         cmdCount = 0
         block = True
-        pid = os.getpid()
-        signalNumber = signal.SIGUSR1
         programWindow = self._programWindow
+        program = programWindow.program
+        wake = program.eventLoop.wake
         while True:
             try:
                 try:
@@ -98,20 +93,26 @@ class BackgroundThread(threading.Thread):
                         return
                     elif instruction == u"cmdList":
                         app.log.info(programWindow, message)
+                        start = time.time()
                         programWindow.execute_command_list(message)
                     else:
                         assert False, instruction
+                    cmdCount += len(message)
+                    if program.should_skip_frame(not self._toBackground.empty()):
+                        # More commands are waiting; draw once they're done.
+                        continue
                     block = programWindow.short_time_slice()
                     programWindow.render()
+                    program.note_frame_time(time.time() - start)
                     # debugging only: programWindow.show_window_hierarchy()
-                    cmdCount += len(message)
-                    programWindow.program.backgroundFrame.set_cmd_count(cmdCount)
+                    program.backgroundFrame.set_cmd_count(cmdCount)
                     self._fromBackground.put(
-                        u"render", programWindow.program.backgroundFrame.grab_frame()
+                        u"render", program.backgroundFrame.grab_frame()
                     )
-                    os.kill(pid, signalNumber)
+                    wake()
+                    # Let the main thread draw the frame before carrying on.
+                    time.sleep(0)
                     # app.profile.end_python_profile(profile)
-                    time.sleep(0)  # See note in has_message().
                     if block or not self._toBackground.empty():
                         continue
                 except queue.Empty:
@@ -119,18 +120,18 @@ class BackgroundThread(threading.Thread):
                 block = programWindow.long_time_slice()
                 if block:
                     programWindow.render()
-                    programWindow.program.backgroundFrame.set_cmd_count(cmdCount)
+                    program.backgroundFrame.set_cmd_count(cmdCount)
                     self._fromBackground.put(
-                        u"render", programWindow.program.backgroundFrame.grab_frame()
+                        u"render", program.backgroundFrame.grab_frame()
                     )
-                    os.kill(pid, signalNumber)
+                    wake()
             except Exception as e:
                 app.log.exception(e)
                 app.log.error("bg thread exception", e)
                 errorType, value, tracebackInfo = sys.exc_info()
                 out = traceback.format_exception(errorType, value, tracebackInfo)
                 self._fromBackground.put(u"exception", out)
-                os.kill(pid, signalNumber)
+                wake()
                 while True:
                     instruction, message = self._toBackground.get()
                     if instruction == u"quit":
@@ -61,8 +61,11 @@ class BufferManager:
                 return fileBuffer
         return None
 
-    def new_text_buffer(self):
-        textBuffer = app.text_buffer.TextBuffer(self.program)
+    def new_text_buffer(self, textBuffer=None):
+        """Track a new (unnamed) text buffer. If |textBuffer| is None, a plain
+        TextBuffer is created."""
+        if textBuffer is None:
+            textBuffer = app.text_buffer.TextBuffer(self.program)
         self.buffers.append(textBuffer)
         app.log.info(textBuffer)
         self.debug_log()
@@ -58,9 +58,12 @@ import app.buffer_manager
 import app.clipboard
 import app.color
 import app.curses_util
+import app.event_loop
 import app.help
 import app.history
 import app.log
+import app.parallel_parse
+import app.parse_cache
 import app.prefs
 import app.program_window
 import app.render
@@ -69,6 +72,12 @@ import app.window
 
 userConsoleMessage = None
 
+# The most input events handled in one batch of commands.
+kMaxBatchSize = 1000
+# While input is arriving faster than frames can be drawn, frames are skipped,
+# but never for longer than this (in seconds).
+kMaxFrameInterval = 0.1
+
 
 def user_message(*args):
     global userConsoleMessage
@@ -97,13 +106,31 @@ class CiProgram:
         # frame (similar to, but not exactly like double buffering video).
         self.backgroundFrame = app.render.Frame()
         self.frontFrame = None
+        # The screen as last drawn (to draw only the cells that change).
+        self.screenGrid = app.render.ScreenGrid()
         self.history = app.history.History(self.prefs.userData.get("historyPath"))
+        self.parseCache = app.parse_cache.ParseCache(
+            self.prefs.userData.get("parseCachePath"),
+            self.prefs.editor["parseCacheMegabytes"] * 1024 * 1024,
+        )
         self.bufferManager = app.buffer_manager.BufferManager(self, self.prefs)
         self.cursesScreen = None
         self.debugMouseEvent = (0, 0, 0, 0, 0)
         self.exiting = False
         self.ch = 0
+        # An input character read ahead of time (or curses.ERR if none).
+        self.nextCh = curses.ERR
         self.bg = None
+        self.eventLoop = None
+        # How long (in seconds) a batch of commands took to execute and draw,
+        # as a moving average.
+        self.frameTime = 0.0
+        # When the last frame was drawn.
+        self.lastFrameTime = 0.0
+        # The number of commands in the last batch.
+        self.batchSize = 0
+        # The number of frames not drawn because more input was waiting.
+        self.skippedFrames = 0
 
     def set_up_curses(self, cursesScreen):
         self.cursesScreen = cursesScreen
@@ -151,6 +178,19 @@ class CiProgram:
             cursesWindow.keypad(1)
             app.window.mainCursesWindow = cursesWindow
 
+    def note_frame_time(self, seconds):
+        """Record that a batch of commands took |seconds| to execute and draw."""
+        self.frameTime += (seconds - self.frameTime) / 4.0
+        self.lastFrameTime = time.time()
+
+    def should_skip_frame(self, inputPending):
+        """Whether to skip drawing a frame (because |inputPending| will change it
+        again soon)."""
+        if inputPending and time.time() - self.lastFrameTime < kMaxFrameInterval:
+            self.skippedFrames += 1
+            return True
+        return False
+
     def command_loop(self):
         # Cache the thread setting.
         useBgThread = self.prefs.editor["useBgThread"]
@@ -160,6 +200,8 @@ class CiProgram:
         self.mainLoopTime = 0
         self.mainLoopTimePeak = 0
         self.cursesWindowGetCh = app.window.mainCursesWindow.getch
+        # Whether a frame was skipped and has yet to be drawn.
+        framePending = False
         if self.prefs.startup["timeStartup"]:
             # When running a timing of the application startup, push a CTRL_Q
             # onto the curses event messages to simulate a full startup with a
@@ -188,9 +230,10 @@ class CiProgram:
             self.mainLoopTime = time.time() - start
             if self.mainLoopTime > self.mainLoopTimePeak:
                 self.mainLoopTimePeak = self.mainLoopTime
-            # Gather several commands into a batch before doing a redraw.
+            # Gather the commands waiting into a batch before doing a redraw.
             # (A performance optimization).
             cmdList = []
+            inputPending = False
             while not len(cmdList):
                 if not useBgThread:
                     (
@@ -204,11 +247,30 @@ class CiProgram:
                     drawList, cursor, frameCmdCount = self.frontFrame
                     self.refresh(drawList, cursor, frameCmdCount)
                     self.frontFrame = None
-                for _ in range(5):
+                gatherStart = time.time()
+                # Take in the input that's already waiting for up to about as
+                # long as a frame takes to draw. While drawing is slow, more
+                # input is handled for each frame.
+                gatherTime = min(self.frameTime, kMaxFrameInterval)
+                while True:
                     eventInfo = None
                     if self.exiting:
                         return
-                    ch = self.get_ch()
+                    if not cmdList:
+                        ch = self.get_waiting_ch()
+                    elif (
+                        len(cmdList) >= kMaxBatchSize
+                        or time.time() - gatherStart > gatherTime
+                    ):
+                        # Leave the rest for the next batch, noting whether
+                        # there is any.
+                        self.nextCh = self.get_waiting_ch()
+                        inputPending = self.nextCh != curses.ERR
+                        break
+                    else:
+                        ch = self.get_waiting_ch()
+                    if ch == curses.ERR:
+                        break
                     # assert isinstance(ch, int), type(ch)
                     if ch == curses.ascii.ESC:
                         # Some keys are sent from the terminal as a sequence of
@@ -279,16 +341,36 @@ class CiProgram:
                             self.debugMouseEvent = curses.getmouse()
                             eventInfo = (self.debugMouseEvent, time.time())
                         cmdList.append((ch, eventInfo))
+                if cmdList:
+                    break
+                if framePending:
+                    # The input stopped, so draw the frame that was skipped.
+                    framePending = False
+                    self.programWindow.short_time_slice()
+                    self.programWindow.render()
+                    self.backgroundFrame.set_cmd_count(cmdCount)
+                elif self.frontFrame is None:
+                    # Sleep until there's input or a new frame.
+                    _, wasWoken = self.eventLoop.wait()
+                    if wasWoken:
+                        if self.bg is not None:
+                            self.process_background_messages()
+                        else:
+                            # A frame was requested (see request_frame()).
+                            framePending = True
             start = time.time()
-            if len(cmdList):
-                if useBgThread:
-                    self.bg.put(u"cmdList", cmdList)
-                else:
-                    self.programWindow.execute_command_list(cmdList)
+            self.batchSize = len(cmdList)
+            if useBgThread:
+                self.bg.put(u"cmdList", cmdList)
+            else:
+                self.programWindow.execute_command_list(cmdList)
+                cmdCount += len(cmdList)
+                framePending = self.should_skip_frame(inputPending)
+                if not framePending:
                     self.programWindow.short_time_slice()
                     self.programWindow.render()
-                    cmdCount += len(cmdList)
                     self.backgroundFrame.set_cmd_count(cmdCount)
+                    self.note_frame_time(time.time() - start)
 
     def process_background_messages(self):
         while self.bg.has_message():
@@ -310,16 +392,20 @@ class CiProgram:
         """Get an input character (or event) from curses."""
         if self.exiting:
             return -1
-        ch = self.cursesWindowGetCh()
-        # The background thread can send a notice at any getch call.
-        while ch == 0:
-            if self.bg is not None:
-                # Hmm, will ch ever equal 0 when self.bg is None?
-                self.process_background_messages()
-            if self.exiting:
-                return -1
-            ch = self.cursesWindowGetCh()
-        return ch
+        if self.nextCh != curses.ERR:
+            ch = self.nextCh
+            self.nextCh = curses.ERR
+            return ch
+        return self.cursesWindowGetCh()
+
+    def get_waiting_ch(self):
+        """Like get_ch(), but doesn't wait for input that hasn't arrived yet."""
+        cursesWindow = app.window.mainCursesWindow
+        cursesWindow.timeout(0)
+        try:
+            return self.get_ch()
+        finally:
+            cursesWindow.timeout(10)
 
     def startup(self):
         """A second init-like function. Called after command line arguments are
@@ -428,6 +514,17 @@ class CiProgram:
         later."""
         app.log.info()
         self.exiting = True
+        if self.eventLoop is not None:
+            # This may be called from the background thread.
+            self.eventLoop.wake()
+
+    def request_frame(self):
+        """Have a frame drawn soon, e.g. when results come in from a search in
+        the process pool. This may be called from any thread."""
+        if self.bg is not None:
+            self.bg.put(u"cmdList", [])
+        elif self.eventLoop is not None:
+            self.eventLoop.wake()
 
     def refresh(self, drawList, cursor, cmdCount):
         """Paint the drawList to the screen in the main thread."""
@@ -435,9 +532,10 @@ class CiProgram:
         # Ask curses to hold the back buffer until curses refresh().
         cursesWindow.noutrefresh()
         curses.curs_set(0)  # Hide cursor.
-        for i in drawList:
+        rows, cols = cursesWindow.getmaxyx()
+        for i in self.screenGrid.update(drawList, rows, cols):
             try:
-                cursesWindow.addstr(*i)
+                cursesWindow.addstr(i[0], i[1], i[2].encode(u"utf-8"), i[3])
             except curses.error:
                 app.log.error("failed to draw", repr(i))
                 pass
@@ -480,8 +578,15 @@ class CiProgram:
         homePath = self.prefs.userData.get("homePath")
         self.make_home_dirs(homePath)
         self.history.load_user_history()
-        app.curses_util.hack_curses_fixes()
         self.startup()
+        # (After startup(), which may replace stdin with the terminal.)
+        cursesWindow = app.window.mainCursesWindow
+        if hasattr(cursesWindow, "test_input_fd"):
+            inputFd = cursesWindow.test_input_fd()
+        else:
+            inputFd = sys.stdin.fileno()
+        self.eventLoop = app.event_loop.EventLoop(inputFd)
+        app.curses_util.hack_curses_fixes(self.eventLoop.wake)
         if self.prefs.editor["useBgThread"]:
             self.bg = app.background.startup_background(self.programWindow)
         if self.prefs.startup.get("profile"):
@@ -498,6 +603,8 @@ class CiProgram:
         if self.prefs.editor["useBgThread"]:
             self.bg.put(u"quit", None)
             self.bg.join()
+        self.eventLoop.close()
+        app.parallel_parse.shut_down()
 
     def set_up_palette(self):
         def apply_palette(name):
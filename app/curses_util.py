@@ -24,17 +24,19 @@ except NameError:
     unicode = str
     unichr = chr
 
+import bisect
 import curses
 import curses.ascii
 import fcntl
 import os
+import re
 import signal
 import struct
 import sys
 import termios
-import unicodedata
 
 import app.config
+import app.unicode_width_table
 
 # Strings are found using the curses_key_name() function.
 # Constants are found using the curses.getch() function.
@@ -363,6 +365,9 @@ def rendered_sub_str(string, beginCol, endCol=None):
         assert isinstance(string, unicode)
         assert isinstance(beginCol, int)
         assert isinstance(endCol, int)
+    if is_single_width(string):
+        beginCol = max(0, beginCol)
+        return string[beginCol:endCol] if endCol > beginCol else u""
     column = 0
     i = 0
     limit = len(string)
@@ -396,54 +401,122 @@ def rendered_sub_str(string, beginCol, endCol=None):
 
 
 if sys.version_info[0] == 2:
+    # Full width characters are double wide as well.
+    _kDoubleWideRanges = sorted(
+        app.unicode_width_table.kWideRanges
+        + app.unicode_width_table.kFullWidthRanges
+    )
+else:
+    _kDoubleWideRanges = app.unicode_width_table.kWideRanges
 
-    def char_width(ch, column, tabWidth=8):
-        if ch == u"\t":
-            return tabWidth - (column % tabWidth)
-        elif ch == u"" or ch < u" ":
-            return 0
-        elif ch < u"ᄀ":
-            # Optimization.
-            return 1
-        elif unicodedata.east_asian_width(ch) in (u"F", r"W"):
-            return 2
-        return 1
-
-    def is_double_width(ch):
-        if ch == u"" or ch < u"ᄀ":
-            # Optimization.
-            return False
-        width = unicodedata.east_asian_width(ch)
-        if width in (u"F", u"W"):
-            return True
-        return False
-
-    def is_zero_width(ch):
-        return ch == u"" or ch < u" "  # or unicodedata.east_asian_width(ch) == "N"
 
+def _make_width_tables(ranges):
+    """Build the lookup tables for char_width().
+
+    Returns:
+      (bmpWidths, astralFirsts, astralLasts) where |bmpWidths| is a bytearray
+      of the width of each character in the Basic Multilingual Plane (except
+      tab) and the astral lists are the sorted (first, last) code points of
+      double wide characters past the BMP.
+    """
+    bmpWidths = bytearray(b"\x01") * 0x10000
+    # Control characters are zero width.
+    bmpWidths[:0x20] = bytearray(0x20)
+    astralFirsts = []
+    astralLasts = []
+    for first, last in ranges:
+        if first < 0x10000:
+            bmpLast = min(last, 0xFFFF)
+            bmpWidths[first : bmpLast + 1] = bytearray(b"\x02") * (
+                bmpLast + 1 - first
+            )
+        if last >= 0x10000:
+            astralFirsts.append(max(first, 0x10000))
+            astralLasts.append(last)
+    return bmpWidths, astralFirsts, astralLasts
+
+
+def _make_double_wide_pattern(ranges):
+    """Make a regex pattern matching one double wide character.
+
+    A large character class is slow to test (especially with code points past
+    the BMP, which are checked range by range). So the pattern first matches
+    any character that might be double wide with a simple range, then confirms
+    it with a look behind for the BMP and the astral ranges separately (the BMP
+    class compiles to a bitmap).
+    """
+    classes = [[], []]
+    for first, last in ranges:
+        # A narrow build can't represent characters past sys.maxunicode.
+        for plane, low, high in ((0, first, 0xFFFF), (1, 0x10000, sys.maxunicode)):
+            low = max(first, low)
+            high = min(last, high)
+            if low <= high:
+                classes[plane].append(
+                    u"%s-%s" % (re.escape(unichr(low)), re.escape(unichr(high)))
+                )
+    lookBehinds = u"|".join(
+        u"(?<=[%s])" % (u"".join(i),) for i in classes if i
+    )
+    return u"[%s-%s](?:%s)" % (
+        re.escape(unichr(ranges[0][0])),
+        re.escape(unichr(sys.maxunicode)),
+        lookBehinds,
+    )
 
-else:
 
-    def char_width(ch, column, tabWidth=8):
-        if ch == u"\t":
-            return tabWidth - (column % tabWidth)
-        elif ch == u"" or ch < u" ":
-            return 0
-        elif ch < u"ᄀ":
-            # Optimization.
-            return 1
-        elif unicodedata.east_asian_width(ch) == u"W":
-            return 2
-        return 1
+_kBmpWidths, _kAstralFirsts, _kAstralLasts = _make_width_tables(_kDoubleWideRanges)
+_kDoubleWidePattern = _make_double_wide_pattern(_kDoubleWideRanges)
+# A double wide character.
+kDoubleWideRe = re.compile(_kDoubleWidePattern)
+# A control character (other than tab, these are zero width).
+kControlRe = re.compile(u"[\x00-\x1f]")
+# A character that is not one column wide (i.e. a tab, a control character, or
+# a double wide character).
+kNotSingleWideRe = re.compile(u"[\x00-\x1f]|" + _kDoubleWidePattern)
+# A run of zero, single, or double wide characters (used by the parser).
+kZeroWideRunRe = re.compile(u"[\x00-\x1f]+")
+kSingleWideRunRe = re.compile(u"(?:(?!%s)[^\x00-\x1f])+" % (_kDoubleWidePattern,))
+kDoubleWideRunRe = re.compile(u"(?:%s)+" % (_kDoubleWidePattern,))
+
+
+def char_width(ch, column, tabWidth=8):
+    """How many columns |ch| uses when rendered at |column|. The |column| only
+    matters for a tab."""
+    if ch == u"\t":
+        return tabWidth - (column % tabWidth)
+    elif ch == u"":
+        return 0
+    code = ord(ch)
+    if code < 0x10000:
+        return _kBmpWidths[code]
+    index = bisect.bisect_right(_kAstralFirsts, code) - 1
+    if index >= 0 and code <= _kAstralLasts[index]:
+        return 2
+    return 1
+
+
+def is_double_width(ch):
+    return ch != u"\t" and char_width(ch, 0) == 2
+
+
+def is_zero_width(ch):
+    return ch == u"" or ch < u" "  # or unicodedata.east_asian_width(ch) == "N"
+
+
+def is_single_width(string):
+    """Whether each character of |string| renders as one column (so that
+    columns and indexes are the same)."""
+    if app.config.strict_debug:
+        assert isinstance(string, unicode)
+    return kNotSingleWideRe.search(string) is None
 
-    def is_double_width(ch):
-        if ch == u"" or ch < u"ᄀ":
-            # Optimization.
-            return False
-        return unicodedata.east_asian_width(ch) == "W"
 
-    def is_zero_width(ch):
-        return ch == u"" or ch < u" "  # or unicodedata.east_asian_width(ch) == "N"
+def double_width_count(string):
+    """The number of double wide characters in |string|."""
+    if app.config.strict_debug:
+        assert isinstance(string, unicode)
+    return len(kDoubleWideRe.findall(string))
 
 
 def floor_col(column, line):
@@ -455,6 +528,8 @@ def floor_col(column, line):
     if app.config.strict_debug:
         assert isinstance(column, int)
         assert isinstance(line, unicode)
+    if is_single_width(line):
+        return max(0, min(column, len(line)))
     floorColumn = 0
     for ch in line:
         width = char_width(ch, floorColumn)
@@ -488,6 +563,13 @@ def column_width(string):
     """
     if app.config.strict_debug:
         assert isinstance(string, unicode)
+    if u"\t" not in string:
+        # Only tabs depend on the column, the rest can be counted in bulk.
+        return (
+            len(string)
+            - len(kControlRe.findall(string))
+            + len(kDoubleWideRe.findall(string))
+        )
     width = 0
     for i in string:
         width += char_width(i, width)
@@ -540,15 +622,19 @@ def terminal_size():
     return h, w
 
 
-def hack_curses_fixes():
-    if sys.platform == u"darwin":
+# Set when the terminal has been resized and curses has yet to be told.
+terminalResized = False
 
-        def window_changed_handler(signum, frame):
-            curses.ungetch(curses.KEY_RESIZE)
 
-        signal.signal(signal.SIGWINCH, window_changed_handler)
+def hack_curses_fixes(wake):
+    """Replace the curses handling of terminal resizes (curses would only notice
+    a resize during getch(), which isn't called while waiting for input). The
+    |wake| function is called to stop the wait."""
 
-    def wake_getch(signum, frame):
-        curses.ungetch(0)
+    def window_changed_handler(signum, frame):
+        global terminalResized
+        terminalResized = True
+        curses.ungetch(curses.KEY_RESIZE)
+        wake()
 
-    signal.signal(signal.SIGUSR1, wake_getch)
+    signal.signal(signal.SIGWINCH, window_changed_handler)
@@ -85,6 +85,16 @@ class DebugWindow(app.window.ActiveWindow):
             ),
             color,
         )
+        self.write_line(
+            u"batch %d frame time %f skipped %d"
+            % (program.batchSize, program.frameTime, program.skippedFrames),
+            color,
+        )
+        self.write_line(
+            u"cells drawn %d total %d"
+            % (program.screenGrid.cellCount, program.screenGrid.totalCellCount),
+            color,
+        )
         self.write_line(
             u"ch %3s %s"
             % (program.ch, app.curses_util.curses_key_name(program.ch) or u"UNKNOWN"),
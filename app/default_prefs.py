@@ -600,10 +600,15 @@ prefs = {
         "optimalCursorCol": 0.98,
         # Ratio of rows: 0 top, 0.5 middle, 1.0 bottom.
         "optimalCursorRow": 0.28,
+        # Lex large documents in chunks across a pool of processes.
+        "parallelParse": False,
         "palette": "default",
         "palette8": "default8",
         "palette16": "default16",
         "palette256": "default256",
+        # The limit on the disk space used to keep the parse of large files
+        # (see "parseCachePath").
+        "parseCacheMegabytes": 256,
         "predictionShowOpenFiles": True,
         "predictionShowAlternateFiles": True,
         "predictionShowRecentFiles": True,
@@ -2000,6 +2005,8 @@ prefs = {
     "userData": {
         "homePath": os.path.expanduser("~/.ci_edit"),
         "historyPath": os.path.join(os.path.expanduser("~/.ci_edit"), "history.dat"),
+        "parseCachePath": os.path.join(os.path.expanduser("~/.ci_edit"), "parse_cache"),
+        "indexPath": os.path.join(os.path.expanduser("~/.ci_edit"), "index"),
     },
 }
 
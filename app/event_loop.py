@@ -0,0 +1,95 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import errno
+import fcntl
+import os
+import select
+
+try:
+    import selectors
+except ImportError:
+    # Python 2.
+    selectors = None
+
+
+class EventLoop:
+    """Sleeps (without polling) until there is terminal input or until another
+    thread (or a signal handler) calls wake().
+
+    The wake ups go through a pipe to this same process (a 'self-pipe'), so
+    that waiting for them and for input is a single select() call.
+    """
+
+    def __init__(self, inputFd):
+        self.inputFd = inputFd
+        self._wakeRead, self._wakeWrite = os.pipe()
+        for fd in (self._wakeRead, self._wakeWrite):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        if selectors is not None:
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(inputFd, selectors.EVENT_READ)
+            self._selector.register(self._wakeRead, selectors.EVENT_READ)
+        else:
+            self._selector = None
+
+    def close(self):
+        if self._selector is not None:
+            self._selector.close()
+        os.close(self._wakeRead)
+        os.close(self._wakeWrite)
+
+    def wait(self, timeout=None):
+        """Wait for input or a wake up (or |timeout| seconds, if not None).
+
+        Returns:
+            (hasInput, wasWoken) tuple of bools.
+        """
+        if self._selector is not None:
+            ready = [key.fd for key, _ in self._selector.select(timeout)]
+        else:
+            try:
+                ready = select.select(
+                    [self.inputFd, self._wakeRead], [], [], timeout
+                )[0]
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                # A signal handler may have called wake(); look again.
+                ready = select.select([self.inputFd, self._wakeRead], [], [], 0)[0]
+        wasWoken = self._wakeRead in ready
+        if wasWoken:
+            # Clear out the wake ups (they may have piled up).
+            try:
+                while os.read(self._wakeRead, 4096):
+                    pass
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+        return self.inputFd in ready, wasWoken
+
+    def wake(self):
+        """Have wait() return. This may be called from any thread or from a
+        signal handler."""
+        try:
+            os.write(self._wakeWrite, b"\0")
+        except OSError as e:
+            # If the pipe is full, wait() already has a wake up coming.
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
@@ -23,12 +23,12 @@ except NameError:
     unichr = chr
 
 import os
-import re
 import time
 
 import app.buffer_file
 import app.config
 import app.controller
+import app.literal_pattern
 import app.string
 
 
@@ -63,7 +63,9 @@ class DirectoryListController(app.controller.Controller):
         fileName = ""
         if len(pathInput) > 0 and pathInput[-1] != os.sep:
             dirPath, fileName = os.path.split(fullPath)
-            self.view.textBuffer.findRe = re.compile("()^" + re.escape(fileName))
+            self.view.textBuffer.findRe = app.literal_pattern.compile(
+                fileName, lineStart=True
+            )
         else:
             self.view.textBuffer.findRe = None
         dirPath = dirPath or "."
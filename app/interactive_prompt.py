@@ -29,6 +29,8 @@ import subprocess
 
 import app.controller
 import app.formatter
+import app.project_grep
+import app.text_buffer
 
 
 def function_test_eq(a, b):
@@ -111,6 +113,8 @@ class InteractivePrompt(app.controller.Controller):
             u"build": self.build_command,
             u"cua": self.change_to_cua_mode,
             u"emacs": self.change_to_emacs_mode,
+            u"grep": self.grep_command,
+            u"index": self.index_command,
             u"make": self.make_command,
             u"open": self.open_command,
             # u'split': self.split_command,  # Experimental wip.
@@ -181,6 +185,61 @@ class InteractivePrompt(app.controller.Controller):
         lines = formattedText.split(u"\n")
         return lines, u"Changed %d lines" % (len(lines),)
 
+    def grep_command(self, cmdLine, view):
+        """Search the files under a directory (the current directory by
+        default) for a regex, e.g. `grep "foo.*bar" src`."""
+        args = kReArgChain.findall(cmdLine)
+        if not app.project_grep.kIsSupported:
+            return {}, u"grep requires Python 3"
+        if len(args) < 2:
+            return {}, u"tip: grep <regex> [<directory>]"
+        pattern = kReUnquote.sub(u"\\2", args[1])
+        root = kReUnquote.sub(u"\\2", args[2]) if len(args) > 2 else u"."
+        if not os.path.isdir(root):
+            return {}, u"Not a directory " + root
+        program = view.program
+        flags = re.MULTILINE
+        if program.prefs.editor[u"findIgnoreCase"]:
+            flags |= re.IGNORECASE
+        search = app.project_grep.ProjectGrep(
+            root,
+            pattern,
+            flags,
+            program.request_frame,
+            program.prefs.userData.get(u"indexPath"),
+        )
+        try:
+            search.start()
+        except re.error as e:
+            return {}, u"Invalid regex: {}".format(e)
+        textBuffer = app.text_buffer.GrepResultsBuffer(program, search)
+        program.bufferManager.new_text_buffer(textBuffer)
+        view.set_text_buffer(textBuffer)
+        message = u"Searching for {} in {}".format(pattern, root)
+        textBuffer.set_message(message)
+        return {}, message
+
+    def index_command(self, cmdLine, view):
+        """Create or update the trigram index of a directory (the current
+        directory by default), which grep then uses to skip files."""
+        if not app.project_grep.kIsSupported:
+            return {}, u"index requires Python 3"
+        args = kReArgChain.findall(cmdLine)
+        root = kReUnquote.sub(u"\\2", args[1]) if len(args) > 1 else u"."
+        if not os.path.isdir(root):
+            return {}, u"Not a directory " + root
+        program = view.program
+        update = app.project_grep.IndexUpdate(
+            root, program.prefs.userData.get(u"indexPath"), program.request_frame
+        )
+        update.start()
+        textBuffer = app.text_buffer.IndexReportBuffer(program, update)
+        program.bufferManager.new_text_buffer(textBuffer)
+        view.set_text_buffer(textBuffer)
+        message = u"Indexing {}".format(root)
+        textBuffer.set_message(message)
+        return {}, message
+
     def make_command(self, cmdLine, view):
         return {}, u"making stuff"
 
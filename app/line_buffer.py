@@ -75,17 +75,21 @@ class LineBuffer:
 
     def do_parse(self, begin, end):
         start = time.time()
-        self.parser.parse(
-            self.program.bg, self.parser.data, self.rootGrammar, begin, end
-        )
+        self.parser.parse(self.program.bg, None, self.rootGrammar, begin, end)
         self.debugUpperChangedRow = self.parser.resumeAtRow
         self.parserTime = time.time() - start
 
     def is_empty(self):
-        return len(self.parser.data) == 0
+        return self.parser.data_length() == 0
 
     def parse_document(self):
+        if self.program.prefs.editor.get(u"parallelParse"):
+            self.parser.parse_in_parallel(self.rootGrammar)
         self.do_parse(self.parser.resumeAtRow, sys.maxsize)
+        parser = self.parser
+        if parser.checksum is not None and parser.resumeAtRow >= parser.row_count():
+            # Keep the (complete) parse of the unchanged document.
+            self.program.parseCache.save(parser, self.rootGrammar)
 
     def set_message(self, *args, **kwargs):
         if not len(args):
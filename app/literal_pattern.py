@@ -0,0 +1,213 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Search for a plain string with str.find() rather than a regex.
+
+A LiteralPattern has the methods of a compiled regex that are used to find
+text (search(), match(), finditer(), and sub()), so it can be used in place of
+one, e.g. as the find pattern of a text buffer (see app.match_index).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+try:
+    unicode
+except NameError:
+    unicode = str
+    unichr = chr
+
+import re
+
+import app.config
+
+# When ignoring case, the text is lowered (into a shadow copy with the same
+# offsets) this many characters at a time, so that finding a nearby match
+# doesn't lower the rest of the document.
+kChunkLength = 1 << 16
+
+kReNonAscii = re.compile(u"[^\x00-\x7f]")
+
+
+def _is_ascii(text):
+    """Whether |text| is all ASCII. Only ASCII is lowered to find text while
+    ignoring case; lower() differs from re.IGNORECASE for some other
+    characters (e.g. a final sigma, or u"\u017f" matching "s")."""
+    return kReNonAscii.search(text) is None
+
+
+def compile(text, ignoreCase=False, lineStart=False):
+    """Get a pattern that finds |text|.
+
+    Args:
+        text (unicode): the string to find.
+        ignoreCase (bool): compare the lowered text.
+        lineStart (bool): only find |text| at the start of a line (as with
+            "^" in a re.MULTILINE regex).
+
+    Returns:
+        A LiteralPattern; or a compiled regex if str.find() can't do the
+        search (e.g. |text| isn't ASCII, when ignoring case) or wouldn't be
+        quicker.
+    """
+    if app.config.strict_debug:
+        assert isinstance(text, unicode)
+    if ignoreCase:
+        if text and _is_ascii(text):
+            return LiteralPattern(text, ignoreCase, lineStart)
+    elif text and lineStart:
+        return LiteralPattern(text, ignoreCase, lineStart)
+    # The re module does a substring search of its own for a regex that begins
+    # with case sensitive text (which is about as quick as str.find()). It
+    # can't for "^" or re.IGNORECASE.
+    return re.compile(
+        (u"^" if lineStart else u"") + re.escape(text),
+        re.MULTILINE | (re.IGNORECASE if ignoreCase else 0),
+    )
+
+
+class LiteralMatch(object):
+    """A found LiteralPattern, like a regex match object."""
+
+    __slots__ = ("string", "_begin", "_end")
+
+    def __init__(self, string, begin, end):
+        self.string = string
+        self._begin = begin
+        self._end = end
+
+    def span(self):
+        return self._begin, self._end
+
+    def start(self):
+        return self._begin
+
+    def end(self):
+        return self._end
+
+    def group(self, index=0):
+        if index:
+            raise IndexError(u"no such group")
+        return self.string[self._begin : self._end]
+
+
+class LiteralPattern(object):
+    """A plain string to find. See compile().
+
+    When ignoring case, |text| must be ASCII. Text that isn't ASCII is
+    searched with the equivalent regex.
+    """
+
+    def __init__(self, text, ignoreCase, lineStart):
+        self.text = text
+        self.ignoreCase = ignoreCase
+        self.lineStart = lineStart
+        self.groups = 0
+        # The equivalent regex, as for a compiled regex.
+        self.pattern = (u"^" if lineStart else u"") + re.escape(text)
+        self.flags = re.MULTILINE | (re.IGNORECASE if ignoreCase else 0)
+        self._needle = text.lower() if ignoreCase else text
+        self._regex = None
+
+    def regex(self):
+        """Get the equivalent compiled regex (e.g. for the cases that
+        str.find() can't handle)."""
+        if self._regex is None:
+            self._regex = re.compile(self.pattern, self.flags)
+        return self._regex
+
+    def search(self, string, pos=0, endpos=None):
+        """Find the first match in string[pos:endpos], like regex.search()."""
+        for found in self.finditer(string, pos, endpos):
+            return found
+        return None
+
+    def match(self, string, pos=0, endpos=None):
+        """Match at |pos|, like regex.match()."""
+        if endpos is None or endpos > len(string):
+            endpos = len(string)
+        end = pos + len(self.text)
+        if end > endpos or (self.lineStart and pos and string[pos - 1] != u"\n"):
+            return None
+        found = string[pos:end]
+        if self.ignoreCase:
+            if not _is_ascii(found):
+                return self.regex().match(string, pos, endpos)
+            found = found.lower()
+        if found == self._needle:
+            return LiteralMatch(string, pos, end)
+        return None
+
+    def finditer(self, string, pos=0, endpos=None):
+        """Yield the (non-overlapping) matches in string[pos:endpos], like
+        regex.finditer()."""
+        if endpos is None or endpos > len(string):
+            endpos = len(string)
+        length = len(self.text)
+        needle = self._needle
+        # With |lineStart|, a match is found by the line break before it. The
+        # start of |string| counts as a line break.
+        shift = 0
+        if self.lineStart:
+            if pos == 0:
+                found = self.match(string, 0, endpos)
+                if found:
+                    yield found
+                    pos = found.end()
+            needle = u"\n" + needle
+            shift = 1
+        # Look for |needle| from |pos|, in the lowered text when ignoring
+        # case. |base| is the offset of |haystack| in |string|.
+        pos = max(0, pos - shift)
+        chunkLength = max(kChunkLength, len(needle) * 2)
+        while pos + len(needle) <= endpos:
+            if self.ignoreCase:
+                chunkEnd = min(pos + chunkLength, endpos)
+                haystack = string[pos:chunkEnd]
+                if not _is_ascii(haystack):
+                    # Let the regex search this chunk. Its matches are as
+                    # long as |text|, so those that begin in the chunk end
+                    # within |length| of it.
+                    for found in self.regex().finditer(
+                        string, pos + shift, min(chunkEnd + length, endpos)
+                    ):
+                        if found.start() >= chunkEnd:
+                            break
+                        yield found
+                        pos = found.end() - shift
+                    if chunkEnd >= endpos:
+                        return
+                    pos = max(pos, chunkEnd - shift)
+                    continue
+                haystack = haystack.lower()
+                base = pos
+            else:
+                chunkEnd = endpos
+                haystack = string
+                base = 0
+            find = haystack.find
+            index = find(needle, pos - base, chunkEnd - base)
+            while index >= 0:
+                begin = base + index + shift
+                yield LiteralMatch(string, begin, begin + length)
+                pos = begin + length - shift
+                index = find(needle, pos - base, chunkEnd - base)
+            if chunkEnd >= endpos:
+                return
+            # The next chunk overlaps this one, for a match that spans them.
+            pos = max(pos, chunkEnd - len(needle) + 1)
+
+    def sub(self, repl, string, count=0):
+        """Replace the matches in |string|, like regex.sub()."""
+        return self.regex().sub(repl, string, count)
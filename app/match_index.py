@@ -0,0 +1,321 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import array
+import bisect
+
+import app.config
+
+# The document is searched a window at a time, so that indexing can stop for a
+# user event (and so that the flat text of the document isn't needed). A match is
+# only trusted if it ends at least |kMatchMargin| characters before the end of
+# the window (or the window reaches the end of the document), since the regex
+# can't see past the window. So a match longer than the margin may be missed (as
+# with the lexer, see app.parser.kLexMargin). The window also holds the margin
+# prior to the search position, for '^', '\b', and look-behind assertions.
+kMatchWindow = 1 << 18
+kMatchMargin = 4096
+# Narrowing the matches (see MatchIndex.narrow()) tries each position within
+# them with the new regex, which costs about as much as searching this many
+# characters of text with it.
+kNarrowRatio = 256
+
+
+class MatchIndex(object):
+    """The (begin, end) offsets of the matches of a regex in a document.
+
+    The matches are found by update() (usually a bit at a time in the
+    background). An edit invalidates the matches from the edit onward. Until
+    the index is complete, search() and search_back() fall back to running
+    the regex where the index can't answer.
+    """
+
+    def __init__(self):
+        # The compiled regex (or None).
+        self.pattern = None
+        # Sorted offsets of the matches found so far. The matches don't
+        # overlap, so |ends| is sorted as well.
+        self.begins = array.array("q")
+        self.ends = array.array("q")
+        # The search resumes at this offset. A match beginning before it is in
+        # the index.
+        self.scannedTo = 0
+        # Whether the whole document has been searched.
+        self.complete = False
+
+    def __len__(self):
+        return len(self.begins)
+
+    def set_pattern(self, pattern):
+        """Index the matches of |pattern| (a compiled regex or None)."""
+        if pattern is not self.pattern:
+            self.pattern = pattern
+            self.invalidate(0)
+
+    def invalidate(self, offset):
+        """Forget the matches that may be changed by an edit at |offset|."""
+        if app.config.strict_debug:
+            assert isinstance(offset, int)
+            assert offset >= 0
+        begins = self.begins
+        ends = self.ends
+        if offset - kMatchMargin >= self.scannedTo:
+            # The edit is well beyond the indexed text.
+            return
+        # A match that ends at the edit may grow, so it's dropped as well.
+        index = bisect.bisect_left(ends, offset)
+        lastEnd = ends[index - 1] if index else 0
+        # A new match may begin before the edit (up to the margin).
+        resumeAt = max(lastEnd, min(offset - kMatchMargin, self.scannedTo))
+        if index < len(begins):
+            resumeAt = min(resumeAt, begins[index])
+        del begins[index:]
+        del ends[index:]
+        if index and begins[-1] == lastEnd == resumeAt:
+            # Don't find the same empty match again.
+            resumeAt += 1
+        self.scannedTo = resumeAt
+        self.complete = False
+
+    def narrow(self, pattern, document):
+        """Change to |pattern|, each match of which begins within a match of
+        the current pattern (e.g. the current pattern is a literal string that
+        |pattern| extends).
+
+        Rather than searching the indexed text again, the matches of |pattern|
+        are looked for within the indexed matches (if there are few enough of
+        them for that to be quicker).
+
+        Args:
+            pattern (regex): a compiled regex.
+            document (Parser): the indexed text (see Parser.data).
+        """
+        begins = self.begins
+        ends = self.ends
+        if self.pattern is None or pattern is self.pattern:
+            self.set_pattern(pattern)
+            return
+        # The positions to try, against the text to search.
+        positionCount = sum(ends) - sum(begins)
+        if positionCount * kNarrowRatio > min(self.scannedTo, document.data_length()):
+            self.set_pattern(pattern)
+            return
+        data = document.data
+        match = pattern.match
+        narrowed = array.array("q")
+        narrowedEnds = array.array("q")
+        lastEnd = 0
+        for begin, end in zip(begins, ends):
+            for pos in range(max(begin, lastEnd), end):
+                found = match(data, pos)
+                if found:
+                    lastEnd = found.end()
+                    narrowed.append(pos)
+                    narrowedEnds.append(lastEnd)
+                    break
+        self.pattern = pattern
+        self.begins = narrowed
+        self.ends = narrowedEnds
+        if not self.complete:
+            self.scannedTo = max(self.scannedTo, lastEnd)
+
+    def update(self, document, bgThread=None, windowLimit=None, findFrom=None):
+        """Continue searching |document| for matches.
+
+        Args:
+            document (Parser): the text to search (see Parser.data_slice()).
+            bgThread (BackgroundThread): stop early if there's a user event.
+            windowLimit (int): stop after searching this many windows.
+            findFrom (int): stop once there's a match that begins at or after
+                this offset.
+
+        Returns:
+            Whether the index is complete.
+        """
+        pattern = self.pattern
+        if pattern is None or self.complete:
+            return True
+        begins = self.begins
+        ends = self.ends
+        dataLength = document.data_length()
+        pos = self.scannedTo
+        windowSize = kMatchWindow
+        while True:
+            windowBegin = max(0, pos - kMatchMargin)
+            windowEnd = min(pos + windowSize, dataLength)
+            if windowEnd == dataLength:
+                trustedEnd = dataLength
+            else:
+                trustedEnd = windowEnd - kMatchMargin
+            window = document.data_slice(windowBegin, windowEnd)
+            nextPos = max(pos, trustedEnd)
+            for found in pattern.finditer(window, pos - windowBegin):
+                begin, end = found.span()
+                begin += windowBegin
+                end += windowBegin
+                if end > trustedEnd:
+                    # The match may extend past the window; look again.
+                    nextPos = begin
+                    break
+                begins.append(begin)
+                ends.append(end)
+                nextPos = max(trustedEnd, end if end > begin else end + 1)
+            if windowEnd == dataLength and nextPos >= trustedEnd:
+                self.scannedTo = dataLength + 1
+                self.complete = True
+                return True
+            if nextPos == pos:
+                # A match (or the margin) fills the window; try a bigger one.
+                windowSize *= 2
+                continue
+            windowSize = kMatchWindow
+            pos = self.scannedTo = nextPos
+            if windowLimit is not None:
+                windowLimit -= 1
+                if windowLimit <= 0:
+                    return False
+            if findFrom is not None and begins and begins[-1] >= findFrom:
+                return False
+            if bgThread is not None and bgThread.has_user_event():
+                return False
+
+    def position(self, offset):
+        """Get the one based index of the match that begins at |offset|, or zero
+        if there's no such match."""
+        index = bisect.bisect_left(self.begins, offset)
+        if index < len(self.begins) and self.begins[index] == offset:
+            return index + 1
+        return 0
+
+    def next_match(self, pos):
+        """Find the first indexed match that begins at or after |pos|.
+
+        Returns:
+            (begin, end) offsets or None.
+        """
+        begins = self.begins
+        index = bisect.bisect_left(begins, pos)
+        if index < len(begins):
+            return begins[index], self.ends[index]
+        return None
+
+    def search(self, document, pos=0, endPos=None):
+        """Find the first match in |document| that begins at or after |pos|.
+
+        Args:
+            document (Parser): the indexed text.
+            pos (int): where to start.
+            endPos (int): if the index can't answer, only search the text up to
+                this offset (rather than the rest of the document).
+
+        Returns:
+            (begin, end) offsets or None. With |endPos|, None may only mean
+            that there's no match before |endPos| (unless the index is
+            complete).
+        """
+        found = self.next_match(pos)
+        if found or self.complete:
+            return found
+        pos = max(pos, self.scannedTo)
+        if endPos is None:
+            found = self.pattern.search(document.data, pos)
+            return found and found.span()
+        # As in update(), the window has a margin on each side.
+        dataLength = document.data_length()
+        windowBegin = max(0, pos - kMatchMargin)
+        windowEnd = min(endPos + kMatchMargin, dataLength)
+        if pos >= windowEnd:
+            return None
+        window = document.data_slice(windowBegin, windowEnd)
+        found = self.pattern.search(window, pos - windowBegin)
+        if found is None:
+            return None
+        begin, end = found.span()
+        if begin + windowBegin >= endPos or (
+            end + windowBegin >= windowEnd and windowEnd < dataLength
+        ):
+            # The match is out of range (or may extend past the window).
+            return None
+        return begin + windowBegin, end + windowBegin
+
+    def search_back(self, document, pos, endPos):
+        """Find the last match that begins at or after |pos| and ends at or
+        before |endPos|.
+
+        Returns:
+            (begin, end) offsets or None.
+        """
+        lowerBound = max(pos, self.scannedTo)
+        if not self.complete and endPos > lowerBound:
+            # Search the text that isn't indexed backward from |endPos|, a
+            # chunk at a time (searching forward within each chunk), so the
+            # cost depends on how far back the match is rather than on the
+            # size of the document.
+            pattern = self.pattern
+            dataLength = document.data_length()
+            chunkEnd = endPos
+            chunkSize = kMatchWindow
+            while chunkEnd > lowerBound:
+                chunkBegin = max(lowerBound, chunkEnd - chunkSize)
+                # Start a margin early, so that the matches line up with
+                # those of a search from further back (e.g. for "a+"). The
+                # text after the chunk is included for matches that begin in
+                # the chunk and end after it (or after |endPos|, since e.g. "$"
+                # doesn't match at |endPos| unless it's the end of a line).
+                searchBegin = max(self.scannedTo, chunkBegin - kMatchMargin)
+                windowBegin = max(0, searchBegin - kMatchMargin)
+                windowEnd = min(chunkEnd + kMatchMargin, dataLength)
+                window = document.data_slice(windowBegin, windowEnd)
+                found = None
+                for k in pattern.finditer(window, searchBegin - windowBegin):
+                    begin, end = k.span()
+                    begin += windowBegin
+                    end += windowBegin
+                    if begin >= chunkEnd:
+                        break
+                    if begin >= chunkBegin and end <= endPos and (
+                        end < windowEnd or windowEnd == dataLength
+                    ):
+                        found = begin, end
+                if found:
+                    return found
+                chunkEnd = chunkBegin
+                chunkSize *= 2
+        # The rest of the matches are in the index.
+        index = bisect.bisect_right(self.ends, endPos) - 1
+        if index >= 0 and self.begins[index] >= pos:
+            return self.begins[index], self.ends[index]
+        return None
+
+    def spans(self, begin, end):
+        """Get the matches that overlap the range [begin, end).
+
+        Returns:
+            A list of (begin, end) offsets; or None if the range isn't indexed
+            yet.
+        """
+        if not (self.complete or end <= self.scannedTo):
+            return None
+        begins = self.begins
+        ends = self.ends
+        out = []
+        index = bisect.bisect_right(ends, begin)
+        while index < len(begins) and begins[index] < end:
+            out.append((begins[index], ends[index]))
+            index += 1
+        return out
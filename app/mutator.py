@@ -48,7 +48,6 @@ class Mutator(app.selectable.Selectable):
         self.oldRedoIndex = 0
         self.debugRedo = False
         self.findRe = None
-        self.findBackRe = None
         self.fileExtension = None
         self.fullPath = u""
         self.fileStat = None
@@ -304,20 +303,7 @@ class Mutator(app.selectable.Selectable):
         elif change[0] == "j":  # Redo join lines (delete \n).
             self.parser.delete_char(self.penRow, self.penCol)
         elif change[0] == "ld":  # Redo line diff.
-            assert False  # Not used.
-            lines = []
-            index = 0
-            for ii in change[1]:
-                if type(ii) is type(0):
-                    for line in self.parser.textLines(index, index + ii):
-                        lines.append(line)
-                    index += ii
-                elif ii[0] == "+":
-                    lines.append(ii[2:])
-                elif ii[0] == "-":
-                    index += 1
-            self.parser.data = lines.join(u"\n")
-            firstChangedRow = change[1][0] if type(change[1][0]) is type(0) else 0
+            self.__apply_line_diff(change[1], u"+", u"-")
         elif change[0] == "m":  # Redo move
             self.__redo_move(change)
         elif change[0] == "ml":  # Redo move lines
@@ -346,6 +332,23 @@ class Mutator(app.selectable.Selectable):
             app.log.info("ERROR: unknown redo.")
         return False
 
+    def __apply_line_diff(self, lineDiff, add, remove):
+        """Replace the document text using a line diff (see
+        Actions.find_replace_line_diff()). The lines prefixed with |add| are
+        inserted and those prefixed with |remove| are dropped."""
+        lines = self.parser.data.split(u"\n")
+        out = []
+        index = 0
+        for ii in lineDiff:
+            if type(ii) is type(0):
+                out.extend(lines[index : index + ii])
+                index += ii
+            elif ii[0] == add:
+                out.append(ii[2:])
+            elif ii[0] == remove:
+                index += 1
+        self.parser.data = u"\n".join(out)
+
     def redo_add_change(self, change):
         """
         Push a change onto the end of the redo_chain. Call redo() to enact the
@@ -476,20 +479,7 @@ class Mutator(app.selectable.Selectable):
         elif change[0] == "j":  # Undo join lines.
             self.parser.insert(self.penRow, self.penCol, u"\n")
         elif change[0] == "ld":  # Undo line diff.
-            assert False  # Not used.
-            lines = []
-            index = 0
-            for ii in change[1]:
-                if type(ii) is type(0):
-                    for line in self.parser.textLines(index, index + ii):
-                        lines.append(line)
-                    index += ii
-                elif ii[0] == "+":
-                    index += 1
-                elif ii[0] == "-":
-                    lines.append(ii[2:])
-            self.parser.data = lines.join(u"\n")
-            firstChangedRow = change[1][0] if type(change[1][0]) is type(0) else 0
+            self.__apply_line_diff(change[1], u"-", u"+")
         elif change[0] == "m":
             self.__undo_move(change)
         elif change[0] == "ml":
@@ -0,0 +1,124 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Speculative lexing of a large document in a process pool.
+
+The document is cut into chunks at line boundaries and each chunk is lexed in
+a worker process as if it began in the root grammar. The Parser stitches the
+results together as its own (sequential) lexing reaches each chunk: where the
+grammar state agrees the chunk's nodes are reused, otherwise the Parser lexes
+rows itself until the states agree (see Parser._use_speculative_chunk()).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+
+import app.config
+import app.log
+
+# The approximate number of characters lexed by each worker task.
+kChunkLength = 1 << 20
+# Smaller documents are lexed in the editor process only.
+kMinDocumentLength = 4 * kChunkLength
+
+# The process pool (created when first needed).
+_pool = None
+# The Prefs in a worker process.
+_workerPrefs = None
+
+
+def _init_worker():
+    global _workerPrefs
+    import app.prefs
+
+    _workerPrefs = app.prefs.Prefs()
+
+
+def _lex_chunk(grammarName, text):
+    """Lex |text| from the root grammar named |grammarName| (in a worker).
+
+    Returns:
+        (grammarIds, begins, priors, visuals, rows) arrays.
+    """
+    import app.parser
+
+    parser = app.parser.Parser(_workerPrefs)
+    parser.data = text
+    parser.lex_all(_workerPrefs.grammars[grammarName])
+    return parser.parse_state()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        processes = max(1, multiprocessing.cpu_count() - 1)
+        # Spawn (rather than fork) so that the workers don't inherit the
+        # threads or terminal state of the editor.
+        context = multiprocessing.get_context("spawn")
+        _pool = context.Pool(processes, initializer=_init_worker)
+        app.log.info("parallel parse pool of", processes)
+    return _pool
+
+
+def shut_down():
+    """Stop the worker processes (if started)."""
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+def chunk_offsets(parser, chunkLength):
+    """Get the offsets of the starts of chunks (which are line starts).
+
+    The first offset is always zero.
+    """
+    offsets = [0]
+    dataLength = parser.data_length()
+    while offsets[-1] + chunkLength < dataLength:
+        begin = offsets[-1] + chunkLength
+        # Extend the chunk to the end of a line.
+        text = parser.data_slice(begin, begin + chunkLength)
+        newline = text.find(u"\n")
+        if newline == -1 or begin + newline + 1 >= dataLength:
+            break
+        offsets.append(begin + newline + 1)
+    return offsets
+
+
+def start(parser, grammar):
+    """Begin lexing the document of |parser| in chunks.
+
+    Returns:
+        A list of (offset, end, result) for each chunk, where |result| is an
+        AsyncResult for _lex_chunk().
+    """
+    if app.config.strict_debug:
+        assert isinstance(grammar, dict)
+    pool = get_pool()
+    offsets = chunk_offsets(parser, kChunkLength)
+    ends = offsets[1:] + [parser.data_length()]
+    return [
+        (
+            begin,
+            end,
+            pool.apply_async(
+                _lex_chunk, (grammar["name"], parser.data_slice(begin, end))
+            ),
+        )
+        for begin, end in zip(offsets, ends)
+    ]
@@ -0,0 +1,168 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+  Keep the parse of large documents on disk so that reopening an unchanged
+  document doesn't lex it all again.
+
+  An entry is keyed by the checksum of the document (see
+  app.history.calculate_checksum()), the root grammar, and the version of the
+  grammar definitions. The least recently used entries are removed when the
+  cache grows past its size limit.
+"""
+
+# For Python 2to3 support.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+import hashlib
+import os
+
+import app.config
+import app.log
+
+# Change this when the stored parse changes (e.g. the node layout).
+kFormatVersion = 1
+# Smaller documents are quick to parse, so they aren't cached.
+kMinDocumentLength = 1 << 20
+
+
+class ParseCache:
+    def __init__(self, cacheDirectory, maxBytes):
+        """
+        Args:
+          cacheDirectory (str): Where to keep the cache files. Pass None to
+            disable the cache.
+          maxBytes (int): The limit on the total size of the cache files.
+        """
+        self.cacheDirectory = cacheDirectory
+        self.maxBytes = maxBytes
+
+    def _cache_path(self, parser, grammar):
+        key = u"%d %s %s %s" % (
+            kFormatVersion,
+            parser.appPrefs.grammarVersion,
+            grammar["name"],
+            parser.checksum,
+        )
+        return os.path.join(
+            self.cacheDirectory,
+            hashlib.sha1(key.encode(u"utf-8")).hexdigest() + u".parse",
+        )
+
+    def load(self, parser, grammar):
+        """
+        Restores the parse of the document in |parser| (with |grammar| as the
+        root grammar), if there is one in the cache.
+
+        Args:
+          parser (Parser): A parser with a checksum for its document.
+          grammar (dict): The root grammar.
+
+        Returns:
+          True if the parse was restored.
+        """
+        if app.config.strict_debug:
+            assert isinstance(grammar, dict)
+        if self.cacheDirectory is None or parser.checksum is None:
+            return False
+        cachePath = self._cache_path(parser, grammar)
+        if not os.path.isfile(cachePath):
+            return False
+        try:
+            with open(cachePath, "rb") as cacheFile:
+                state = pickle.load(cacheFile)
+            parser.restore_parse_state(grammar, state)
+            # Note the use, for the eviction order.
+            os.utime(cachePath, None)
+            app.log.info(u"restored parse from", cachePath)
+            return True
+        except Exception as e:
+            app.log.exception(e)
+            self._remove(cachePath)
+        return False
+
+    def save(self, parser, grammar):
+        """
+        Writes the parse of the document in |parser| to the cache, if it isn't
+        there already. The parse must be complete.
+
+        Args:
+          parser (Parser): A parser with a checksum for its document.
+          grammar (dict): The root grammar.
+
+        Returns:
+          None.
+        """
+        if app.config.strict_debug:
+            assert isinstance(grammar, dict)
+        if self.cacheDirectory is None or parser.checksum is None:
+            return
+        cachePath = self._cache_path(parser, grammar)
+        if os.path.isfile(cachePath):
+            return
+        try:
+            if not os.path.isdir(self.cacheDirectory):
+                os.makedirs(self.cacheDirectory)
+            # Write to a temporary file first, so that a partial write is never
+            # read as an entry.
+            tempPath = u"%s.%d.tmp" % (cachePath, os.getpid())
+            with open(tempPath, "wb") as cacheFile:
+                pickle.dump(
+                    parser.parse_state(), cacheFile, pickle.HIGHEST_PROTOCOL
+                )
+            os.rename(tempPath, cachePath)
+            app.log.info(u"wrote parse to", cachePath)
+        except Exception as e:
+            app.log.exception(e)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the total size of the
+        cache is within |self.maxBytes|.
+
+        Returns:
+          None.
+        """
+        try:
+            entries = []
+            totalBytes = 0
+            for name in os.listdir(self.cacheDirectory):
+                if not name.endswith(u".parse"):
+                    continue
+                cachePath = os.path.join(self.cacheDirectory, name)
+                fileStat = os.stat(cachePath)
+                entries.append((fileStat.st_mtime, fileStat.st_size, cachePath))
+                totalBytes += fileStat.st_size
+        except Exception as e:
+            app.log.exception(e)
+            return
+        entries.sort()
+        for _, fileSize, cachePath in entries:
+            if totalBytes <= self.maxBytes:
+                break
+            self._remove(cachePath)
+            totalBytes -= fileSize
+
+    def _remove(self, cachePath):
+        try:
+            os.remove(cachePath)
+        except Exception as e:
+            app.log.exception(e)
@@ -24,7 +24,10 @@ except NameError:
     unicode = str
     unichr = chr
 
+import array
+import bisect
 import curses.ascii
+import itertools
 import os
 import re
 import sys
@@ -32,13 +35,28 @@ import threading
 import time
 import traceback
 
+try:
+    from itertools import accumulate
+except ImportError:
+    # Python 2.
+    def accumulate(iterable):
+        total = 0
+        for i in iterable:
+            total += i
+            yield total
+
 import third_party.pyperclip as clipboard
 
 import app.config
+import app.curses_util
 import app.log
+import app.match_index
+import app.parallel_parse
+import app.regex
+import app.rope
 import app.selectable
 
-# Keys to tuples within |parserNodes|.
+# Keys to tuples within |parserNodes| (see ParserNodeList).
 # Reference to a prefs grammar dictionary.
 kGrammar = 0
 # The current grammar begins at byte offset |kBegin| in the source data.
@@ -51,6 +69,132 @@ kPrior = 2
 # will start at kBegin = 3, kVisual = 2.
 kVisual = 3
 
+# The lexer scans a window of the document rather than the whole document, so
+# that an edit doesn't require building a flat copy of a large file. A match is
+# only trusted if it ends at least |kLexMargin| characters before the end of
+# the window (or the window reaches the end of the document); otherwise the
+# window is enlarged and the search is repeated.
+kLexWindow = 65536
+kLexMargin = 4096
+# Each search begins at a position within the window (rather than on a copy of
+# the remaining text), so the window also holds a few characters prior to the
+# cursor for '^', '\b', and look-behind assertions to examine.
+kLexLookBehind = 16
+
+# When the old parse is reused after an edit, at most this many rows are
+# spliced in per step (so that a background parse stays interruptible).
+kSpliceRows = 10000
+
+
+# The kPrior value stored in a ParserNodeList for a node that has no prior.
+kNoPrior = -1
+
+# _fast_line_parse() scans the document in blocks of this many characters.
+kLineIndexBlock = 1 << 20
+
+if hasattr(u"", "isascii"):
+
+    def _is_narrow(text):
+        """Whether each character of |text| counts as one column (in
+        _fast_line_parse())."""
+        return text.isascii() or app.curses_util.kDoubleWideRe.search(text) is None
+
+
+else:
+
+    def _is_narrow(text):
+        """Whether each character of |text| counts as one column (in
+        _fast_line_parse())."""
+        return app.curses_util.kDoubleWideRe.search(text) is None
+
+
+def _set_end_key(grammar, text, pos):
+    """Compile the end of |grammar| to match the key in its 'begin' text.
+
+    Args:
+        grammar (dict): a grammar with an 'end_key' (a dynamic end tag).
+        text (unicode): text containing the 'begin' of |grammar|.
+        pos (int): the offset of the 'begin' within |text|.
+    """
+    found = re.compile(grammar["end_key"]).search(text, pos)
+    if found is None:
+        return
+    markers = grammar["markers"]
+    markers[1] = grammar["end"].replace(r"\0", re.escape(found.groups()[0]))
+    grammar["matchRe"] = re.compile(app.regex.join_re_list(markers), re.MULTILINE)
+
+
+class ParserNodeList(object):
+    """A compact list of parser nodes.
+
+    A Python list of 4-tuples costs a tuple (plus int objects for the larger
+    offsets) for every node. Instead, each field is held in its own array and
+    the grammar is stored as an id into |grammarTable| (see Prefs.grammarTable).
+
+    Indexing returns a (grammar, begin, prior, visual) tuple, so the kGrammar,
+    kBegin, kPrior, and kVisual keys work as they would on a list of tuples.
+    Code that reads a single field in a loop should use the column arrays
+    (|grammarIds|, |begins|, |priors|, |visuals|) directly. A prior of None is
+    stored as kNoPrior.
+    """
+
+    def __init__(self, grammarTable, nodes=()):
+        self.grammarTable = grammarTable
+        self.grammarIds = array.array("H")
+        self.begins = array.array("q")
+        self.priors = array.array("q")
+        self.visuals = array.array("q")
+        for node in nodes:
+            self.append(node)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if app.config.strict_debug:
+                assert index.step is None
+            out = ParserNodeList(self.grammarTable)
+            out.grammarIds = self.grammarIds[index]
+            out.begins = self.begins[index]
+            out.priors = self.priors[index]
+            out.visuals = self.visuals[index]
+            return out
+        prior = self.priors[index]
+        return (
+            self.grammarTable[self.grammarIds[index]],
+            self.begins[index],
+            None if prior == kNoPrior else prior,
+            self.visuals[index],
+        )
+
+    def __iter__(self):
+        for i in range(len(self.begins)):
+            yield self[i]
+
+    def __len__(self):
+        return len(self.begins)
+
+    def append(self, node):
+        """Add |node|, a (grammar, begin, prior, visual) tuple."""
+        grammar, begin, prior, visual = node
+        self.grammarIds.append(grammar["id"])
+        self.begins.append(begin)
+        self.priors.append(kNoPrior if prior is None else prior)
+        self.visuals.append(visual)
+
+    def grammar(self, index):
+        return self.grammarTable[self.grammarIds[index]]
+
+    def pop(self):
+        node = self[-1]
+        self.truncate(len(self.begins) - 1)
+        return node
+
+    def truncate(self, length):
+        """Remove the nodes from |length| onward."""
+        del self.grammarIds[length:]
+        del self.begins[length:]
+        del self.priors[length:]
+        del self.visuals[length:]
+
 
 class ParserNode:
     """A parser node represents a span of grammar. i.e. from this point to that
@@ -80,28 +224,87 @@ class ParserNode:
         )
 
 
-class Parser:
+class Parser(object):
     """A parser generates a set of grammar segments (ParserNode objects)."""
 
     def __init__(self, appPrefs):
         self.appPrefs = appPrefs
         self._defaultGrammar = appPrefs.grammars["none"]
-        self.data = u""
+        # The document text. Edits are O(log n); see |data| for the flat text.
+        self._rope = app.rope.Rope()
         self.emptyNode = ParserNode({}, None, None, 0)
-        self.endNode = ({}, sys.maxsize, sys.maxsize, sys.maxsize)
         self.resumeAtRow = 0
         self.pauseAtRow = 0
         # A row on screen will consist of one or more ParserNodes. When a
         # ParserNode is returned from the parser it will be an instance of
-        # ParserNode, but internally tuples are used in place of ParserNodes.
-        # This makes for some ugly code, but the performance difference (~5%) is
-        # worth it.
-        self.parserNodes = [({}, 0, None, 0)]
+        # ParserNode, but internally the nodes are kept in a ParserNodeList
+        # (which reads and writes tuples in place of ParserNodes). This makes
+        # for some ugly code, but the memory (and time) savings are worth it.
+        self.parserNodes = self._new_node_list()
         # Each entry in |self.rows| is an index into the |self.parserNodes|
         # array to the parerNode that begins that row.
-        self.rows = [0]  # Row parserNodes index.
+        self.rows = array.array("q", [0])  # Row parserNodes index.
+        # The misspelled words of each row, as a tuple of (begin, end) offsets
+        # within the row. None if the row hasn't been checked. See spell_check().
+        self.misspellings = []
+        # The rows before this one have all been spell checked.
+        self._spellCheckedRows = 0
+        # The matches of the find pattern (see Actions.index_matches()).
+        self.matchIndex = app.match_index.MatchIndex()
+        # The parse from before an edit, kept so that rows after the edit can
+        # be reused rather than re-lexed. See _record_edit() and _converge().
+        self._oldNodes = None
+        self._oldRows = None
+        self._oldMisspellings = None
+        # Rows prior to |_oldResumeAtRow| in |_oldRows| were fully lexed.
+        self._oldResumeAtRow = 0
+        # Add |_oldDelta| to an old offset to get the offset in |data|.
+        self._oldDelta = 0
+        # Old rows that begin at or before this (old) offset were changed.
+        self._oldDamageEnd = 0
+        # Chunks of the document being lexed in a process pool; see
+        # parse_in_parallel(). None if parallel parsing hasn't been started.
+        self._speculative = None
+        # The root grammar of the |_speculative| chunks.
+        self._speculativeGrammar = None
+        # The checksum of the document (see app.history.calculate_checksum()),
+        # if known. Any change to the document clears it.
+        self.checksum = None
         app.log.parser("__init__")
 
+    def _new_node_list(self):
+        """Create a node list holding the start node of an empty document."""
+        return ParserNodeList(
+            self.appPrefs.grammarTable, [(self.default_grammar(), 0, None, 0)]
+        )
+
+    @property
+    def data(self):
+        """The whole document as a single string.
+
+        After an edit this builds a new string (O(n)), so prefer data_slice()
+        and data_length() when the whole document isn't needed.
+        """
+        return self._rope.text()
+
+    @data.setter
+    def data(self, value):
+        self._drop_old_parse()
+        self._speculative = None
+        self.checksum = None
+        self.matchIndex.invalidate(0)
+        self._rope.set_text(value)
+        # Any row may have changed, so the parse starts over.
+        self._begin_parsing_at(0)
+
+    def data_length(self):
+        """The number of characters in the document."""
+        return len(self._rope)
+
+    def data_slice(self, begin, end=None):
+        """Get the document text from offset |begin| to |end| (exclusive)."""
+        return self._rope.slice(begin, end)
+
     def backspace(self, row, col):
         """Delete the character prior to |row, col|.
         Return the new (row, col) position."""
@@ -112,8 +315,8 @@ class Parser:
             return row, col
         if offset is None:
             # Bottom of file (or past end of line, but assuming end of file).
-            offset = len(self.data)
-        ch = self.data[offset - 1]
+            offset = len(self._rope)
+        ch = self._rope.char_at(offset - 1)
         if ch == u"\n":
             row -= 1
             col = self.row_width(row)
@@ -123,10 +326,10 @@ class Parser:
             col -= 2
         else:
             col -= 1
-        self.data = self.data[: offset - 1] + self.data[offset:]
+        self._rope.delete(offset - 1, offset)
+        self._record_edit(row, offset - 1, 1, 0)
         self._begin_parsing_at(row)
         if app.config.strict_debug:
-            assert isinstance(self.data, unicode)
             assert row >= 0
             assert col >= 0
         return row, col
@@ -164,11 +367,12 @@ class Parser:
         subnodeCol = subnode[kVisual] - node[kVisual]
         subnodeColDelta = col - subnodeCol
         offset = subnode[kBegin]
-        if self.data[offset] == u"\t":
+        ch = self._rope.char_at(offset)
+        if ch == u"\t":
             tabWidth = 8
             flooredTabGrammarCol = subnodeCol // tabWidth * tabWidth
             offset += (col - flooredTabGrammarCol) // tabWidth
-        elif app.curses_util.is_double_width(self.data[offset]):
+        elif app.curses_util.is_double_width(ch):
             char_width = 2
             offset += subnodeColDelta // char_width
         else:
@@ -182,36 +386,43 @@ class Parser:
             assert isinstance(offset, int)
             assert offset >= 0
         # Binary search to find the row, then the col.
-        nodes = self.parserNodes
-        if offset >= nodes[-1][kBegin]:
+        self._fast_line_parse(self.default_grammar())
+        if offset >= self.parserNodes.begins[-1]:
             return None
         # Determine the row.
         rows = self.rows
         low = 0
         high = len(rows) - 1
+        begins = self.parserNodes.begins
         while True:
             row = (high + low) // 2
-            if offset >= nodes[rows[row + 1]][kBegin]:
+            if offset >= begins[rows[row + 1]]:
                 low = row
-            elif offset < nodes[rows[row]][kBegin]:
+            elif offset < begins[rows[row]]:
                 high = row
             else:
                 break
         # Determine the col.
+        if row >= self.resumeAtRow:
+            # The row hasn't been lexed, so it's a single node (from
+            # _fast_line_parse()). Measure the text instead.
+            text = self._rope.slice(begins[rows[row]], offset)
+            return row, app.curses_util.column_width(text)
+        visuals = self.parserNodes.visuals
         low = rows[row]
         high = rows[row + 1]
         while True:
             index = (high + low) // 2
-            if offset >= nodes[index + 1][kBegin]:
+            if offset >= begins[index + 1]:
                 low = index
-            elif offset < nodes[index][kBegin]:
+            elif offset < begins[index]:
                 high = index
             else:
                 break
-        col = nodes[index][kVisual] - nodes[rows[row]][kVisual]
-        remainingOffset = offset - nodes[index][kBegin]
+        col = visuals[index] - visuals[rows[row]]
+        remainingOffset = offset - begins[index]
         if remainingOffset > 0:
-            ch = self.data[nodes[index][kBegin]]
+            ch = self._rope.char_at(begins[index])
             if ch == u"\t":
                 tabWidth = self.appPrefs.editor.get(u"tabSize", 8)
                 # Add the (potentially) fractional tab.
@@ -231,9 +442,11 @@ class Parser:
             end = self.data_offset(row, lowerCol)
             if end is None:
                 if begin is not None:
-                    self.data = self.data[:begin]
+                    self._record_edit(row, begin, len(self._rope) - begin, 0)
+                    self._rope.delete(begin, len(self._rope))
             else:
-                self.data = self.data[:begin] + self.data[end:]
+                self._record_edit(row, begin, end - begin, 0)
+                self._rope.delete(begin, end)
         self._begin_parsing_at(upperRow)
 
     def delete_char(self, row, col):
@@ -243,7 +456,8 @@ class Parser:
         if offset is None:
             # Bottom of file, nothing to do.
             return
-        self.data = self.data[:offset] + self.data[offset + 1 :]
+        self._rope.delete(offset, offset + 1)
+        self._record_edit(row, offset, 1, 0)
         self._begin_parsing_at(row)
 
     def delete_range(self, upperRow, upperCol, lowerRow, lowerCol):
@@ -251,9 +465,11 @@ class Parser:
         end = self.data_offset(lowerRow, lowerCol)
         if end is None:
             if begin is not None:
-                self.data = self.data[:begin]
+                self._record_edit(upperRow, begin, len(self._rope) - begin, 0)
+                self._rope.delete(begin, len(self._rope))
         else:
-            self.data = self.data[:begin] + self.data[end:]
+            self._record_edit(upperRow, begin, end - begin, 0)
+            self._rope.delete(begin, end)
         self._begin_parsing_at(upperRow)
 
     def text_range(self, upperRow, upperCol, lowerRow, lowerCol):
@@ -261,8 +477,8 @@ class Parser:
         end = self.data_offset(lowerRow, lowerCol)
         if end is None:
             if begin is not None:
-                return self.data[begin:]
-        return self.data[begin:end]
+                return self._rope.slice(begin)
+        return self._rope.slice(begin, end)
 
     def grammar_index_from_row_col(self, row, col):
         """
@@ -280,25 +496,18 @@ class Parser:
         self._fully_parse_to(row)
         if app.config.strict_debug:
             assert row < len(self.rows), (row, len(self.rows), repr(self.data))
+        rowIndex = self.rows[row]
         if row == len(self.rows) - 1:
             # The last line.
             assert row + 1 >= len(self.rows)
-            gl = self.parserNodes[self.rows[row] :] + [self.endNode]
+            rowEnd = len(self.parserNodes)
         else:
-            gl = self.parserNodes[self.rows[row] : self.rows[row + 1]] + [self.endNode]
-        offset = gl[0][kVisual] + col
-        # Binary search to find the node for the column.
-        low = 0
-        high = len(gl) - 1
-        while True:
-            index = (high + low) // 2
-            if offset >= gl[index + 1][kVisual]:
-                low = index
-            elif offset < gl[index][kVisual]:
-                high = index
-            else:
-                # assert index < len(gl)  # Never return index to self.endNode.
-                return index
+            rowEnd = self.rows[row + 1]
+        visuals = self.parserNodes.visuals
+        offset = visuals[rowIndex] + col
+        # Binary search to find the (last) node that starts at or before the
+        # column.
+        return bisect.bisect_right(visuals, offset, rowIndex, rowEnd) - 1 - rowIndex
 
     def grammar_at(self, row, col):
         """Get the grammar at row, col.
@@ -350,7 +559,7 @@ class Parser:
         node = self.parserNodes[rowIndex + grammarIndex]
         nextNode = self.parserNodes[rowIndex + grammarIndex + 1]
         return (
-            self.data[node[kBegin] : nextNode[kBegin]],
+            self._rope.slice(node[kBegin], nextNode[kBegin]),
             node[kGrammar].get(u"link_type"),
         )
 
@@ -361,7 +570,7 @@ class Parser:
             assert row >= 0
             assert col >= 0
         self._fully_parse_to(row)
-        return row < len(self.rows) and col < self.parserNodes[self.rows[row]][kVisual]
+        return row < len(self.rows) and col < self.parserNodes.visuals[self.rows[row]]
 
     def insert(self, row, col, text):
         if app.config.strict_debug:
@@ -374,18 +583,18 @@ class Parser:
         offset = self.data_offset(row, col)
         if offset is None:
             row = len(self.rows) - 1
-            self.data += text
-        else:
-            self.data = self.data[:offset] + text + self.data[offset:]
+            offset = len(self._rope)
+        self._rope.insert(offset, text)
+        self._record_edit(row, offset, 0, len(text))
         self._begin_parsing_at(row)
 
     def insert_block(self, row, col, lines):
         for i in range(len(lines) - 1, -1, -1):
             offset = self.data_offset(row + i, col)
             if offset is None:
-                self.data += lines[i]
-            else:
-                self.data = self.data[:offset] + lines[i] + self.data[offset:]
+                offset = len(self._rope)
+            self._rope.insert(offset, lines[i])
+            self._record_edit(row + i, offset, 0, len(lines[i]))
         self._begin_parsing_at(row)
 
     def insert_lines(self, row, col, lines):
@@ -437,7 +646,8 @@ class Parser:
     def parse(self, bgThread, data, grammar, beginRow, endRow):
         """
         Args:
-          data (string): The file contents. The document.
+          data (string): The file contents. The document. Pass None to keep
+              the current document (this avoids building a flat string).
           grammar (object): The initial grammar (often determined by the file
               extension). If |beginRow| is not zero then grammar is ignored.
           beginRow (int): is the first row (which is line number - 1) in data
@@ -450,7 +660,7 @@ class Parser:
         """
         if app.config.strict_debug:
             assert bgThread is None or isinstance(bgThread, threading.Thread)
-            assert isinstance(data, unicode), type(data)
+            assert data is None or isinstance(data, unicode), type(data)
             assert isinstance(grammar, dict)
             assert isinstance(beginRow, int)
             assert isinstance(endRow, int)
@@ -459,13 +669,14 @@ class Parser:
             assert isinstance(self.appPrefs, app.prefs.Prefs)
         self._defaultGrammar = grammar
         self.emptyNode = ParserNode(grammar, None, None, 0)
-        self.data = data
+        if data is not None:
+            self.data = data
         self._begin_parsing_at(beginRow)
         self._fully_parse_to(endRow, bgThread)
         # self.debug_check_lines(app.log.parser, data)
         # startTime = time.time()
         if app.log.enabledChannels.get("parser", False):
-            self.debug_log(app.log.parser, data)
+            self.debug_log(app.log.parser, self.data)
         # app.log.startup('parsing took', time.time() - startTime)
 
     def _begin_parsing_at(self, beginRow):
@@ -482,52 +693,271 @@ class Parser:
             if beginRow < len(self.rows):
                 self.parserNodes = self.parserNodes[: self.rows[beginRow]]
                 self.rows = self.rows[:beginRow]
+                self._trim_to_resumable()
             self.resumeAtRow = len(self.rows)
+            del self.misspellings[self.resumeAtRow :]
+            self._spellCheckedRows = min(self._spellCheckedRows, self.resumeAtRow)
         else:
             # Parse the whole file.
-            self.parserNodes = [(self.default_grammar(), 0, None, 0)]
-            self.rows = [0]
+            self.parserNodes = self._new_node_list()
+            self.rows = array.array("q", [0])
             self.resumeAtRow = 0
+            self.forget_misspellings()
+
+    def _converge(self):
+        """Try to reuse the parse from before the most recent edit(s).
+
+        This is called when a new row has just begun (the last node in
+        |self.parserNodes| starts the last row). If the same text began a row
+        in the old parse with the same stack of grammars, then lexing from here
+        on will produce the same nodes as before (other than the offsets). So
+        the old nodes are spliced in rather than re-lexed.
+
+        Returns:
+            True if nodes from the old parse were spliced in.
+        """
+        parserNodes = self.parserNodes
+        oldNodes = self._oldNodes
+        oldRows = self._oldRows
+        oldResumeAtRow = self._oldResumeAtRow
+        node = parserNodes[-1]
+        oldBegins = oldNodes.begins
+        oldBegin = node[kBegin] - self._oldDelta
+        # Binary search for the old row that begins at |oldBegin|.
+        low = 0
+        high = oldResumeAtRow
+        while low < high:
+            mid = (low + high) // 2
+            if oldBegins[oldRows[mid]] < oldBegin:
+                low = mid + 1
+            else:
+                high = mid
+        if low >= oldResumeAtRow:
+            # Past the end of the usable old parse (it won't converge later).
+            self._drop_old_parse()
+            return False
+        oldRow = low
+        oldStart = oldRows[oldRow]
+        oldNode = oldNodes[oldStart]
+        if oldNode[kBegin] != oldBegin:
+            return False
+        # Compare the grammar stacks, noting how old prior indices map to new
+        # ones along the way.
+        priorMap = {}
+        newNode = node
+        while True:
+            grammar = newNode[kGrammar]
+            if grammar is not oldNode[kGrammar] or grammar.get("end_key"):
+                # A dynamic end key (e.g. a here doc) can't be compared.
+                return False
+            newPrior = newNode[kPrior]
+            oldPrior = oldNode[kPrior]
+            if newPrior is None or oldPrior is None:
+                if newPrior is not oldPrior:
+                    return False
+                break
+            priorMap[oldPrior] = newPrior
+            newNode = parserNodes[newPrior]
+            oldNode = oldNodes[oldPrior]
+        oldNode = oldNodes[oldStart]
+        # Splice in a batch of rows, enough to reach |self.pauseAtRow|.
+        newRow = len(self.rows) - 1
+        oldStop = oldRow + max(self.pauseAtRow - newRow, 1)
+        oldStop = min(oldStop, oldRow + kSpliceRows, oldResumeAtRow)
+        # Include the node that begins the next row (if any) so that lexing
+        # resumes from the start of a row.
+        oldEnd = oldRows[oldStop] + 1 if oldStop < len(oldRows) else len(oldNodes)
+        indexDelta = len(parserNodes) - 1 - oldStart
+        beginDelta = self._oldDelta
+        visualDelta = node[kVisual] - oldNode[kVisual]
+        try:
+            priors = [
+                prior
+                if prior == kNoPrior
+                else prior + indexDelta
+                if prior >= oldStart
+                else priorMap[prior]
+                for prior in oldNodes.priors[oldStart + 1 : oldEnd]
+            ]
+        except KeyError:
+            # The old nodes refer to a grammar outside of the compared stack.
+            self._drop_old_parse()
+            return False
+        parserNodes.grammarIds.extend(oldNodes.grammarIds[oldStart + 1 : oldEnd])
+        parserNodes.begins.extend(
+            [begin + beginDelta for begin in oldBegins[oldStart + 1 : oldEnd]]
+        )
+        parserNodes.priors.extend(priors)
+        parserNodes.visuals.extend(
+            [
+                visual + visualDelta
+                for visual in oldNodes.visuals[oldStart + 1 : oldEnd]
+            ]
+        )
+        self.rows.extend([i + indexDelta for i in oldRows[oldRow + 1 : oldStop + 1]])
+        # The reused rows are spelled the same as before.
+        oldMisspellings = self._oldMisspellings[oldRow:oldStop]
+        if oldMisspellings:
+            misspellings = self.misspellings
+            del misspellings[newRow:]
+            misspellings.extend([None] * (newRow - len(misspellings)))
+            misspellings.extend(oldMisspellings)
+        self._trim_to_resumable()
+        self._restore_end_key()
+        self.resumeAtRow = len(self.rows)
+        if oldStop == oldResumeAtRow:
+            self._drop_old_parse()
+        return True
+
+    def _trim_to_resumable(self):
+        """Remove trailing nodes that begin a grammar (within the last row).
+
+        Lexing resumes from the last node. Resuming from a node that begins a
+        grammar would scan that grammar's 'begin' text as if it were inside the
+        grammar (e.g. the opening quote of a string would end the string). A
+        node that begins a grammar refers to one of the two nodes before it as
+        its prior.
+        """
+        nodes = self.parserNodes
+        priors = nodes.priors
+        while len(priors) - 1 > self.rows[-1]:
+            prior = priors[-1]
+            if prior == kNoPrior or prior < len(priors) - 3:
+                break
+            nodes.pop()
+
+    def _restore_end_key(self):
+        """Set up the dynamic end of the grammar that lexing will resume in.
+
+        The end of a grammar with an 'end_key' (e.g. a C++ raw string) is
+        compiled into the (shared) grammar when the lexer finds its 'begin'.
+        That step is skipped for nodes spliced in by _converge() and the grammar
+        may have been set up for other text since (e.g. by another document).
+        """
+        nodes = self.parserNodes
+        grammar = nodes.grammar(-1)
+        if not grammar.get("end_key"):
+            return
+        # Find the node that began the grammar: the first node of the grammar
+        # after its prior. The nodes within the grammar (including children such
+        # as tabs or keywords) all share that prior.
+        grammarIds = nodes.grammarIds
+        priors = nodes.priors
+        grammarId = grammarIds[-1]
+        prior = priors[-1]
+        index = prior + 1
+        while grammarIds[index] != grammarId or priors[index] != prior:
+            index += 1
+        begin = nodes.begins[index]
+        _set_end_key(grammar, self._rope.slice(begin, begin + kLexMargin), 0)
+
+    def _drop_old_parse(self):
+        self._oldNodes = None
+        self._oldRows = None
+        self._oldMisspellings = None
+
+    def _record_edit(self, row, offset, removed, added):
+        """Note a change to the document so that the parse from before the
+        change can be reused by _converge().
+
+        Call this prior to _begin_parsing_at() for the edit.
+
+        Args:
+            row (int): the row containing |offset|.
+            offset (int): where the edit happened, in the pre-edit document.
+            removed (int): the number of characters removed at |offset|.
+            added (int): the number of characters inserted at |offset|.
+        """
+        delta = added - removed
+        self.checksum = None
+        self.matchIndex.invalidate(offset)
+        if self._speculative:
+            # The chunk offsets no longer match the document.
+            self._speculative = []
+        if self._oldNodes is None:
+            if row + 1 >= self.resumeAtRow:
+                # There are no fully parsed rows after the edit to reuse.
+                return
+            self._oldNodes = self.parserNodes
+            self._oldRows = self.rows
+            self._oldMisspellings = self.misspellings
+            self._oldResumeAtRow = self.resumeAtRow
+            self._oldDelta = delta
+            self._oldDamageEnd = offset + removed
+            # Stop using the old lists, they now belong to the old parse.
+            self.parserNodes = self.parserNodes[: self.rows[row + 1]]
+            self.rows = self.rows[: row + 1]
+            self.resumeAtRow = row + 1
+            self.misspellings = self.misspellings[: row + 1]
+        else:
+            # Convert the end of the edit to an offset in the old parse.
+            self._oldDamageEnd = max(
+                self._oldDamageEnd, offset + removed - self._oldDelta
+            )
+            self._oldDelta += delta
 
     def _fast_line_parse(self, grammar):
         """If there's not enough time to thoroughly parse the file, identify the
         lines so that the document can still be edited.
+
+        The document is scanned a block at a time. Where a block has no
+        potentially double wide characters the row starts (and their visual
+        offsets) are found in bulk; otherwise each line is measured separately.
+        Tabs and control characters count as one column here (the lexer sorts
+        them out).
         """
-        data = self.data
-        offset = self.parserNodes[-1][kBegin]
-        limit = len(data)
+        rope = self._rope
+        nodes = self.parserNodes
+        offset = nodes.begins[-1]
+        limit = len(rope)
         if offset == limit:
             # Already parsed to end of data.
             return
-        visual = self.parserNodes[-1][kVisual]
-
-        # Track the |visual| value for the start of the line. The difference
-        # between |visual| and |visualStartCol| is the column index of the line.
-        visualStartCol = 0
-        while True:
-            while offset < limit and data[offset] != "\n":
-                if data[offset] < u"ᄀ":
-                    # The char is less than the first double width character.
-                    # (An optimization to avoid calling char_width().)
-                    visual += 1
+        visual = nodes.visuals[-1]
+        grammarIds = array.array("H", [grammar["id"]])
+        priors = array.array("q", [kNoPrior])
+        while offset < limit:
+            blockEnd = min(offset + kLineIndexBlock, limit)
+            block = rope.slice(offset, blockEnd)
+            lines = block.split(u"\n")
+            # The row starts are the running sum of the line lengths (each plus
+            # one for the new-line), beginning at |offset|.
+            begins = list(
+                itertools.islice(
+                    accumulate(
+                        itertools.chain(
+                            (offset,), map((1).__add__, map(len, lines[:-1]))
+                        )
+                    ),
+                    1,
+                    None,
+                )
+            )
+            if _is_narrow(block):
+                if visual == offset:
+                    visuals = begins
                 else:
-                    # From here on, the width of the character is messy to
-                    # determine, ask an authority.
-                    visual += app.curses_util.char_width(
-                        data[offset], visual - visualStartCol
-                    )
-                offset += 1
-            if offset >= limit:
-                # The document is missing the last new-line.
-                if self.parserNodes[-1][kBegin] != limit:
-                    # Add a terminating (end) node.
-                    self.parserNodes.append((grammar, limit, None, visual))
-                break
-            visualStartCol = visual
-            offset += 1
-            visual += 1
-            self.rows.append(len(self.parserNodes))
-            self.parserNodes.append((grammar, offset, None, visual))
+                    visuals = list(map((visual - offset).__add__, begins))
+                visual += len(block)
+            else:
+                visuals = []
+                doubleWidthCount = app.curses_util.double_width_count
+                for line in lines[:-1]:
+                    visual += len(line) + doubleWidthCount(line) + 1
+                    visuals.append(visual)
+                visual += len(lines[-1]) + doubleWidthCount(lines[-1])
+            rowCount = len(begins)
+            # (fromlist() is much quicker than extend() with an iterator.)
+            self.rows.fromlist(list(range(len(nodes), len(nodes) + rowCount)))
+            nodes.grammarIds.extend(grammarIds * rowCount)
+            nodes.begins.fromlist(begins)
+            nodes.priors.extend(priors * rowCount)
+            nodes.visuals.fromlist(visuals)
+            offset = blockEnd
+        if nodes.begins[-1] != limit:
+            # The document is missing the last new-line. Add a terminating (end)
+            # node.
+            nodes.append((grammar, limit, None, visual))
 
     def _fully_parse_to(self, endRow, bgThread=None):
         """Parse up to and including |endRow|."""
@@ -550,6 +980,120 @@ class Parser:
             if bgThread is not None and endRow <= len(self.rows):
                 assert self.resumeAtRow >= endRow + 1, (self.resumeAtRow, endRow)
 
+    def lex_all(self, grammar):
+        """Lex the whole document with |grammar| as the root grammar.
+
+        Unlike parse() this doesn't return until the end of the document is
+        reached.
+        """
+        if app.config.strict_debug:
+            assert isinstance(grammar, dict)
+        self._defaultGrammar = grammar
+        self.emptyNode = ParserNode(grammar, None, None, 0)
+        self._begin_parsing_at(0)
+        self.pauseAtRow = sys.maxsize
+        while True:
+            # Resuming at the end of an unterminated last line may append
+            # another (empty) node at the same offset, which isn't progress.
+            progress = (len(self.rows), self.parserNodes.begins[-1])
+            self._build_grammar_list(None)
+            if progress == (len(self.rows), self.parserNodes.begins[-1]):
+                break
+
+    def parse_state(self):
+        """Get the parse as arrays (e.g. to store or send elsewhere).
+
+        Returns:
+            (grammarIds, begins, priors, visuals, rows) arrays.
+        """
+        nodes = self.parserNodes
+        return nodes.grammarIds, nodes.begins, nodes.priors, nodes.visuals, self.rows
+
+    def restore_parse_state(self, grammar, state):
+        """Take a complete parse of the current document from parse_state().
+
+        Args:
+            grammar (dict): the root grammar of the parse.
+            state (tuple): the arrays from parse_state().
+        """
+        if app.config.strict_debug:
+            assert isinstance(grammar, dict)
+        grammarIds, begins, priors, visuals, rows = state
+        if not (
+            len(grammarIds) == len(begins) == len(priors) == len(visuals)
+            and len(rows)
+            and rows[-1] < len(begins)
+            and begins[-1] <= len(self._rope)
+            and max(grammarIds) < len(self.appPrefs.grammarTable)
+        ):
+            raise ValueError(u"parse doesn't match the document")
+        nodes = ParserNodeList(self.appPrefs.grammarTable)
+        nodes.grammarIds = grammarIds
+        nodes.begins = begins
+        nodes.priors = priors
+        nodes.visuals = visuals
+        self._drop_old_parse()
+        self._defaultGrammar = grammar
+        self.emptyNode = ParserNode(grammar, None, None, 0)
+        self.parserNodes = nodes
+        self.rows = rows
+        self.resumeAtRow = len(rows)
+        self.forget_misspellings()
+        # There's nothing left to lex in parallel.
+        self._speculative = []
+        self._speculativeGrammar = grammar
+
+    def parse_in_parallel(self, grammar):
+        """Begin lexing the document in a process pool, if the document is
+        large enough to benefit. The results are used as parsing reaches them
+        (so parse() is still called as usual).
+        """
+        if app.config.strict_debug:
+            assert isinstance(grammar, dict)
+        if self._speculative is not None and self._speculativeGrammar is grammar:
+            # Already started (or finished).
+            return
+        if len(self._rope) < app.parallel_parse.kMinDocumentLength:
+            self._speculative = []
+        else:
+            self._speculative = app.parallel_parse.start(self, grammar)
+        self._speculativeGrammar = grammar
+
+    def _use_speculative_chunk(self, cursor):
+        """If the chunk containing |cursor| has been lexed in the process pool,
+        take it as the old parse (for _converge() to reuse).
+
+        |cursor| is the start of a row.
+        """
+        chunks = self._speculative
+        while chunks and chunks[0][1] <= cursor:
+            # The parse has moved past this chunk.
+            chunks.pop(0)
+        if not chunks or self._speculativeGrammar is not self._defaultGrammar:
+            return
+        begin, _, result = chunks[0]
+        if begin > cursor or not result.ready():
+            return
+        chunks.pop(0)
+        try:
+            grammarIds, begins, priors, visuals, rows = result.get()
+        except Exception as e:
+            app.log.exception(e)
+            return
+        oldNodes = ParserNodeList(self.appPrefs.grammarTable)
+        oldNodes.grammarIds = grammarIds
+        oldNodes.begins = begins
+        oldNodes.priors = priors
+        oldNodes.visuals = visuals
+        self._oldNodes = oldNodes
+        self._oldRows = rows
+        self._oldMisspellings = []
+        # The last row of the chunk was lexed without seeing the text that
+        # follows the chunk, so it isn't reused.
+        self._oldResumeAtRow = len(rows) - 1
+        self._oldDelta = begin
+        self._oldDamageEnd = -1
+
     def row_count(self):
         self._fast_line_parse(self.default_grammar())
         return len(self.rows)
@@ -570,16 +1114,17 @@ class Parser:
             assert beginCol is None or isinstance(beginCol, int)
             assert endCol is None or isinstance(endCol, int)
             assert row >= 0
-            assert isinstance(self.data, unicode)
         self._fully_parse_to(row)
+        rope = self._rope
         if beginCol is endCol is None:
-            begin = self.parserNodes[self.rows[row]][kBegin]
+            begins = self.parserNodes.begins
+            begin = begins[self.rows[row]]
             if row + 1 >= len(self.rows):
-                return self.data[begin:]
-            end = self.parserNodes[self.rows[row + 1]][kBegin]
-            if len(self.data) and self.data[end - 1] == u"\n":
+                return rope.slice(begin)
+            end = begins[self.rows[row + 1]]
+            if len(rope) and rope.char_at(end - 1) == u"\n":
                 end -= 1
-            return self.data[begin:end]
+            return rope.slice(begin, end)
 
         if beginCol >= 0:
             begin = self.data_offset(row, beginCol)
@@ -602,11 +1147,11 @@ class Parser:
             end = self.data_offset(row, endCol)
 
         if end is None:
-            end = len(self.data)
-        if end > 0 and self.data[end - 1] == u"\n":
+            end = len(rope)
+        if end > 0 and rope.char_at(end - 1) == u"\n":
             end -= 1
 
-        return self.data[begin:end]
+        return rope.slice(begin, end)
 
     def char_at(self, row, col):
         """Get the character at |row|, |col|.
@@ -621,7 +1166,6 @@ class Parser:
         if app.config.strict_debug:
             assert isinstance(row, int)
             assert isinstance(col, int)
-            assert isinstance(self.data, unicode)
             assert row >= 0
             assert col >= 0
         self._fully_parse_to(row)
@@ -649,21 +1193,130 @@ class Parser:
         if app.config.strict_debug:
             assert isinstance(row, int)
         self._fully_parse_to(row)
-        begin = self.parserNodes[self.rows[row]][kBegin]
-        visual = self.parserNodes[self.rows[row]][kVisual]
+        begins = self.parserNodes.begins
+        visuals = self.parserNodes.visuals
+        begin = begins[self.rows[row]]
+        visual = visuals[self.rows[row]]
         if row + 1 < len(self.rows):
-            end = self.parserNodes[self.rows[row + 1]][kBegin]
-            visualEnd = self.parserNodes[self.rows[row + 1]][kVisual]
-            if len(self.data) and self.data[end - 1] == "\n":
+            end = begins[self.rows[row + 1]]
+            visualEnd = visuals[self.rows[row + 1]]
+            if len(self._rope) and self._rope.char_at(end - 1) == "\n":
                 end -= 1
                 visualEnd -= 1
         else:
             # There is a sentinel node at the end that records the end of
             # document.
-            lastNode = self.parserNodes[-1]
-            end = lastNode[kBegin]
-            visualEnd = lastNode[kVisual]
-        return self.data[begin:end], visualEnd - visual
+            end = begins[-1]
+            visualEnd = visuals[-1]
+        return self._rope.slice(begin, end), visualEnd - visual
+
+    def forget_misspellings(self):
+        """Discard the spell check results (e.g. when the dictionary changes)."""
+        self.misspellings = []
+        self._spellCheckedRows = 0
+
+    def row_misspellings(self, row):
+        """Get the misspelled words of |row| found by spell_check().
+
+        Returns:
+            A tuple of (begin, end) offsets within the row text. Empty if the
+            row hasn't been checked.
+        """
+        if row < len(self.misspellings):
+            return self.misspellings[row] or ()
+        return ()
+
+    def spell_check(self, dictionary, beginRow, endRow, bgThread=None):
+        """Find the misspelled words in the parsed rows from |beginRow| up to
+        (not including) |endRow|. Rows already checked are skipped.
+
+        Args:
+            dictionary (app.spelling.Dictionary): the words to accept.
+            beginRow (int): the first row to check.
+            endRow (int): stop before this row.
+            bgThread (BackgroundThread): stop early if there's a user event.
+
+        Returns:
+            Whether all the rows are checked (they may not be parsed yet).
+        """
+        if app.config.strict_debug:
+            assert isinstance(beginRow, int)
+            assert isinstance(endRow, int)
+            assert bgThread is None or isinstance(bgThread, threading.Thread)
+        stopRow = min(endRow, self.resumeAtRow, len(self.rows))
+        misspellings = self.misspellings
+        if len(misspellings) < stopRow:
+            misspellings.extend([None] * (stopRow - len(misspellings)))
+        for row in range(max(beginRow, self._spellCheckedRows), stopRow):
+            if misspellings[row] is None:
+                if bgThread is not None and row % 100 == 0:
+                    if bgThread.has_user_event():
+                        return False
+                misspellings[row] = self._find_misspellings(dictionary, row)
+            if row == self._spellCheckedRows:
+                self._spellCheckedRows += 1
+        return stopRow >= endRow
+
+    def _find_misspellings(self, dictionary, row):
+        """Check the spelling of the words in |row| that are in grammars with
+        spelling enabled.
+
+        Returns:
+            A tuple of (begin, end) offsets within the row text.
+        """
+        line = self.row_text(row)
+        nodes = self.parserNodes
+        begins = nodes.begins
+        rowIndex = self.rows[row]
+        if row + 1 < len(self.rows):
+            rowEnd = self.rows[row + 1]
+        else:
+            rowEnd = len(begins)
+        rowBegin = begins[rowIndex]
+        found = []
+        for i in range(rowIndex, rowEnd):
+            grammar = nodes.grammar(i)
+            if not grammar.get(u"spelling", True):
+                continue
+            subStart = begins[i] - rowBegin
+            if i + 1 < len(begins):
+                subEnd = min(begins[i + 1] - rowBegin, len(line))
+            else:
+                subEnd = len(line)
+            if subStart >= subEnd:
+                continue
+            grammarName = grammar.get(u"name", "unknown")
+            for word in app.regex.kReSubwords.finditer(line[subStart:subEnd]):
+                if not dictionary.is_correct(word.group(), grammarName):
+                    found.append((subStart + word.start(), subStart + word.end()))
+        return tuple(found)
+
+    def row_grammar_key(self, row):
+        """Get a value that differs when the grammar spans of |row| differ.
+
+        Rows with the same text and the same key are drawn the same way.
+
+        Args:
+            row (int): the row index is zero based (so it's line number - 1).
+
+        Returns:
+            A hashable key (tuple).
+        """
+        if app.config.strict_debug:
+            assert isinstance(row, int)
+        self._fully_parse_to(row)
+        nodes = self.parserNodes
+        rowIndex = self.rows[row]
+        if row + 1 < len(self.rows):
+            # The node that begins the next row ends this one.
+            rowEnd = self.rows[row + 1] + 1
+        else:
+            rowEnd = len(nodes)
+        rowBegin = nodes.begins[rowIndex]
+        return (
+            tuple(nodes.grammarIds[rowIndex:rowEnd]),
+            tuple([i - rowBegin for i in nodes.begins[rowIndex:rowEnd]]),
+        )
 
     def row_width(self, row):
         """Get the visual/display column width of a row.
@@ -683,17 +1336,18 @@ class Parser:
         if row < 0:
             row = len(self.rows) + row
         self._fully_parse_to(row)
-        visual = self.parserNodes[self.rows[row]][kVisual]
+        begins = self.parserNodes.begins
+        visuals = self.parserNodes.visuals
+        visual = visuals[self.rows[row]]
         if row + 1 < len(self.rows):
-            end = self.parserNodes[self.rows[row + 1]][kBegin]
-            visualEnd = self.parserNodes[self.rows[row + 1]][kVisual]
-            if len(self.data) and self.data[end - 1] == "\n":
+            end = begins[self.rows[row + 1]]
+            visualEnd = visuals[self.rows[row + 1]]
+            if len(self._rope) and self._rope.char_at(end - 1) == "\n":
                 visualEnd -= 1
         else:
             # There is a sentinel node at the end that records the end of
             # document.
-            lastNode = self.parserNodes[-1]
-            visualEnd = lastNode[kVisual]
+            visualEnd = visuals[-1]
         return visualEnd - visual
 
     def _build_grammar_list(self, bgThread):
@@ -703,22 +1357,31 @@ class Parser:
         again).
         """
         appPrefs = self.appPrefs
+        rope = self._rope
+        dataLength = len(rope)
+        # Nodes are only added (or removed) in place while lexing.
+        nodes = self.parserNodes
         # An arbitrary limit to avoid run-away looping.
         leash = 50000
-        topNode = self.parserNodes[-1]
+        # A prior call may have stopped just after beginning a grammar.
+        self._trim_to_resumable()
+        self._restore_end_key()
+        topNode = nodes[-1]
         cursor = topNode[kBegin]
         visual = topNode[kVisual]
+        windowBegin = windowEnd = cursor
+        window = u""
         # If we are at the start of a grammar, skip the 'begin' part of the
         # grammar.
         if 0:
             if (
-                len(self.parserNodes) == 1
+                len(nodes) == 1
                 or (topNode[kGrammar] is not self.parserNodes[-2][kGrammar])
                 and topNode[kGrammar].get("end") is not None
             ):
                 beginRegex = topNode[kGrammar].get("begin")
                 if beginRegex is not None:
-                    sre = re.match(beginRegex, self.data[cursor:])
+                    sre = re.match(beginRegex, self._rope.slice(cursor))
                     if sre is not None:
                         assert False
                         cursor += sre.regs[0][1]
@@ -731,15 +1394,53 @@ class Parser:
             leash -= 1
             if bgThread and bgThread.has_user_event():
                 break
-            subdata = self.data[cursor:]
-            found = self.parserNodes[-1][kGrammar].get("matchRe").search(subdata)
+            if (
+                self._speculative
+                and self._oldNodes is None
+                and self.rows[-1] == len(nodes) - 1
+            ):
+                self._use_speculative_chunk(cursor)
+            if (
+                self._oldNodes is not None
+                and self.rows[-1] == len(nodes) - 1
+                and cursor - self._oldDelta > self._oldDamageEnd
+                and self._converge()
+            ):
+                # Continue after the reused rows.
+                topNode = nodes[-1]
+                cursor = topNode[kBegin]
+                visual = topNode[kVisual]
+                continue
+            matchRe = nodes.grammar(-1).get("matchRe")
+            if matchRe is None:
+                matchRe = appPrefs.compile_grammar(nodes.grammar(-1))
+            windowSize = kLexWindow
+            if windowEnd < dataLength and windowEnd - cursor < kLexMargin:
+                windowBegin = max(0, cursor - kLexLookBehind)
+                windowEnd = min(cursor + windowSize, dataLength)
+                window = rope.slice(windowBegin, windowEnd)
+            while True:
+                # Search in place; |pos| is the cursor's index in |window|.
+                pos = cursor - windowBegin
+                found = matchRe.search(window, pos)
+                if windowEnd == dataLength or (
+                    found and windowBegin + found.end() <= windowEnd - kLexMargin
+                ):
+                    break
+                # The match may depend on text past the end of the window.
+                windowSize *= 2
+                windowBegin = max(0, cursor - kLexLookBehind)
+                windowEnd = min(cursor + windowSize, dataLength)
+                window = rope.slice(windowBegin, windowEnd)
             if not found:
                 # app.log.info('parser exit, match not found')
                 # todo(dschuyler): mark parent grammars as unterminated (if they
                 # expect be terminated). e.g. unmatched string quote or xml tag.
-                if cursor != len(self.data):
-                    # The last bit of the last line.
-                    self.parserNodes.append(
+                if cursor != dataLength:
+                    # The last bit of the last line, continuing the innermost
+                    # grammar.
+                    topNode = nodes[-1]
+                    nodes.append(
                         (topNode[kGrammar], cursor, topNode[kPrior], visual)
                     )
                 break
@@ -749,7 +1450,9 @@ class Parser:
                 index += 1
                 if k is not None:
                     break
-            reg = found.regs[index + 1]
+            # Make the match range relative to the cursor.
+            regBegin, regEnd = found.regs[index + 1]
+            reg = (regBegin - pos, regEnd - pos)
             if index == 0:
                 # Found escaped value.
                 cursor += reg[1]
@@ -758,81 +1461,50 @@ class Parser:
             if index == len(foundGroups) - 1:
                 # Found new line.
                 child = (
-                    self.parserNodes[-1][kGrammar],
+                    nodes.grammar(-1),
                     cursor + reg[1],
-                    self.parserNodes[-1][kPrior],
+                    nodes[-1][kPrior],
                     visual + reg[1],
                 )
                 cursor += reg[1]
                 visual += reg[1]
-                self.rows.append(len(self.parserNodes))
+                self.rows.append(len(nodes))
             elif index == len(foundGroups) - 2:
                 # Found potentially double wide characters.
-                topNode = self.parserNodes[-1]
+                topNode = nodes[-1]
                 regBegin, regEnd = reg
-                width = app.curses_util.char_width
                 if regBegin > 0:
                     # Add single wide characters.
-                    self.parserNodes.append(
+                    nodes.append(
                         (topNode[kGrammar], cursor, topNode[kPrior], visual)
                     )
                     cursor += regBegin
                     visual += regBegin
-                    regEnd -= regBegin
-                    regBegin = 0
-                while regBegin < regEnd:
-                    # Check for zero width characters.
-                    while (
-                        regBegin < regEnd
-                        and width(self.data[cursor + regBegin], 0) == 0
-                    ):
-                        regBegin += 1
-                    if regBegin > 0:
-                        # Add zero width characters.
-                        self.parserNodes.append(
-                            (topNode[kGrammar], cursor, topNode[kPrior], visual)
-                        )
-                        cursor += regBegin
-                        regEnd -= regBegin
-                        regBegin = 0
-                    # Check for single wide characters.
-                    while (
-                        regBegin < regEnd
-                        and width(self.data[cursor + regBegin], 0) == 1
+                # Add a node for each run of zero, single, or double wide
+                # characters.
+                runEnd = pos + regEnd
+                while cursor - windowBegin < runEnd:
+                    for runRe, runWidth in (
+                        (app.curses_util.kZeroWideRunRe, 0),
+                        (app.curses_util.kSingleWideRunRe, 1),
+                        (app.curses_util.kDoubleWideRunRe, 2),
                     ):
-                        regBegin += 1
-                    if regBegin > 0:
-                        # Add single wide characters.
-                        self.parserNodes.append(
-                            (topNode[kGrammar], cursor, topNode[kPrior], visual)
-                        )
-                        cursor += regBegin
-                        visual += regBegin
-                        regEnd -= regBegin
-                        regBegin = 0
-                    # Check for double wide characters.
-                    while (
-                        regBegin < regEnd
-                        and width(self.data[cursor + regBegin], 0) == 2
-                    ):
-                        regBegin += 1
-                    if regBegin > 0:
-                        # Add double wide characters.
-                        self.parserNodes.append(
-                            (topNode[kGrammar], cursor, topNode[kPrior], visual)
-                        )
-                        cursor += regBegin
-                        visual += regBegin * 2
-                        regEnd -= regBegin
-                        regBegin = 0
+                        run = runRe.match(window, cursor - windowBegin, runEnd)
+                        if run is not None:
+                            nodes.append(
+                                (topNode[kGrammar], cursor, topNode[kPrior], visual)
+                            )
+                            runLength = run.end() - run.start()
+                            cursor += runLength
+                            visual += runLength * runWidth
                 continue
             elif index == len(foundGroups) - 3:
                 # Found variable width (tab) character.
-                topNode = self.parserNodes[-1]
+                topNode = nodes[-1]
                 regBegin, regEnd = reg
                 # First, add any preceding single wide characters.
                 if regBegin > 0:
-                    self.parserNodes.append(
+                    nodes.append(
                         (topNode[kGrammar], cursor, topNode[kPrior], visual)
                     )
                     cursor += regBegin
@@ -841,10 +1513,10 @@ class Parser:
                     regEnd -= regBegin
                     regBegin = 0
                 # Add tabs grammar; store the variable width characters.
-                rowStart = self.parserNodes[self.rows[-1]][kVisual]
+                rowStart = nodes.visuals[self.rows[-1]]
                 col = visual - rowStart
                 # Advance to the next tab stop.
-                self.parserNodes.append(
+                nodes.append(
                     (appPrefs.grammars["tabs"], cursor, topNode[kPrior], visual)
                 )
                 cursor += regEnd
@@ -855,16 +1527,16 @@ class Parser:
             elif index == 1:
                 # Found end of current grammar section (an 'end').
                 child = (
-                    self.parserNodes[self.parserNodes[-1][kPrior]][kGrammar],
+                    nodes.grammar(nodes.priors[-1]),
                     cursor + reg[1],
-                    self.parserNodes[self.parserNodes[-1][kPrior]][kPrior],
+                    nodes[nodes.priors[-1]][kPrior],
                     visual + reg[1],
                 )
                 cursor = child[kBegin]
                 visual += reg[1]
-                if subdata[reg[1] - 1] == "\n":
+                if window[pos + reg[1] - 1] == "\n":
                     # This 'end' ends with a new line.
-                    self.rows.append(len(self.parserNodes))
+                    self.rows.append(len(nodes))
             else:
                 [
                     containsGrammarIndexLimit,
@@ -873,160 +1545,154 @@ class Parser:
                     keywordIndexLimit,
                     typeIndexLimit,
                     specialIndexLimit,
-                ] = self.parserNodes[-1][kGrammar]["indexLimits"]
-                if index < containsGrammarIndexLimit:
+                ] = nodes.grammar(-1)["indexLimits"]
+                newLine = -1
+                if index < nextGrammarIndexLimit:
+                    newLine = window.find(u"\n", pos + reg[0], pos + reg[1])
+                if newLine != -1:
+                    # The 'begin' spans a new line (e.g. it has leading white
+                    # space). The new line stays in this grammar, as for a
+                    # found new line, and the 'begin' is looked for again after
+                    # it (its look-behind can see the new line).
+                    regEnd = newLine + 1 - pos
+                    child = (
+                        nodes.grammar(-1),
+                        cursor + regEnd,
+                        nodes[-1][kPrior],
+                        visual + regEnd,
+                    )
+                    cursor += regEnd
+                    visual += regEnd
+                    self.rows.append(len(nodes))
+                elif index < containsGrammarIndexLimit:
                     # A new grammar within this grammar (a 'contains').
-                    if subdata[reg[0]] == "\n":
-                        # This 'begin' begins with a new line.
-                        self.rows.append(len(self.parserNodes))
-                    priorGrammar = self.parserNodes[-1][kGrammar].get(
+                    priorGrammar = nodes.grammar(-1).get(
                         "matchGrammars", []
                     )[index]
                     if priorGrammar["end"] is None:
                         # Found single regex match (a leaf grammar).
-                        self.parserNodes.append(
+                        nodes.append(
                             (
                                 priorGrammar,
                                 cursor + reg[0],
-                                len(self.parserNodes) - 1,
+                                len(nodes) - 1,
                                 visual + reg[0],
                             )
                         )
                         # Resume the current grammar.
                         child = (
-                            self.parserNodes[self.parserNodes[-1][kPrior]][kGrammar],
+                            nodes.grammar(nodes.priors[-1]),
                             cursor + reg[1],
-                            self.parserNodes[self.parserNodes[-1][kPrior]][kPrior],
+                            nodes[nodes.priors[-1]][kPrior],
                             visual + reg[1],
                         )
                     else:
                         if priorGrammar.get("end_key"):
                             # A dynamic end tag.
-                            hereKey = re.search(
-                                priorGrammar["end_key"], subdata[reg[0] :]
-                            ).groups()[0]
-                            markers = priorGrammar["markers"]
-                            markers[1] = priorGrammar["end"].replace(
-                                r"\0", re.escape(hereKey)
-                            )
-                            priorGrammar["matchRe"] = re.compile(
-                                app.regex.join_re_list(markers)
-                            )
+                            _set_end_key(priorGrammar, window, pos + reg[0])
                         child = (
                             priorGrammar,
                             cursor + reg[0],
-                            len(self.parserNodes) - 1,
+                            len(nodes) - 1,
                             visual + reg[0],
                         )
                     cursor += reg[1]
                     visual += reg[1]
                 elif index < nextGrammarIndexLimit:
                     # A new grammar follows this grammar (a 'begin').
-                    if subdata[reg[0]] == "\n":
-                        # This 'begin' begins with a new line.
-                        self.rows.append(len(self.parserNodes))
-                    priorGrammar = self.parserNodes[-1][kGrammar].get(
+                    priorGrammar = nodes.grammar(-1).get(
                         "matchGrammars", []
                     )[index]
                     if priorGrammar.get("end_key"):
                         # A dynamic end tag.
-                        hereKey = re.search(
-                            priorGrammar["end_key"], subdata[reg[0] :]
-                        ).groups()[0]
-                        markers = priorGrammar["markers"]
-                        markers[1] = priorGrammar["end"].replace(
-                            r"\0", re.escape(hereKey)
-                        )
-                        priorGrammar["matchRe"] = re.compile(
-                            app.regex.join_re_list(markers)
-                        )
+                        _set_end_key(priorGrammar, window, pos + reg[0])
                     child = (
                         priorGrammar,
                         cursor + reg[0],
-                        len(self.parserNodes) - 2,
+                        len(nodes) - 2,
                         visual + reg[0],
                     )
                     cursor += reg[1]
                     visual += reg[1]
                 elif index < errorIndexLimit:
                     # A special doesn't change the nodeIndex.
-                    self.parserNodes.append(
+                    nodes.append(
                         (
                             appPrefs.grammars["error"],
                             cursor + reg[0],
-                            len(self.parserNodes) - 1,
+                            len(nodes) - 1,
                             visual + reg[0],
                         )
                     )
                     # Resume the current grammar.
                     child = (
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kGrammar],
+                        nodes.grammar(nodes.priors[-1]),
                         cursor + reg[1],
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kPrior],
+                        nodes[nodes.priors[-1]][kPrior],
                         visual + reg[1],
                     )
                     cursor += reg[1]
                     visual += reg[1]
                 elif index < keywordIndexLimit:
                     # A keyword doesn't change the nodeIndex.
-                    self.parserNodes.append(
+                    nodes.append(
                         (
                             appPrefs.grammars["keyword"],
                             cursor + reg[0],
-                            len(self.parserNodes) - 1,
+                            len(nodes) - 1,
                             visual + reg[0],
                         )
                     )
                     # Resume the current grammar.
                     child = (
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kGrammar],
+                        nodes.grammar(nodes.priors[-1]),
                         cursor + reg[1],
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kPrior],
+                        nodes[nodes.priors[-1]][kPrior],
                         visual + reg[1],
                     )
                     cursor += reg[1]
                     visual += reg[1]
                 elif index < typeIndexLimit:
                     # A type doesn't change the nodeIndex.
-                    self.parserNodes.append(
+                    nodes.append(
                         (
                             appPrefs.grammars["type"],
                             cursor + reg[0],
-                            len(self.parserNodes) - 1,
+                            len(nodes) - 1,
                             visual + reg[0],
                         )
                     )
                     # Resume the current grammar.
                     child = (
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kGrammar],
+                        nodes.grammar(nodes.priors[-1]),
                         cursor + reg[1],
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kPrior],
+                        nodes[nodes.priors[-1]][kPrior],
                         visual + reg[1],
                     )
                     cursor += reg[1]
                     visual += reg[1]
                 elif index < specialIndexLimit:
                     # A special doesn't change the nodeIndex.
-                    self.parserNodes.append(
+                    nodes.append(
                         (
                             appPrefs.grammars["special"],
                             cursor + reg[0],
-                            len(self.parserNodes) - 1,
+                            len(nodes) - 1,
                             visual + reg[0],
                         )
                     )
                     # Resume the current grammar.
                     child = (
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kGrammar],
+                        nodes.grammar(nodes.priors[-1]),
                         cursor + reg[1],
-                        self.parserNodes[self.parserNodes[-1][kPrior]][kPrior],
+                        nodes[nodes.priors[-1]][kPrior],
                         visual + reg[1],
                     )
                     cursor += reg[1]
                     visual += reg[1]
                 else:
                     app.log.error("invalid grammar index")
-            self.parserNodes.append(child)
+            nodes.append(child)
         self.resumeAtRow = len(self.rows)
 
     def _print_last_node(self, msg):
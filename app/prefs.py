@@ -17,6 +17,7 @@ from __future__ import division
 from __future__ import print_function
 
 import curses
+import hashlib
 import io
 import json
 import os
@@ -117,7 +118,33 @@ class Prefs:
         return file_prefs and file_prefs.get(u"tabToSpaces")
 
     def get_grammar(self, fileType):
-        return self.grammars.get(fileType)
+        grammar = self.grammars.get(fileType)
+        if grammar is not None:
+            self.compile_grammar(grammar)
+        return grammar
+
+    def compile_grammar(self, grammar):
+        """Compile the "matchRe" of |grammar| and of each grammar reachable
+        from it (through "contains" and "next"), if not already compiled.
+
+        Compiling every grammar up front slows startup, and a session tends to
+        use only a few of them.
+
+        Returns:
+          The "matchRe" of |grammar|.
+        """
+        pending = [grammar]
+        while pending:
+            g = pending.pop()
+            if g.get("matchRe") is not None:
+                continue
+            # The parser searches from a position within the document, so a
+            # '^' in a marker must match at the start of any line.
+            g["matchRe"] = re.compile(
+                app.regex.join_re_list(g["markers"]), re.MULTILINE
+            )
+            pending.extend(i for i in g["matchGrammars"] if i is not None)
+        return grammar["matchRe"]
 
     def save(self, category, label, value):
         app.log.info(category, label, value)
@@ -143,9 +170,15 @@ class Prefs:
 
     def __set_up_grammars(self, defaultGrammars):
         self.grammars = {}
+        # The grammars indexed by their "id". Parser nodes refer to a grammar by
+        # this (small int) id rather than holding a reference to the dict.
+        self.grammarTable = []
         # Arrange all the grammars by name.
-        for k, v in defaultGrammars.items():
+        for k in sorted(defaultGrammars.keys()):
+            v = defaultGrammars[k]
             v["name"] = k
+            v["id"] = len(self.grammarTable)
+            self.grammarTable.append(v)
             self.grammars[k] = v
 
         # Compile regexes for each grammar.
@@ -211,7 +244,12 @@ class Prefs:
             # Carriage return characters are at index [-1] in markers.
             markers.append(r"\n")
             # app.log.startup('markers', v['name'], markers)
-            v["matchRe"] = re.compile(app.regex.join_re_list(markers))
+            # The "matchRe" is compiled when the grammar is first used (see
+            # compile_grammar()). The grammar dicts are shared by each Prefs,
+            # so keep one compiled for another Prefs unless the markers differ
+            # (e.g. the parser set a dynamic end, see app.parser._set_end_key).
+            if v.get("markers") != markers:
+                v.pop("matchRe", None)
             v["markers"] = markers
             v["matchGrammars"] = matchGrammars
             containsGrammarIndexLimit = 2 + len(v.get("contains", []))
@@ -229,6 +267,23 @@ class Prefs:
                 specialIndexLimit,
             )
 
+        # Identify the grammar definitions, so that a stored parse (see
+        # app.parse_cache) made with other definitions isn't used.
+        grammarDefinitions = [
+            (
+                v["name"],
+                v["markers"],
+                v["indexLimits"],
+                [g and g["name"] for g in v["matchGrammars"]],
+                v.get("end_key"),
+                v.get("end"),
+            )
+            for v in self.grammarTable
+        ]
+        self.grammarVersion = hashlib.sha1(
+            repr(grammarDefinitions).encode("utf-8")
+        ).hexdigest()
+
         # Reset the re.cache for user regexes.
         re.purge()
 
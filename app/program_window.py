@@ -19,7 +19,6 @@ from __future__ import print_function
 import curses
 import os
 import signal
-import sys
 
 import app.curses_util
 import app.debug_window
@@ -314,9 +313,10 @@ class ProgramWindow(app.window.ActiveWindow):
 
     def handle_screen_resize(self, window):
         # app.log.debug('handle_screen_resize -----------------------')
-        if sys.platform == "darwin":
-            # Some terminals seem to resize the terminal and others leave it
-            # to the application to resize the curses terminal.
+        if app.curses_util.terminalResized:
+            # The resize was caught by hack_curses_fixes() rather than curses,
+            # so curses needs to be told the new size.
+            app.curses_util.terminalResized = False
             rows, cols = app.curses_util.terminal_size()
             curses.resizeterm(rows, cols)
         self.top = self.left = 0
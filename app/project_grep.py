@@ -0,0 +1,452 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Search the files under a directory (e.g. a project) for a regex.
+
+The directory tree is walked in a thread and the files are searched in
+batches in the process pool of app.parallel_parse. Each file is mapped into
+memory (mmap) and searched with a bytes regex, so it isn't decoded as a whole.
+The results arrive as each batch is done (see ProjectGrep.take_results()).
+
+If the directory has a trigram index (see app.trigram_index), the files that
+the index shows can't match are skipped, and the index is brought up to date
+after the search.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+try:
+    unicode
+except NameError:
+    unicode = str
+    unichr = chr
+
+import collections
+import fnmatch
+import io
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+
+import app.config
+import app.log
+import app.parallel_parse
+import app.trigram_index
+
+# The walk (os.scandir()) and the process pool (see app.parallel_parse) need
+# Python 3.
+kIsSupported = sys.version_info[0] >= 3
+# Directories that are never searched.
+kIgnoredDirectories = frozenset(
+    (u".git", u".hg", u".svn", u"__pycache__", u"node_modules")
+)
+# A file with a NUL character in the first |kBinaryCheckLength| bytes is
+# treated as binary (and isn't searched).
+kBinaryCheckLength = 8192
+# The number of files searched by each worker task.
+kBatchLength = 32
+# Stop searching once this many matching lines are found.
+kMaxResults = 10000
+# The line text in a result is cut off at this length.
+kMaxLineLength = 300
+
+
+def _ignore_patterns(dirPath):
+    """Read the name patterns from the .gitignore file in |dirPath|.
+
+    Only the simple patterns (matched against a file or directory name) are
+    used; negation ('!') isn't supported.
+    """
+    patterns = []
+    try:
+        with io.open(
+            os.path.join(dirPath, u".gitignore"), encoding=u"utf-8", errors=u"replace"
+        ) as f:
+            for line in f:
+                line = line.strip()
+                if line and line[0] not in u"#!":
+                    patterns.append(line.strip(u"/"))
+    except (IOError, OSError):
+        pass
+    return patterns
+
+
+def walk(root):
+    """Yield the paths of the files under |root|, skipping the ignored ones."""
+    stack = [(root, [])]
+    while stack:
+        dirPath, patterns = stack.pop()
+        patterns = patterns + _ignore_patterns(dirPath)
+        try:
+            entries = sorted(os.scandir(dirPath), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            name = entry.name
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in kIgnoredDirectories:
+                        subdirectories.append((entry.path, patterns))
+                elif entry.is_file():
+                    yield entry.path
+            except OSError:
+                pass
+        # Pop the subdirectories in order.
+        stack.extend(reversed(subdirectories))
+
+
+def grep_files(pattern, flags, paths):
+    """Search the files at |paths| for the (bytes) regex |pattern|.
+
+    This is run in a worker process.
+
+    Returns:
+        A list of (path, row, col, lineText) for the first match on each line
+        that has a match. |row| and |col| are zero based.
+    """
+    regex = re.compile(pattern, flags)
+    results = []
+    for path in paths:
+        try:
+            with open(path, u"rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    continue
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            continue
+        try:
+            if data.find(b"\0", 0, kBinaryCheckLength) == -1:
+                _grep_data(regex, path, data, results)
+        finally:
+            data.close()
+    return results
+
+
+def _grep_data(regex, path, data, results):
+    """Add the matching lines of |data| to |results| (see grep_files())."""
+    size = len(data)
+    row = 0
+    # The offset of the start of |row|.
+    rowBegin = 0
+    pos = 0
+    while pos <= size:
+        found = regex.search(data, pos)
+        if found is None:
+            break
+        begin = found.start()
+        lineBegin = data.rfind(b"\n", rowBegin, begin) + 1 or rowBegin
+        row += data[rowBegin:lineBegin].count(b"\n")
+        rowBegin = lineBegin
+        lineEnd = data.find(b"\n", begin)
+        if lineEnd == -1:
+            lineEnd = size
+        line = data[lineBegin : min(lineEnd, lineBegin + kMaxLineLength)]
+        # The column is counted in the whole line, since |line| may be cut off
+        # before the match.
+        col = len(data[lineBegin:begin].decode(u"utf-8", u"replace"))
+        results.append(
+            (path, row, col, line.decode(u"utf-8", u"replace").rstrip(u"\r"))
+        )
+        # Only the first match on each line is reported.
+        pos = lineEnd + 1
+
+
+def index_files(root, stats):
+    """Read the trigrams of some files under |root|.
+
+    This is run in a worker process.
+
+    Args:
+        root (unicode): the indexed directory.
+        stats (list): of (name, mtime, size) for each file, with the name
+            relative to |root|.
+
+    Returns:
+        A segment of the index. See app.trigram_index.make_segment().
+    """
+    entries = []
+    for name, mtime, size in stats:
+        try:
+            with open(os.path.join(root, name), u"rb") as f:
+                data = f.read(app.trigram_index.kMaxIndexedLength)
+        except (IOError, OSError):
+            continue
+        if data.find(b"\0", 0, kBinaryCheckLength) != -1:
+            # Binary files aren't searched, so there is nothing to find.
+            data = b""
+        entries.append((name, mtime, size, app.trigram_index.trigrams(data)))
+    return app.trigram_index.make_segment(entries)
+
+
+def update_index(index, pool, root, stats):
+    """Bring |index| up to date with the files under |root|.
+
+    Args:
+        index (TrigramIndex): the index of |root|.
+        pool (multiprocessing.Pool): to read the files in.
+        root (unicode): the indexed directory.
+        stats (list): of (name, mtime, size) for each file under |root|.
+
+    Returns:
+        The number of files read.
+    """
+    with index.lock:
+        if index.needs_rebuild():
+            index.clear()
+        stale = index.stale(stats)
+        pending = []
+        batch = []
+        batchBytes = 0
+        for entry in stale:
+            batch.append(entry)
+            batchBytes += entry[2]
+            if (
+                len(batch) >= app.trigram_index.kSegmentFiles
+                or batchBytes >= app.trigram_index.kSegmentBytes
+            ):
+                pending.append(pool.apply_async(index_files, (root, batch)))
+                batch = []
+                batchBytes = 0
+        if batch:
+            pending.append(pool.apply_async(index_files, (root, batch)))
+        for result in pending:
+            index.add_segment(result.get())
+        index.save()
+    return len(stale)
+
+
+class ProjectGrep(object):
+    """A search of the files under a directory.
+
+    The results are gathered in the background; call take_results() to get
+    those that have arrived.
+    """
+
+    def __init__(self, root, pattern, flags, onResults=None, indexDirectory=None):
+        """
+        Args:
+            root (unicode): the directory to search.
+            pattern (unicode): a regex.
+            flags (int): re flags.
+            onResults (function): called (from another thread) when more
+                results arrive or the search is done.
+            indexDirectory (unicode): where the trigram indexes are kept, or
+                None to not use an index.
+        """
+        if app.config.strict_debug:
+            assert isinstance(root, unicode)
+            assert isinstance(pattern, unicode)
+        self.root = root
+        self.pattern = pattern.encode(u"utf-8")
+        self.flags = flags
+        self.onResults = onResults
+        self.indexDirectory = indexDirectory
+        # Lists of results, appended by the pool's result thread.
+        self._arrived = collections.deque()
+        self._submitted = 0
+        self._completed = 0
+        self._walked = False
+        self.cancelled = False
+        self.fileCount = 0
+        self.resultCount = 0
+        # The files not searched because the index shows they can't match.
+        self.skippedCount = 0
+
+    def start(self):
+        """Begin searching. Raises re.error if the pattern isn't valid."""
+        re.compile(self.pattern, self.flags)
+        pool = app.parallel_parse.get_pool()
+        thread = threading.Thread(target=self._walk, args=(pool,))
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        """Stop looking for more files to search."""
+        self.cancelled = True
+
+    def is_done(self):
+        """Whether all the results have arrived."""
+        return self._walked and self._completed == self._submitted
+
+    def take_results(self):
+        """Get the results that have arrived (since the last call).
+
+        Returns:
+            A list of (path, row, col, lineText). See grep_files().
+        """
+        results = []
+        while self._arrived:
+            results.extend(self._arrived.popleft())
+        return results
+
+    def _walk(self, pool):
+        index = None
+        try:
+            if self.indexDirectory is not None:
+                index = app.trigram_index.get_index(self.indexDirectory, self.root)
+                if not index.exists():
+                    index = None
+            stats = self._submit_files(pool, index)
+        except Exception as e:
+            app.log.exception(e)
+            index = None
+        finally:
+            # Let is_done() be True even if the walk failed.
+            self._walked = True
+            self._notify()
+        if index is not None and not self.cancelled:
+            try:
+                update_index(index, pool, self.root, stats)
+            except Exception as e:
+                app.log.exception(e)
+
+    def _submit_files(self, pool, index):
+        """Submit the files under |self.root| for searching, skipping those
+        that |index| (if not None) shows can't match.
+
+        Returns:
+            A list of (name, mtime, size) of the files seen (for updating the
+            index), or None if there's no |index|.
+        """
+        stats = None
+        if index is not None:
+            with index.lock:
+                unmatched = index.unmatched_files(
+                    self.pattern.decode(u"utf-8"), self.flags
+                )
+            prefix = os.path.join(self.root, u"")
+            stats = []
+        batch = []
+        for path in walk(self.root):
+            if self.cancelled:
+                break
+            if index is not None:
+                try:
+                    fileStat = os.stat(path)
+                except OSError:
+                    continue
+                name = path[len(prefix) :]
+                stamp = (fileStat.st_mtime, fileStat.st_size)
+                stats.append((name,) + stamp)
+                if unmatched.get(name) == stamp:
+                    self.skippedCount += 1
+                    continue
+            batch.append(path)
+            if len(batch) >= kBatchLength:
+                self._submit(pool, batch)
+                batch = []
+        if batch and not self.cancelled:
+            self._submit(pool, batch)
+        return stats
+
+    def _submit(self, pool, paths):
+        try:
+            pool.apply_async(
+                grep_files,
+                (self.pattern, self.flags, paths),
+                callback=self._on_batch,
+                error_callback=self._on_error,
+            )
+        except ValueError as e:
+            # The pool was shut down (e.g. the program is exiting).
+            app.log.info(u"project grep stopped", e)
+            self.cancel()
+            return
+        self._submitted += 1
+        self.fileCount += len(paths)
+
+    def _on_batch(self, results):
+        self.resultCount += len(results)
+        if self.resultCount >= kMaxResults:
+            self.cancel()
+        self._arrived.append(results)
+        self._completed += 1
+        self._notify()
+
+    def _on_error(self, error):
+        app.log.error(u"project grep", error)
+        self._completed += 1
+        self._notify()
+
+    def _notify(self):
+        if self.onResults is not None:
+            self.onResults()
+
+
+class IndexUpdate(object):
+    """Create or update the trigram index of a directory, in the background.
+
+    See app.trigram_index.
+    """
+
+    def __init__(self, root, indexDirectory, onDone=None):
+        """
+        Args:
+            root (unicode): the directory to index.
+            indexDirectory (unicode): where the trigram indexes are kept.
+            onDone (function): called (from another thread) when done.
+        """
+        if app.config.strict_debug:
+            assert isinstance(root, unicode)
+            assert isinstance(indexDirectory, unicode)
+        self.root = root
+        self.indexDirectory = indexDirectory
+        self.onDone = onDone
+        self.done = False
+        self.error = None
+        self.fileCount = 0
+        self.readCount = 0
+        self.seconds = 0.0
+        self.indexBytes = 0
+
+    def start(self):
+        pool = app.parallel_parse.get_pool()
+        thread = threading.Thread(target=self._run, args=(pool,))
+        thread.daemon = True
+        thread.start()
+
+    def is_done(self):
+        return self.done
+
+    def _run(self, pool):
+        startTime = time.time()
+        try:
+            index = app.trigram_index.get_index(self.indexDirectory, self.root)
+            prefix = os.path.join(self.root, u"")
+            stats = []
+            for path in walk(self.root):
+                try:
+                    fileStat = os.stat(path)
+                except OSError:
+                    continue
+                stats.append(
+                    (path[len(prefix) :], fileStat.st_mtime, fileStat.st_size)
+                )
+            self.fileCount = len(stats)
+            self.readCount = update_index(index, pool, self.root, stats)
+            self.indexBytes = index.size_bytes()
+        except Exception as e:
+            app.log.exception(e)
+            self.error = e
+        self.seconds = time.time() - startTime
+        self.done = True
+        if self.onDone is not None:
+            self.onDone()
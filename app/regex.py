@@ -75,6 +75,9 @@ kNumbersRegex = (
 )
 kReNumbers = re.compile(kNumbersRegex)
 
+# A character with a special meaning in a regex.
+kReRegexSpecial = re.compile(u"[\\\\.^$*+?{}\\[\\]|()]")
+
 # Trivia: all English contractions except 'sup, 'tis and 'twas will
 # match this regex (with re.I):  [adegIlnotuwy]'[acdmlsrtv]
 # The prefix part of that is used in the expression below to identify
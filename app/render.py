@@ -16,6 +16,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import app.curses_util
+
 
 class Frame:
     def __init__(self):
@@ -40,3 +42,179 @@ class Frame:
         self.cursor = None
         self.cmdCount = None
         return r
+
+
+# Marks the second cell of a double wide character in a ScreenGrid row.
+kWideTail = u"\uffff"
+# Marks a cell with unknown content (e.g. after a resize).
+kUnknown = u"\ufffe"
+# Changed cells this close together are drawn as one span (each span costs a
+# cursor movement).
+kMergeGap = 4
+
+
+class ScreenGrid:
+    """The text and style of each screen cell, as last drawn.
+
+    A frame draws the whole screen. Applying it to the grid finds the cells
+    that changed, so that only those are sent to curses (e.g. nothing other
+    than the cursor when only the cursor moved).
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.cols = 0
+        # Per row: a string with one character per cell, and a list of styles.
+        self.texts = []
+        self.styles = []
+        # The number of cells drawn for the most recent frame, and in total.
+        self.cellCount = 0
+        self.totalCellCount = 0
+
+    def reset(self, rows, cols):
+        """Forget the screen contents (everything is drawn in the next frame).
+
+        Returns:
+          None.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.texts = [kUnknown * cols] * rows
+        self.styles = [[None] * cols for _ in range(rows)]
+
+    def _to_cells(self, col, text):
+        """Get |text| as one character per cell, or None if the cells of |text|
+        can't be determined (e.g. control characters). The |text| is clipped at
+        the right edge of the screen."""
+        if not app.curses_util.is_single_width(text):
+            if app.curses_util.kControlRe.search(text) is not None:
+                return None
+            text = app.curses_util.kDoubleWideRe.sub(u"\\g<0>" + kWideTail, text)
+        if col + len(text) > self.cols:
+            text = text[: self.cols - col]
+            if text.endswith(kWideTail) or not text:
+                return text
+            if app.curses_util.is_double_width(text[-1]):
+                # Half of the character wouldn't fit.
+                return None
+        return text
+
+    def update(self, drawList, rows, cols):
+        """Apply the (row, col, text, style) tuples of |drawList| to the grid.
+
+        Args:
+          drawList (list): The frame, as tuples to draw in order.
+          rows (int): The screen height.
+          cols (int): The screen width.
+
+        Returns:
+          A list of (row, col, text, style) tuples to draw (in order) to update
+          the screen.
+        """
+        if rows != self.rows or cols != self.cols:
+            self.reset(rows, cols)
+        texts = self.texts
+        oldTexts = list(texts)
+        oldStyles = self.styles
+        styles = list(oldStyles)
+        rawRows = {}
+        cellLists = []
+        for draw in drawList:
+            row, col, text, style = draw
+            cells = None
+            if 0 <= row < rows and 0 <= col < cols:
+                cells = self._to_cells(col, text)
+            if cells is None:
+                # Draw the whole row as it comes, and forget its contents.
+                rawRows[row] = []
+            cellLists.append((draw, cells))
+        for draw, cells in cellLists:
+            row, col, text, style = draw
+            if row in rawRows:
+                # Keep the drawList order, since a later draw may overwrite an
+                # earlier one.
+                rawRows[row].append(draw)
+                continue
+            end = col + len(cells)
+            rowText = texts[row]
+            before = rowText[:col]
+            after = rowText[end:]
+            # Overwriting half of a double wide character leaves a space.
+            if before and rowText[col] == kWideTail:
+                before = before[:-1] + u" "
+            if after and after[0] == kWideTail:
+                after = u" " + after[1:]
+            texts[row] = before + cells + after
+            if styles[row] is oldStyles[row]:
+                styles[row] = list(oldStyles[row])
+            styles[row][col:end] = [style] * (end - col)
+        self.styles = styles
+        output = []
+        cellCount = 0
+        for row in range(rows):
+            if row in rawRows:
+                texts[row] = kUnknown * cols
+                styles[row] = [None] * cols
+                draws = rawRows[row]
+                output += draws
+                cellCount += sum(
+                    app.curses_util.column_width(i[2])
+                    for i in draws
+                    if not isinstance(i[2], bytes)
+                )
+                continue
+            if texts[row] == oldTexts[row] and styles[row] == oldStyles[row]:
+                continue
+            for begin, end in self._changed_spans(
+                oldTexts[row], oldStyles[row], texts[row], styles[row]
+            ):
+                rowText = texts[row]
+                rowStyles = styles[row]
+                # Draw a run of each style.
+                runBegin = begin
+                for i in range(begin + 1, end + 1):
+                    if i == end or rowStyles[i] != rowStyles[runBegin]:
+                        output.append(
+                            (
+                                row,
+                                runBegin,
+                                rowText[runBegin:i].replace(kWideTail, u""),
+                                rowStyles[runBegin],
+                            )
+                        )
+                        runBegin = i
+                cellCount += end - begin
+        self.cellCount = cellCount
+        self.totalCellCount += cellCount
+        return output
+
+    def _changed_spans(self, oldText, oldStyles, text, styles):
+        """Get the (begin, end) cell ranges that differ, avoiding unknown cells
+        and splitting no double wide character."""
+        spans = []
+        cols = len(text)
+        i = 0
+        while i < cols:
+            if (
+                text[i] == oldText[i] and styles[i] == oldStyles[i]
+            ) or text[i] == kUnknown:
+                i += 1
+                continue
+            begin = i
+            if text[begin] == kWideTail:
+                begin -= 1
+            end = i + 1
+            gap = 0
+            i += 1
+            while i < cols and gap <= kMergeGap and text[i] != kUnknown:
+                if text[i] == oldText[i] and styles[i] == oldStyles[i]:
+                    gap += 1
+                else:
+                    gap = 0
+                    end = i + 1
+                i += 1
+            if end < cols and text[end] == kWideTail:
+                end += 1
+            spans.append((begin, end))
+            i = end
+        return spans
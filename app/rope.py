@@ -0,0 +1,225 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Document text storage that is cheap to edit.
+
+The text is held as a list of bounded size chunks. A Fenwick tree (binary
+indexed tree) over the chunk lengths maps a document offset to a chunk in
+O(log n), so an insert or delete only rebuilds a single chunk string rather
+than the whole document.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+try:
+    unicode
+except NameError:
+    unicode = str
+    unichr = chr
+
+import app.config
+
+# The number of characters in a chunk created from bulk text. Chunks grow with
+# edits and are split again once they exceed twice this size.
+kChunkSize = 4096
+
+
+def _split(text):
+    """Break |text| into a list of chunks (an empty list for empty text)."""
+    return [text[i : i + kChunkSize] for i in range(0, len(text), kChunkSize)]
+
+
+class Rope(object):
+    """A sequence of characters with O(log n) positional edits.
+
+    A flat string of the whole document is only built when text() is called
+    and is cached until the next edit.
+    """
+
+    def __init__(self, text=u""):
+        self._chunks = []
+        # Fenwick tree of chunk lengths. Index zero is unused.
+        self._tree = [0]
+        # The highest power of two <= len(self._chunks).
+        self._topBit = 0
+        self._length = 0
+        # Cache of the flat text (or None if it needs to be rebuilt).
+        self._flat = None
+        self.set_text(text)
+
+    def __len__(self):
+        return self._length
+
+    def char_at(self, offset):
+        """Get the character at |offset|. Raises IndexError if |offset| is
+        outside the document (like indexing a string)."""
+        if self._flat is not None:
+            return self._flat[offset]
+        if offset < 0:
+            offset += self._length
+        if not 0 <= offset < self._length:
+            raise IndexError(offset)
+        index, start = self._locate(offset)
+        return self._chunks[index][offset - start]
+
+    def delete(self, begin, end):
+        """Remove the characters in the range [begin, end)."""
+        if app.config.strict_debug:
+            assert 0 <= begin <= self._length, (begin, self._length)
+        end = min(end, self._length)
+        if begin >= end:
+            return
+        chunks = self._chunks
+        beginIndex, beginStart = self._locate(begin)
+        endIndex, endStart = self._locate(end)
+        self._length -= end - begin
+        self._flat = None
+        if beginIndex == endIndex:
+            chunk = chunks[beginIndex]
+            chunk = chunk[: begin - beginStart] + chunk[end - beginStart :]
+            if chunk:
+                chunks[beginIndex] = chunk
+                self._update_index(beginIndex, begin - end)
+            else:
+                del chunks[beginIndex]
+                self._rebuild_index()
+            return
+        head = chunks[beginIndex][: begin - beginStart]
+        tail = chunks[endIndex][end - endStart :] if endIndex < len(chunks) else u""
+        if endIndex == beginIndex + 1 and head and tail:
+            # Spanning a single chunk boundary; adjust both chunks in place.
+            self._update_index(beginIndex, len(head) - len(chunks[beginIndex]))
+            self._update_index(endIndex, len(tail) - len(chunks[endIndex]))
+            chunks[beginIndex] = head
+            chunks[endIndex] = tail
+            return
+        merged = head + tail
+        chunks[beginIndex : endIndex + 1] = _split(merged)
+        self._rebuild_index()
+
+    def insert(self, offset, text):
+        """Insert |text| before the character at |offset|."""
+        if app.config.strict_debug:
+            assert isinstance(text, unicode)
+            assert 0 <= offset <= self._length, (offset, self._length)
+        if not text:
+            return
+        chunks = self._chunks
+        if not chunks:
+            self.set_text(text)
+            return
+        index, start = self._locate(offset)
+        if index == len(chunks):
+            # Appending to the end of the document.
+            index -= 1
+            start -= len(chunks[index])
+        chunk = chunks[index]
+        local = offset - start
+        chunk = chunk[:local] + text + chunk[local:]
+        self._length += len(text)
+        self._flat = None
+        if len(chunk) > 2 * kChunkSize:
+            chunks[index : index + 1] = _split(chunk)
+            self._rebuild_index()
+        else:
+            chunks[index] = chunk
+            self._update_index(index, len(text))
+
+    def set_text(self, text):
+        """Replace the entire document with |text|."""
+        if app.config.strict_debug:
+            assert isinstance(text, unicode), type(text)
+        if text is self._flat:
+            # Setting the same data again (e.g. a reparse); nothing to do.
+            return
+        self._chunks = _split(text)
+        self._length = len(text)
+        self._flat = text
+        self._rebuild_index()
+
+    def slice(self, begin, end=None):
+        """Get the text in the range [begin, end). Like a string slice, the
+        range is clipped to the document; negative values are not supported."""
+        length = self._length
+        if end is None or end > length:
+            end = length
+        if begin >= end:
+            return u""
+        if self._flat is not None:
+            return self._flat[begin:end]
+        chunks = self._chunks
+        index, start = self._locate(begin)
+        chunk = chunks[index]
+        if end - start <= len(chunk):
+            return chunk[begin - start : end - start]
+        out = [chunk[begin - start :]]
+        start += len(chunk)
+        while start < end:
+            index += 1
+            chunk = chunks[index]
+            out.append(chunk[: end - start])
+            start += len(chunk)
+        return u"".join(out)
+
+    def text(self):
+        """Get the whole document as a single string. This is O(n) after an
+        edit and O(1) otherwise."""
+        if self._flat is None:
+            self._flat = u"".join(self._chunks)
+        return self._flat
+
+    def _locate(self, offset):
+        """Find the chunk containing |offset|.
+
+        Returns:
+            (index, start) where |index| is an index into self._chunks and
+            |start| is the document offset of the first character in that
+            chunk. If |offset| is the length of the document then |index| is
+            len(self._chunks).
+        """
+        tree = self._tree
+        size = len(tree)
+        index = 0
+        remaining = offset
+        bit = self._topBit
+        while bit:
+            probe = index + bit
+            if probe < size and tree[probe] <= remaining:
+                index = probe
+                remaining -= tree[probe]
+            bit >>= 1
+        return index, offset - remaining
+
+    def _rebuild_index(self):
+        """Rebuild the Fenwick tree after chunks are added or removed."""
+        tree = [0]
+        tree.extend(len(chunk) for chunk in self._chunks)
+        size = len(tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        count = len(self._chunks)
+        self._topBit = 1 << (count.bit_length() - 1) if count else 0
+
+    def _update_index(self, index, delta):
+        """Adjust the length of chunk |index| by |delta|."""
+        tree = self._tree
+        size = len(tree)
+        i = index + 1
+        while i < size:
+            tree[i] += delta
+            i += i & -i
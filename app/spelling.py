@@ -17,13 +17,18 @@ from __future__ import division
 from __future__ import print_function
 
 import bisect
+import collections
 import glob
 import io
+import itertools
 import os
 import re
 
 import app.log
 
+# The number of is_correct() results kept (least recently used are dropped).
+kVerdictCacheSize = 20000
+
 
 class OsDictionary:
     def __init__(self):
@@ -86,60 +91,147 @@ class OsDictionary:
             return False
 
 
+def read_words(path):
+    """Get the words listed in the file at |path|.
+
+    Returns:
+        A list of words (unicode).
+    """
+    with io.open(path, "r") as f:
+        text = f.read()
+    # Skip the leading comment lines.
+    index = 0
+    while text.startswith(u"#", index):
+        index = text.find(u"\n", index) + 1 or len(text)
+    # TODO(dschuyler): Word contractions are hacked by storing
+    # the components of the contraction. So didn, doesn, and isn
+    # are considered 'words'.
+    words = text[index:].replace(u"'", u" ").split()
+    app.log.startup(len(words), "words from", path)
+    return words
+
+
+class WordList:
+    """A set of words, read from one or more word files on first use.
+
+    Rather than a set of separate strings, the words are kept in fewer, larger
+    strings: one for each three letter prefix, holding the words that begin
+    with it, each surrounded by new lines. That takes a fraction of the memory
+    and a lookup searches only the string for its prefix.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+        # The words by prefix, e.g. {u"cat": u"\ncat\ncats\n"}. None until
+        # loaded.
+        self.buckets = None
+        self.count = 0
+
+    def __contains__(self, word):
+        if self.buckets is None:
+            self.load()
+        bucket = self.buckets.get(word[:3])
+        return bucket is not None and (u"\n" + word + u"\n") in bucket
+
+    def __len__(self):
+        if self.buckets is None:
+            self.load()
+        return self.count
+
+    def load(self):
+        words = set()
+        for path in self.paths:
+            words.update(read_words(path))
+        words.discard(u"")
+        self.buckets = {
+            k: u"\n%s\n" % (u"\n".join(v),)
+            for k, v in itertools.groupby(sorted(words), lambda w: w[:3])
+        }
+        self.count = len(words)
+
+
 class Dictionary:
     def __init__(self, dictionaryList, pathPrefs):
         self.osDictionary = OsDictionary()
+        self.dictionaryList = dictionaryList
         self.pathPrefs = pathPrefs
+        # The pathPrefs keys that match a path (its profile), by path.
+        self.pathProfiles = {}
+        # The extra words allowed for each path profile.
+        self.profileWords = {}
+        # is_correct() results by (word, grammarName, path profile), oldest
+        # first.
+        self.verdicts = collections.OrderedDict()
 
+        # The word file for each grammar (or other) name.
+        self.wordPaths = {}
+        # The words of each grammar, read on first use.
         self.grammarWords = {}
         self.load_words(os.path.dirname(__file__))
         self.load_words(os.path.expanduser("~/.ci_edit/dictionaries"))
-
-        words = set()
-        for i in dictionaryList:
-            words.update(self.grammarWords.get(i, set()))
-        self.baseWords = words
-        self.pathWords = set()
+        self.pathProfile = ()
+        self.pathWords = WordList([])
 
     def set_up_words_for_path(self, path):
-        self.pathWords = set()
-        # app.log.info(repr(self.pathPrefs))
-        for k, v in self.pathPrefs.items():
-            if k in path:
-                for i in v:
-                    self.pathWords.update(self.grammarWords.get(i, set()))
+        profile = self.pathProfiles.get(path)
+        if profile is None:
+            # app.log.info(repr(self.pathPrefs))
+            profile = tuple(sorted(k for k in self.pathPrefs if k in path))
+            self.pathProfiles[path] = profile
+        words = self.profileWords.get(profile)
+        if words is None:
+            words = self.word_list([i for k in profile for i in self.pathPrefs[k]])
+            self.profileWords[profile] = words
+        self.pathProfile = profile
+        self.pathWords = words
 
     def load_words(self, dirPath):
+        """Use the word files in |dirPath| (in place of those with the same
+        names found before). The files are read when the words are needed."""
+        # The prior results may differ with the new words.
+        self.profileWords.clear()
+        self.verdicts.clear()
         dirPath = os.path.join(dirPath, "dictionary.")
         for path in glob.iglob(dirPath + "*.words"):
             if os.path.isfile(path):
                 grammarName = path[len(dirPath) : -len(".words")]
-                with io.open(path, "r") as f:
-                    lines = f.readlines()
-                    index = 0
-                    while not len(lines[index]) or lines[index][0] == "#":
-                        index += 1
-                    app.log.startup(len(lines) - index, "words from", path)
-                    # TODO(dschuyler): Word contractions are hacked by storing
-                    # the components of the contraction. So didn, doesn, and isn
-                    # are considered 'words'.
-                    self.grammarWords[grammarName] = set(
-                        [
-                            p
-                            for l in lines[index:]
-                            for w in l.split()
-                            for p in w.split("'")
-                        ]
-                    )
+                self.wordPaths[grammarName] = path
+        self.grammarWords = {}
+        self.baseWords = self.word_list(self.dictionaryList)
+
+    def word_list(self, names):
+        """Get a WordList of the words for each of the |names|."""
+        return WordList([self.wordPaths[i] for i in names if i in self.wordPaths])
+
+    def grammar_words(self, grammarName):
+        words = self.grammarWords.get(grammarName)
+        if words is None:
+            words = self.word_list([grammarName])
+            self.grammarWords[grammarName] = words
+        return words
 
     def is_correct(self, word, grammarName):
+        """Whether |word| is spelled correctly (within |grammarName| and the path
+        set by set_up_words_for_path())."""
+        key = (word, grammarName, self.pathProfile)
+        verdicts = self.verdicts
+        verdict = verdicts.pop(key, None)
+        if verdict is None:
+            verdict = self._check_word(word, grammarName)
+            if len(verdicts) >= kVerdictCacheSize:
+                verdicts.popitem(last=False)
+        # (Re)insert as the most recently used.
+        verdicts[key] = verdict
+        return verdict
+
+    def _check_word(self, word, grammarName):
         if len(word) <= 1:
             return True
         words = self.baseWords
         lowerWord = word.lower()
         if word in words or lowerWord in words:
             return True
-        if lowerWord in self.grammarWords.get(grammarName, set()):
+        if lowerWord in self.grammar_words(grammarName):
             return True
         if lowerWord.startswith("sub") and lowerWord[3:] in words:
             return True
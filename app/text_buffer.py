@@ -17,16 +17,21 @@ from __future__ import division
 from __future__ import print_function
 
 import curses
+import os
 import re
 import sys
 
 import app.actions
+import app.buffer_file
 import app.curses_util
 import app.regex
 import app.log
 import app.parser
 import app.selectable
 
+# The "path:row:col" at the start of a project search result.
+kReGrepResult = re.compile(u"^(.+?:\\d+:\\d+):")
+
 
 class TextBuffer(app.actions.Actions):
     """The TextBuffer adds the drawing/rendering to the BackingTextBuffer."""
@@ -38,6 +43,9 @@ class TextBuffer(app.actions.Actions):
         self.highlightCursorLine = False
         self.highlightTrailingWhitespace = True
         self.shouldReparse = False
+        # Rows as drawn in the prior frame, by area (see draw_text_area()).
+        self.renderCache = {}
+        self.priorRenderCache = {}
 
     def check_scroll_to_cursor(self, window):
         """Move the selected view rectangle so that the cursor is visible."""
@@ -96,6 +104,9 @@ class TextBuffer(app.actions.Actions):
             self.check_scroll_to_cursor(window)
         rows, cols = window.rows, window.cols
         color_pref = self.view.color_pref
+        # Areas of the cache not drawn in this frame are dropped.
+        self.priorRenderCache = self.renderCache
+        self.renderCache = {}
         colorDelta = 32 * 4
         # colorDelta = 4
         if 0:
@@ -148,75 +159,40 @@ class TextBuffer(app.actions.Actions):
         startCol = self.view.scrollCol + left
         endCol = startCol + cols
         appPrefs = self.view.program.prefs
-        defaultColor = appPrefs.color["default"]
         spellChecking = appPrefs.editor.get("spellChecking", True)
         color_pref = self.view.color_pref
-        spelling = self.program.dictionary
-        spelling.set_up_words_for_path(self.fullPath)
         if self.parser:
-            # Highlight grammar.
+            # A row is drawn from the cache if neither its text nor its grammar
+            # changed. Rows not drawn this time are dropped from the cache.
+            areaKey = (
+                startCol,
+                endCol,
+                colorDelta,
+                spellChecking,
+                self.view,
+            )
+            priorCache = self.priorRenderCache.get(areaKey, {})
+            renderCache = {}
             rowLimit = min(max(self.parser.row_count() - startRow, 0), rows)
             for i in range(rowLimit):
-                line, renderedWidth = self.parser.row_text_and_width(startRow + i)
-                k = startCol
-                if k == 0:
-                    # When rendering from column 0 the grammar index is always
-                    # zero.
-                    grammarIndex = 0
+                row = startRow + i
+                line, renderedWidth = self.parser.row_text_and_width(row)
+                rowKey = (
+                    line,
+                    self.parser.row_grammar_key(row),
+                    self.parser.row_misspellings(row),
+                )
+                cached = priorCache.get(row)
+                if cached is not None and cached[0] == rowKey:
+                    spans = cached[1]
                 else:
-                    # When starting mid-line, find starting grammar index.
-                    grammarIndex = self.parser.grammar_index_from_row_col(
-                        startRow + i, k
-                    )
-                while k < endCol:
-                    (node, preceding, remaining, eol) = self.parser.grammar_at_index(
-                        startRow + i, k, grammarIndex
-                    )
-                    grammarIndex += 1
-                    if remaining == 0 and not eol:
-                        continue
-                    remaining = min(renderedWidth - k, remaining)
-                    length = min(endCol - k, remaining)
-                    color = color_pref(
-                        node.grammar.get(u"colorIndex", defaultColor), colorDelta
+                    spans = self.render_row(
+                        row, line, renderedWidth, startCol, endCol, colorDelta
                     )
-                    if eol or length <= 0:
-                        window.add_str(
-                            top + i, left + k - startCol, u" " * (endCol - k), color
-                        )
-                        break
-                    window.add_str(
-                        top + i,
-                        left + k - startCol,
-                        app.curses_util.rendered_sub_str(line, k, k + length),
-                        color,
-                    )
-                    subStart = k - preceding
-                    subEnd = k + remaining
-                    subLine = line[subStart:subEnd]
-                    if spellChecking and node.grammar.get(u"spelling", True):
-                        # Highlight spelling errors
-                        grammarName = node.grammar.get(u"name", "unknown")
-                        misspellingColor = color_pref(u"misspelling", colorDelta)
-                        for found in re.finditer(app.regex.kReSubwords, subLine):
-                            reg = found.regs[0]  # Mispelllled word
-                            offsetStart = subStart + reg[0]
-                            offsetEnd = subStart + reg[1]
-                            if startCol < offsetEnd and offsetStart < endCol:
-                                word = line[offsetStart:offsetEnd]
-                                if not spelling.is_correct(word, grammarName):
-                                    if startCol > offsetStart:
-                                        offsetStart += startCol - offsetStart
-                                    wordFragment = line[
-                                        offsetStart : min(endCol, offsetEnd)
-                                    ]
-                                    window.add_str(
-                                        top + i,
-                                        left + offsetStart - startCol,
-                                        wordFragment,
-                                        misspellingColor,
-                                    )
-                    k += length
+                renderCache[row] = (rowKey, spans)
+                for col, text, color in spans:
+                    window.add_str(top + i, left + col, text, color)
+            self.renderCache[areaKey] = renderCache
         else:
             # For testing, draw without parser.
             rowLimit = min(max(self.parser.row_count() - startRow, 0), rows)
@@ -235,6 +211,79 @@ class TextBuffer(app.actions.Actions):
                     self.penRow - startRow, self.penCol - startCol, u"X", 200
                 )
 
+    def render_row(self, row, line, renderedWidth, startCol, endCol, colorDelta):
+        """Get the grammar (and misspelling) highlighted spans of |row|.
+
+        Args:
+            row (int): the row index is zero based (so it's line number - 1).
+            line (unicode): the text of |row|.
+            renderedWidth (int): the column width of |line|.
+            startCol (int): the first column to draw.
+            endCol (int): draw up to (not including) this column.
+            colorDelta (int): added to the grammar colors.
+
+        Returns:
+            A list of (col, text, color) tuples to draw in order. |col| is
+            relative to |startCol|.
+        """
+        appPrefs = self.view.program.prefs
+        defaultColor = appPrefs.color["default"]
+        spellChecking = appPrefs.editor.get("spellChecking", True)
+        color_pref = self.view.color_pref
+        spans = []
+        k = startCol
+        if k == 0:
+            # When rendering from column 0 the grammar index is always zero.
+            grammarIndex = 0
+        else:
+            # When starting mid-line, find starting grammar index.
+            grammarIndex = self.parser.grammar_index_from_row_col(row, k)
+        while k < endCol:
+            (node, preceding, remaining, eol) = self.parser.grammar_at_index(
+                row, k, grammarIndex
+            )
+            grammarIndex += 1
+            if remaining == 0 and not eol:
+                continue
+            remaining = min(renderedWidth - k, remaining)
+            length = min(endCol - k, remaining)
+            color = color_pref(
+                node.grammar.get(u"colorIndex", defaultColor), colorDelta
+            )
+            if eol or length <= 0:
+                spans.append((k - startCol, u" " * (endCol - k), color))
+                break
+            spans.append(
+                (
+                    k - startCol,
+                    app.curses_util.rendered_sub_str(line, k, k + length),
+                    color,
+                )
+            )
+            k += length
+        if spellChecking:
+            # Highlight spelling errors (found by spell_check()).
+            misspellingColor = color_pref(u"misspelling", colorDelta)
+            singleWidth = app.curses_util.is_single_width(line)
+            for begin, end in self.parser.row_misspellings(row):
+                if not singleWidth:
+                    # Convert the offsets to columns.
+                    width = app.curses_util.column_width(line[begin:end])
+                    begin = app.curses_util.column_width(line[:begin])
+                    end = begin + width
+                if startCol < end and begin < endCol:
+                    begin = max(begin, startCol)
+                    spans.append(
+                        (
+                            begin - startCol,
+                            app.curses_util.rendered_sub_str(
+                                line, begin, min(end, endCol)
+                            ),
+                            misspellingColor,
+                        )
+                    )
+        return spans
+
     def draw_overlays(self, window, top, left, maxRow, maxCol, colorDelta):
         startRow = self.view.scrollRow + top
         endRow = self.view.scrollRow + top + maxRow
@@ -313,17 +362,42 @@ class TextBuffer(app.actions.Actions):
                 )
         if self.findRe is not None:
             # Highlight find.
+            matchIndex = self.parser.matchIndex
+            if matchIndex.pattern is not self.findRe:
+                matchIndex = None
+            foundColor = color_pref("found_find", colorDelta)
             for i in range(rowLimit):
-                line = self.parser.row_text(startRow + i)[startCol:endCol]
-                for k in self.findRe.finditer(line):
-                    reg = k.regs[0]
-                    # for ref in k.regs[1:]:
-                    window.add_str(
-                        top + i,
-                        left + reg[0],
-                        line[reg[0] : reg[1]],
-                        color_pref("found_find", colorDelta),
-                    )
+                line = self.parser.row_text(startRow + i)
+                spans = None
+                if matchIndex is not None:
+                    rowBegin = self.parser.data_offset(startRow + i, 0)
+                    if rowBegin is not None:
+                        spans = matchIndex.spans(rowBegin, rowBegin + len(line))
+                if spans is None:
+                    # Not indexed (yet), search the row.
+                    spans = [k.span() for k in self.findRe.finditer(line)]
+                else:
+                    spans = [
+                        (max(begin - rowBegin, 0), min(end - rowBegin, len(line)))
+                        for begin, end in spans
+                    ]
+                singleWidth = app.curses_util.is_single_width(line)
+                for begin, end in spans:
+                    if not singleWidth:
+                        # Convert the offsets to columns.
+                        width = app.curses_util.column_width(line[begin:end])
+                        begin = app.curses_util.column_width(line[:begin])
+                        end = begin + width
+                    if startCol < end and begin < endCol:
+                        begin = max(begin, startCol)
+                        window.add_str(
+                            top + i,
+                            left + begin - startCol,
+                            app.curses_util.rendered_sub_str(
+                                line, begin, min(end, endCol)
+                            ),
+                            foundColor,
+                        )
         if rowLimit and self.selectionMode != app.selectable.kSelectionNone:
             # Highlight selected text.
             colorSelected = color_pref("selected")
@@ -389,3 +463,117 @@ class TextBuffer(app.actions.Actions):
                                     line, startCol, endCol
                                 )
                                 window.add_str(top + i, left, text, colorSelected)
+
+
+class GrepResultsBuffer(TextBuffer):
+    """The results of a project search (see app.project_grep), as they arrive.
+
+    Each line is a "path:row:col: text" result, which may be opened (with a
+    double click or the "open" command).
+    """
+
+    def __init__(self, program, search):
+        TextBuffer.__init__(self, program)
+        self.search = search
+        self.resultCount = 0
+        self.reportedDone = False
+
+    def append_incoming(self):
+        search = self.search
+        results = search.take_results()
+        if results:
+            lines = []
+            for path, row, col, text in results:
+                if path.startswith(u"./"):
+                    path = path[2:]
+                lines.append(u"%s:%d:%d: %s\n" % (path, row + 1, col + 1, text))
+            self.resultCount += len(lines)
+            # The document always ends with an empty row.
+            self.parser.insert(self.parser.row_count() - 1, 0, u"".join(lines))
+        if not search.is_done():
+            return False
+        if not self.reportedDone:
+            self.reportedDone = True
+            if search.cancelled:
+                message = u"Stopped after {:,} results in {:,} files".format(
+                    self.resultCount, search.fileCount
+                )
+            else:
+                message = u"{:,} results in {:,} files".format(
+                    self.resultCount, search.fileCount
+                )
+            if search.skippedCount:
+                message += u" ({:,} skipped using the index)".format(
+                    search.skippedCount
+                )
+            self.set_message(message)
+        return True
+
+    def mouse_double_click(self, paneRow, paneCol, shift, ctrl, alt):
+        row = self.view.scrollRow + paneRow
+        if row < self.parser.row_count():
+            self.selection_none()
+            self.cursor_move_to(row, 0)
+            self.open_file_at_cursor()
+
+    def open_file_at_cursor(self):
+        """Open the file of the result on the pen row, at the match."""
+        found = kReGrepResult.match(self.parser.row_text(self.penRow))
+        if not found:
+            self.set_message(u"No search result on this line.")
+            return
+        path, openToRow, openToColumn = app.buffer_file.path_row_column(
+            found.group(1), self.program.prefs.editor[u"baseDirEnv"]
+        )
+        textBuffer = self.program.bufferManager.load_text_buffer(path)
+        if textBuffer is None:
+            self.set_message(u"Unable to open " + path)
+            return
+        if openToRow is not None:
+            textBuffer.penRow = openToRow if openToRow > 0 else 0
+        if openToColumn is not None:
+            textBuffer.penCol = openToColumn if openToColumn > 0 else 0
+            textBuffer.goalCol = textBuffer.penCol
+        view = self.view
+        view.set_text_buffer(textBuffer)
+        textBuffer.scroll_to_optimal_scroll_position()
+        textBuffer.set_message(u"Opened file {}".format(path))
+
+
+class IndexReportBuffer(TextBuffer):
+    """Reports on the update of a trigram index (see app.project_grep), once
+    it's done."""
+
+    def __init__(self, program, update):
+        TextBuffer.__init__(self, program)
+        self.update = update
+        self.reportedDone = False
+
+    def append_incoming(self):
+        update = self.update
+        if not update.is_done():
+            return False
+        if not self.reportedDone:
+            self.reportedDone = True
+            if update.error is not None:
+                message = u"Indexing failed: {}".format(update.error)
+                report = message + u"\n"
+            else:
+                message = u"Indexed {:,} files in {:.1f} seconds".format(
+                    update.fileCount, update.seconds
+                )
+                report = (
+                    u"Index of {}\n"
+                    u"{:,} files, {:,} read (new or changed)\n"
+                    u"{:.1f} seconds\n"
+                    u"{:.1f} MB on disk\n"
+                ).format(
+                    os.path.abspath(update.root),
+                    update.fileCount,
+                    update.readCount,
+                    update.seconds,
+                    update.indexBytes / (1024 * 1024),
+                )
+            self.parser.insert(0, 0, report)
+            self.set_message(message)
+        return True
@@ -0,0 +1,479 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+  A trigram index of the files under a directory, kept on disk, so that a
+  project search (see app.project_grep) only reads the files that may match.
+
+  The index records which (case folded) three byte sequences appear in each
+  file. The literal text that a regex requires is split into trigrams, and a
+  file missing any of them is skipped.
+
+  The index is made of segments, each covering a batch of files. A segment is
+  built in a worker process and written to its own file. An update adds
+  segments for the files that changed (by mtime and size) and drops the old
+  entries, so only the changed files are read again.
+"""
+
+# For Python 2to3 support.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+try:
+    unicode
+except NameError:
+    unicode = str
+    unichr = chr
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+import array
+import bisect
+import hashlib
+import os
+import re
+import threading
+
+import app.config
+import app.log
+
+# Change this when the stored index changes.
+kFormatVersion = 1
+# Larger files aren't indexed (they are always searched).
+kMaxIndexedLength = 1 << 24
+# The most files in a segment (a file is a byte within a segment's postings).
+kSegmentFiles = 256
+# Start a new segment once the files in it reach this many bytes.
+kSegmentBytes = 1 << 22
+# An inline flags group that enables verbose mode, e.g. "(?x)".
+kReVerboseFlags = re.compile(u"\\(\\?[a-zA-Z]*x")
+# A repeat count, e.g. "{2,}" (otherwise a "{" is a literal character).
+kReRepeat = re.compile(u"\\{\\d*,?\\d*\\}")
+
+# The loaded indexes, by (indexDirectory, root).
+_indexes = {}
+_indexesLock = threading.Lock()
+
+
+def trigrams(data):
+    """Get the set of trigrams in |data| (bytes), case folded (ASCII only).
+
+    Each trigram is an int of its three bytes.
+    """
+    data = data.lower()
+    return set(
+        (a << 16) | (b << 8) | c for a, b, c in set(zip(data, data[1:], data[2:]))
+    )
+
+
+def make_segment(entries):
+    """Build a segment from the trigrams of some files.
+
+    Args:
+        entries (list): of (name, mtime, size, trigrams) with at most
+            |kSegmentFiles| entries. See trigrams().
+
+    Returns:
+        A segment (names, mtimes, sizes, trigrams, offsets, postings). The
+        local indexes of the files with trigrams[i] are the bytes of
+        postings[offsets[i]:offsets[i + 1]].
+    """
+    assert len(entries) <= kSegmentFiles
+    byTrigram = {}
+    for i, entry in enumerate(entries):
+        for trigram in entry[3]:
+            local = byTrigram.get(trigram)
+            if local is None:
+                byTrigram[trigram] = local = bytearray()
+            local.append(i)
+    keys = sorted(byTrigram)
+    offsets = array.array("I", [0])
+    postings = bytearray()
+    for trigram in keys:
+        postings += byTrigram[trigram]
+        offsets.append(len(postings))
+    return (
+        [entry[0] for entry in entries],
+        [entry[1] for entry in entries],
+        [entry[2] for entry in entries],
+        array.array("I", keys),
+        offsets,
+        bytes(postings),
+    )
+
+
+def _skip_group(pattern, i):
+    """Get the index after the group that starts (with "(") at |i|."""
+    depth = 0
+    end = len(pattern)
+    while i < end:
+        c = pattern[i]
+        if c == u"\\":
+            i += 1
+        elif c == u"[":
+            i = _skip_class(pattern, i) - 1
+        elif c == u"(":
+            depth += 1
+        elif c == u")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return end
+
+
+def _skip_class(pattern, i):
+    """Get the index after the character class that starts at |i|."""
+    i += 1
+    if pattern[i : i + 1] == u"^":
+        i += 1
+    if pattern[i : i + 1] == u"]":
+        i += 1
+    end = len(pattern)
+    while i < end and pattern[i] != u"]":
+        i += 2 if pattern[i] == u"\\" else 1
+    return i + 1
+
+
+def _skip_escape(pattern, i):
+    """Get the index after the (letter or digit) escape that starts at |i|."""
+    c = pattern[i + 1]
+    if c == u"x":
+        return i + 4
+    if c == u"u":
+        return i + 6
+    if c == u"U":
+        return i + 10
+    if c == u"N":
+        return pattern.find(u"}", i) + 1 or len(pattern)
+    i += 2
+    if c.isdigit():
+        # An octal escape or a group reference.
+        while i < len(pattern) and pattern[i].isdigit():
+            i += 1
+    return i
+
+
+def required_literals(pattern, flags):
+    """Find the literal text that a match of |pattern| must contain.
+
+    The analysis is conservative: groups, character classes and the like are
+    skipped, so only the plain text (outside of any group) is found.
+
+    Args:
+        pattern (unicode): a regex.
+        flags (int): re flags.
+
+    Returns:
+        A list with an entry for each (top level) alternative of the regex. An
+        entry is a list of strings, all of which appear in any match of that
+        alternative.
+    """
+    if app.config.strict_debug:
+        assert isinstance(pattern, unicode)
+    if flags & re.VERBOSE or kReVerboseFlags.search(pattern):
+        # White space and comments aren't literal text.
+        return [[]]
+    branches = []
+    literals = []
+    run = []
+    i = 0
+    end = len(pattern)
+    while i < end:
+        c = pattern[i]
+        if c == u"\\" and i + 1 < end and not pattern[i + 1].isalnum():
+            run.append(pattern[i + 1])
+            i += 2
+            continue
+        if c in u".^$\\[(|":
+            if run:
+                literals.append(u"".join(run))
+                run = []
+            if c == u"\\":
+                i = _skip_escape(pattern, i)
+            elif c == u"[":
+                i = _skip_class(pattern, i)
+            elif c == u"(":
+                i = _skip_group(pattern, i)
+            else:
+                if c == u"|":
+                    branches.append(literals)
+                    literals = []
+                i += 1
+        elif c in u"*?" or (c == u"{" and kReRepeat.match(pattern, i)):
+            # The character before may be left out (or repeated).
+            if run:
+                run.pop()
+                if run:
+                    literals.append(u"".join(run))
+                    run = []
+            if c == u"{":
+                i = kReRepeat.match(pattern, i).end()
+            else:
+                i += 1
+        elif c == u"+":
+            if run:
+                literals.append(u"".join(run))
+                run = []
+            i += 1
+        else:
+            run.append(c)
+            i += 1
+    if run:
+        literals.append(u"".join(run))
+    branches.append(literals)
+    return branches
+
+
+def query_trigrams(pattern, flags):
+    """Get the trigrams that a match of |pattern| must contain.
+
+    Returns:
+        A list with a set of trigrams for each alternative of the regex (see
+        required_literals()), or None if the index can't narrow the search
+        (i.e. some alternative has no trigrams).
+    """
+    query = []
+    for literals in required_literals(pattern, flags):
+        branch = set()
+        for literal in literals:
+            branch.update(trigrams(literal.encode(u"utf-8")))
+        if not branch:
+            return None
+        query.append(branch)
+    return query
+
+
+def get_index(indexDirectory, root):
+    """Get the index of the directory |root|, loading it if needed.
+
+    The index may not exist yet (see TrigramIndex.exists()).
+    """
+    root = os.path.abspath(root)
+    with _indexesLock:
+        index = _indexes.get((indexDirectory, root))
+        if index is None:
+            index = TrigramIndex(indexDirectory, root)
+            index.load()
+            _indexes[(indexDirectory, root)] = index
+    return index
+
+
+class TrigramIndex(object):
+    """The trigram index of the files under a directory.
+
+    Hold |self.lock| while using the index; it may be updated in another
+    thread.
+    """
+
+    def __init__(self, indexDirectory, root):
+        """
+        Args:
+            indexDirectory (unicode): where to keep the indexes.
+            root (unicode): the absolute path of the indexed directory.
+        """
+        if app.config.strict_debug:
+            assert isinstance(root, unicode)
+        self.root = root
+        self.directory = os.path.join(
+            indexDirectory, hashlib.sha1(root.encode(u"utf-8")).hexdigest()
+        )
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # The files by name (relative to |self.root|), to a (segmentId,
+        # localIndex, mtime, size) entry.
+        self.files = {}
+        # The segments by id (see make_segment()).
+        self.segments = {}
+        # The number of files in each segment that are still indexed by it.
+        self.liveCounts = {}
+        self.nextSegmentId = 0
+        # The segment ids not yet written.
+        self.unsaved = set()
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, u"manifest")
+
+    def _segment_path(self, segmentId):
+        return os.path.join(self.directory, u"%d.segment" % (segmentId,))
+
+    def exists(self):
+        return os.path.isfile(self._manifest_path())
+
+    def load(self):
+        """Read the index from disk, if it's there.
+
+        Returns:
+            True if the index was read.
+        """
+        if not self.exists():
+            return False
+        try:
+            with open(self._manifest_path(), "rb") as manifestFile:
+                version, root, self.files, self.nextSegmentId = pickle.load(
+                    manifestFile
+                )
+            if version != kFormatVersion or root != self.root:
+                self.clear()
+                return False
+            self.liveCounts = {}
+            for segmentId, _, _, _ in self.files.values():
+                self.liveCounts[segmentId] = self.liveCounts.get(segmentId, 0) + 1
+            for segmentId in self.liveCounts:
+                with open(self._segment_path(segmentId), "rb") as segmentFile:
+                    self.segments[segmentId] = pickle.load(segmentFile)
+            app.log.info(u"loaded index of", self.root)
+            return True
+        except Exception as e:
+            app.log.exception(e)
+            self.clear()
+        return False
+
+    def save(self):
+        """Write the changes to the index (if any) to disk."""
+        if not self.unsaved and self.exists():
+            return
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            for segmentId in sorted(self.unsaved):
+                self._write(
+                    self._segment_path(segmentId), self.segments[segmentId]
+                )
+            self.unsaved = set()
+            # The manifest is written last, so that it only refers to segments
+            # that are complete.
+            self._write(
+                self._manifest_path(),
+                (kFormatVersion, self.root, self.files, self.nextSegmentId),
+            )
+            for name in os.listdir(self.directory):
+                if name.endswith(u".segment"):
+                    if int(name.split(u".")[0]) not in self.segments:
+                        os.remove(os.path.join(self.directory, name))
+        except Exception as e:
+            app.log.exception(e)
+
+    def _write(self, path, value):
+        # Write to a temporary file first, so that a partial write is never
+        # read.
+        tempPath = u"%s.%d.tmp" % (path, os.getpid())
+        with open(tempPath, "wb") as outFile:
+            pickle.dump(value, outFile, pickle.HIGHEST_PROTOCOL)
+        os.rename(tempPath, path)
+
+    def size_bytes(self):
+        """The disk space used by the index."""
+        total = 0
+        try:
+            for name in os.listdir(self.directory):
+                total += os.path.getsize(os.path.join(self.directory, name))
+        except OSError:
+            pass
+        return total
+
+    def needs_rebuild(self):
+        """Whether most of the entries in the segments are out of date."""
+        entryCount = sum(len(segment[0]) for segment in self.segments.values())
+        return entryCount > 2 * len(self.files) + kSegmentFiles
+
+    def stale(self, stats):
+        """Find the files that need to be (re)indexed.
+
+        Args:
+            stats (list): of (name, mtime, size) for each file. The files that
+                aren't listed (or are too large) are removed from the index.
+
+        Returns:
+            A list of the (name, mtime, size) entries that aren't up to date.
+        """
+        names = set()
+        result = []
+        for name, mtime, size in stats:
+            if size > kMaxIndexedLength:
+                continue
+            names.add(name)
+            entry = self.files.get(name)
+            if entry is None or entry[2] != mtime or entry[3] != size:
+                result.append((name, mtime, size))
+        for name in [name for name in self.files if name not in names]:
+            self._drop(name)
+        return result
+
+    def _drop(self, name):
+        segmentId = self.files.pop(name)[0]
+        self.liveCounts[segmentId] -= 1
+        if self.liveCounts[segmentId] == 0:
+            del self.liveCounts[segmentId]
+            del self.segments[segmentId]
+            self.unsaved.discard(segmentId)
+
+    def add_segment(self, segment):
+        """Add a segment (see make_segment()), replacing the prior entries of
+        the files in it."""
+        segmentId = self.nextSegmentId
+        self.nextSegmentId += 1
+        names, mtimes, sizes = segment[:3]
+        for name in names:
+            if name in self.files:
+                self._drop(name)
+        for i, name in enumerate(names):
+            self.files[name] = (segmentId, i, mtimes[i], sizes[i])
+        if names:
+            self.segments[segmentId] = segment
+            self.liveCounts[segmentId] = len(names)
+            self.unsaved.add(segmentId)
+
+    def unmatched_files(self, pattern, flags):
+        """Find the indexed files that can't contain a match of |pattern|.
+
+        Args:
+            pattern (unicode): a regex.
+            flags (int): re flags.
+
+        Returns:
+            A dict of name to the (mtime, size) the file had when indexed; the
+            file may be skipped if it still has that mtime and size.
+        """
+        query = query_trigrams(pattern, flags)
+        if query is None:
+            return {}
+        matched = set()
+        for segmentId, segment in self.segments.items():
+            names, _, _, keys, offsets, postings = segment
+            for branch in query:
+                found = None
+                for trigram in branch:
+                    i = bisect.bisect_left(keys, trigram)
+                    if i == len(keys) or keys[i] != trigram:
+                        found = ()
+                        break
+                    local = postings[offsets[i] : offsets[i + 1]]
+                    found = set(local) if found is None else found.intersection(local)
+                    if not found:
+                        break
+                for i in found:
+                    name = names[i]
+                    entry = self.files.get(name)
+                    if entry is not None and entry[0] == segmentId:
+                        matched.add(name)
+        unmatched = {}
+        for name, entry in self.files.items():
+            if name not in matched:
+                unmatched[name] = entry[2:]
+        return unmatched
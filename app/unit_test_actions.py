@@ -604,6 +604,54 @@ class TextInsertTestCases(ActionsTestCase):
         insert(ord("("), None)
         check_row(self, tb, 0, "(o")
 
+    def test_find_replace(self):
+        tb = self.textBuffer
+        text = u"one two\nthree\ntwo two\nfour\n\ntwo\nfive"
+        tb.insert_lines(tuple(text.split(u"\n")))
+        self.assertEqual(tb.parser.data, text)
+        tb.find_replace(u"/two/2/")
+        self.assertEqual(tb.parser.data, u"one 2\nthree\n2 2\nfour\n\n2\nfive")
+        self.assertEqual((tb.penRow, tb.penCol), (0, 0))
+        self.check_rows(tb, u"one 2\nthree\n2 2\nfour\n\n2\nfive")
+        # Matches that span lines, or don't change anything.
+        tb.find_replace(u"/e\\n(f)/E \\1/")
+        self.assertEqual(tb.parser.data, u"one 2\nthree\n2 2\nfour\n\n2\nfive")
+        tb.find_replace(u"/ee\\n2/EE/")
+        self.assertEqual(tb.parser.data, u"one 2\nthrEE 2\nfour\n\n2\nfive")
+        self.check_rows(tb, u"one 2\nthrEE 2\nfour\n\n2\nfive")
+        self.assertEqual((tb.penRow, tb.penCol), (1, 0))
+        tb.find_replace(u"/o/o/")
+        self.assertEqual(tb.parser.data, u"one 2\nthrEE 2\nfour\n\n2\nfive")
+        tb.find_replace(u"/^$/(empty)/m")
+        self.assertEqual(tb.parser.data, u"one 2\nthrEE 2\nfour\n(empty)\n2\nfive")
+        tb.undo()
+        self.assertEqual(tb.parser.data, u"one 2\nthrEE 2\nfour\n\n2\nfive")
+        tb.undo()
+        tb.undo()
+        self.assertEqual(tb.parser.data, text)
+        self.check_rows(tb, text)
+        tb.redo()
+        tb.redo()
+        self.assertEqual(tb.parser.data, u"one 2\nthrEE 2\nfour\n\n2\nfive")
+        self.check_rows(tb, u"one 2\nthrEE 2\nfour\n\n2\nfive")
+
+    def test_find_line_anchors(self):
+        tb = self.textBuffer
+        tb.insert_lines((u"ab", u"ab", u"ab"))
+        # The document is searched as a whole, but ^ and $ match at each line
+        # (as they did when the search went a line at a time).
+        tb.find(u"^ab$")
+        self.assertTrue(tb.index_matches())
+        self.assertEqual(len(tb.parser.matchIndex), 3)
+
+    def check_rows(self, tb, text):
+        """Check that the parse of |tb| is up to date with |text|."""
+        lines = text.split(u"\n")
+        self.assertEqual(tb.parser.row_count(), len(lines))
+        self.assertEqual(
+            [tb.parser.row_text(row) for row in range(len(lines))], lines
+        )
+
 
 class GrammarDeterminationTestCases(ActionsTestCase):
     def setUp(self):
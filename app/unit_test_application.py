@@ -364,6 +364,19 @@ class ApplicationTestCases(app.fake_curses_testing.FakeCursesTestCase):
             ],
         )
 
+    def test_frame_skipping(self):
+        prg = self.prg
+        # A frame is drawn when no more input is waiting.
+        self.assertFalse(prg.should_skip_frame(False))
+        prg.note_frame_time(0.02)
+        self.assertAlmostEqual(prg.frameTime, 0.005)
+        self.assertTrue(prg.should_skip_frame(True))
+        self.assertEqual(prg.skippedFrames, 1)
+        # Frames are only skipped for a while.
+        prg.lastFrameTime -= app.ci_program.kMaxFrameInterval
+        self.assertFalse(prg.should_skip_frame(True))
+        self.assertEqual(prg.skippedFrames, 1)
+
     def test_select_line(self):
         # self.set_movie_mode(True)
         self.run_with_test_file(
@@ -18,11 +18,18 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+try:
+    unichr
+except NameError:
+    unichr = chr
+
 import curses
+import sys
 import unittest
 import unicodedata
 
 import app.curses_util
+import app.unicode_width_table
 
 
 class CursesUtilTestCases(unittest.TestCase):
@@ -343,6 +350,38 @@ class CursesUtilTestCases(unittest.TestCase):
         self.assertEqual(0, app.curses_util.char_width(u"\b", 0))
         self.assertEqual(0, app.curses_util.char_width(u"\n", 0))
         self.assertEqual(2, app.curses_util.char_width(u"⏰", 0))
+        self.assertEqual(2, app.curses_util.char_width(u"😀", 0))
+        self.assertEqual(1, app.curses_util.char_width(u"𐀀", 0))
+        self.assertEqual(1, app.curses_util.char_width(u"é", 0))
+
+    def test_width_table(self):
+        if app.unicode_width_table.kUnidataVersion != unicodedata.unidata_version:
+            self.skipTest(u"the table is from another unicodedata version")
+        char_width = app.curses_util.char_width
+        for code in range(0x20, 0x30000, 7):
+            ch = unichr(code)
+            expected = 2 if unicodedata.east_asian_width(ch) == u"W" else 1
+            if sys.version_info[0] == 2 and unicodedata.east_asian_width(ch) == u"F":
+                expected = 2
+            self.assertEqual(expected, char_width(ch, 0), hex(code))
+            self.assertEqual(
+                expected == 2,
+                app.curses_util.kDoubleWideRe.match(ch) is not None,
+                hex(code),
+            )
+
+    def test_bulk_widths(self):
+        is_single_width = app.curses_util.is_single_width
+        self.assertTrue(is_single_width(u""))
+        self.assertTrue(is_single_width(u"plain é text"))
+        self.assertFalse(is_single_width(u"tab\t"))
+        self.assertFalse(is_single_width(u"\b"))
+        self.assertFalse(is_single_width(u"aこ"))
+        self.assertFalse(is_single_width(u"a😀"))
+        double_width_count = app.curses_util.double_width_count
+        self.assertEqual(0, double_width_count(u"plain é\t"))
+        self.assertEqual(3, double_width_count(u"aこbん😀"))
+        self.assertEqual(5, app.curses_util.column_width(u"a\bこ😀"))
 
     def test_floor_col(self):
         test = u"""\tfive\t"""
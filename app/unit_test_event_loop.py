@@ -0,0 +1,56 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import threading
+import unittest
+
+import app.event_loop
+
+
+class EventLoopTestCases(unittest.TestCase):
+    def setUp(self):
+        self.inputRead, self.inputWrite = os.pipe()
+        self.eventLoop = app.event_loop.EventLoop(self.inputRead)
+
+    def tearDown(self):
+        self.eventLoop.close()
+        os.close(self.inputRead)
+        os.close(self.inputWrite)
+
+    def test_timeout(self):
+        self.assertEqual(self.eventLoop.wait(0), (False, False))
+
+    def test_input(self):
+        os.write(self.inputWrite, b"a")
+        self.assertEqual(self.eventLoop.wait(0), (True, False))
+        # Waiting doesn't consume the input.
+        self.assertEqual(self.eventLoop.wait(0), (True, False))
+
+    def test_wake(self):
+        # Many wake ups are collapsed into one.
+        for i in range(10000):
+            self.eventLoop.wake()
+        self.assertEqual(self.eventLoop.wait(0), (False, True))
+        self.assertEqual(self.eventLoop.wait(0), (False, False))
+
+    def test_wake_from_thread(self):
+        timer = threading.Timer(0.01, self.eventLoop.wake)
+        timer.start()
+        self.assertEqual(self.eventLoop.wait(5), (False, True))
+        timer.join()
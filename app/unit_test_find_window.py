@@ -90,6 +90,63 @@ class FindWindowTestCases(app.fake_curses_testing.FakeCursesTestCase):
             ]
         )
 
+    def test_find_multi_line(self):
+        self.run_with_fake_inputs(
+            [
+                self.resize_screen(20, 80),
+                self.write_text(u"one\n\tab one\ntwo one\n"),
+                CTRL_F,
+                self.display_check(-3, 0, [u"Find: "]),
+                self.write_text(u"one\\ntwo"),
+                self.selection_document_check(1, 11, 2, 3, 3),
+                self.display_find_check(u" match ", u"1 of 1 |"),
+                CTRL_F,
+                self.selection_document_check(1, 11, 2, 3, 3),
+                CTRL_R,
+                self.selection_document_check(1, 11, 2, 3, 3),
+                self.write_text(u"|^one"),
+                self.selection_document_check(1, 11, 2, 3, 3),
+                self.display_find_check(u" match ", u"2 of 2 |"),
+                CTRL_R,
+                self.selection_document_check(0, 0, 0, 3, 3),
+                self.display_find_check(u" match ", u"1 of 2 |"),
+                CTRL_R,
+                self.selection_document_check(1, 11, 2, 3, 3),
+                CTRL_F,
+                self.selection_document_check(0, 0, 0, 3, 3),
+                CTRL_Q,
+                u"n",
+            ]
+        )
+
+    def test_find_as_you_type(self):
+        self.run_with_fake_inputs(
+            [
+                self.resize_screen(20, 80),
+                self.write_text(u"".join(u"line %d\n" % i for i in range(100))),
+                CTRL_F,
+                self.display_check(-3, 0, [u"Find: "]),
+                # The pen is at the end, so the search wraps around.
+                u"l",
+                self.selection_document_check(0, 0, 0, 1, 3),
+                u"i",
+                u"n",
+                u"e",
+                u" ",
+                u"5",
+                self.selection_document_check(5, 0, 5, 6, 3),
+                self.display_find_check(u" match ", u"1 of 11 |"),
+                # The next match is below the screen.
+                u"5",
+                self.selection_document_check(55, 0, 55, 7, 3),
+                self.display_find_check(u" match ", u"1 of 1 |"),
+                u"5",
+                self.display_find_check(u" 0 ", u"matches |"),
+                CTRL_Q,
+                u"n",
+            ]
+        )
+
     def test_replace(self):
         # self.set_movie_mode(True)
         self.run_with_fake_inputs(
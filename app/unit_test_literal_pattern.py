@@ -0,0 +1,106 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import random
+import re
+import unittest
+
+import app.literal_pattern
+
+
+class LiteralPatternTestCases(unittest.TestCase):
+    def setUp(self):
+        self.oldChunkLength = app.literal_pattern.kChunkLength
+        # Use tiny chunks so that the matches cross chunk boundaries.
+        app.literal_pattern.kChunkLength = 4
+
+    def tearDown(self):
+        app.literal_pattern.kChunkLength = self.oldChunkLength
+
+    def spans(self, pattern, data, pos=0, endPos=None):
+        if endPos is None:
+            return [k.span() for k in pattern.finditer(data, pos)]
+        return [k.span() for k in pattern.finditer(data, pos, endPos)]
+
+    def test_like_regex(self):
+        random.seed(7)
+        # Some characters that lower() and re.IGNORECASE treat differently: a
+        # final sigma, a long s, and a Kelvin sign.
+        other = u"\u03c3\u03c2\u03a3\u017f\u212a"
+        for i in range(600):
+            alphabet = u"aAbkKsS\n" + (other if i % 4 > 1 else u"")
+            data = u"".join(random.choice(alphabet) for i in range(60))
+            ignoreCase = bool(i % 2)
+            if ignoreCase:
+                # Ignoring case, a LiteralPattern is only made for ASCII.
+                alphabet = u"aAbkKsS\n"
+            text = u"".join(random.choice(alphabet) for i in range(i % 4 + 1))
+            lineStart = bool(i % 3 == 0)
+            literal = app.literal_pattern.LiteralPattern(text, ignoreCase, lineStart)
+            regex = re.compile(literal.pattern, literal.flags)
+            pos = random.randrange(len(data))
+            endPos = random.randrange(pos, len(data) + 1)
+            self.assertEqual(self.spans(literal, data), self.spans(regex, data))
+            self.assertEqual(
+                self.spans(literal, data, pos, endPos),
+                self.spans(regex, data, pos, endPos),
+            )
+            found = regex.search(data, pos)
+            self.assertEqual(
+                literal.search(data, pos) and literal.search(data, pos).span(),
+                found and found.span(),
+            )
+            found = regex.match(data, pos)
+            self.assertEqual(
+                literal.match(data, pos) and literal.match(data, pos).group(),
+                found and found.group(),
+            )
+
+    def test_compile(self):
+        literalType = app.literal_pattern.LiteralPattern
+        self.assertIsInstance(app.literal_pattern.compile(u"a", True), literalType)
+        self.assertIsInstance(
+            app.literal_pattern.compile(u"a", lineStart=True), literalType
+        )
+        self.assertIsInstance(app.literal_pattern.compile(u"a"), type(re.compile(u"")))
+
+    def test_ignore_case_like_regex(self):
+        for text, data, expected in (
+            (u"\u03c3", u"\u039f\u0394\u039f\u03a3", [(3, 4)]),
+            (u"s", u"\u017f", [(0, 1)]),
+            (u"\u0398", u"\u03d1", [(0, 1)]),
+            (u"\u00b5", u"\u03bc", [(0, 1)]),
+            (u"ab", u"xAb\u03c3" + u"x" * 10 + u"aB", [(1, 3), (14, 16)]),
+        ):
+            literal = app.literal_pattern.compile(text, True)
+            regex = re.compile(re.escape(text), re.IGNORECASE)
+            self.assertEqual(self.spans(regex, data), expected)
+            self.assertEqual(self.spans(literal, data), expected)
+
+    def test_fallback(self):
+        self.assertIsInstance(
+            app.literal_pattern.compile(u""), type(re.compile(u""))
+        )
+        # Lowering a dotted capital I adds a combining dot.
+        self.assertIsInstance(
+            app.literal_pattern.compile(u"\u0130", True), type(re.compile(u""))
+        )
+        literal = app.literal_pattern.compile(u"x", True)
+        data = u"ax \u0130 X"
+        self.assertEqual(self.spans(literal, data), [(1, 2), (5, 6)])
+        self.assertEqual(literal.sub(u"y", data), u"ay \u0130 y")
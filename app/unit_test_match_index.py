@@ -0,0 +1,182 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import random
+import re
+import unittest
+
+import app.match_index
+import app.parser
+import app.prefs
+
+
+class MatchIndexTestCases(unittest.TestCase):
+    def setUp(self):
+        self.oldWindow = app.match_index.kMatchWindow
+        self.oldMargin = app.match_index.kMatchMargin
+        self.oldNarrowRatio = app.match_index.kNarrowRatio
+        # Use tiny windows so that the tests cross window boundaries.
+        app.match_index.kMatchWindow = 16
+        app.match_index.kMatchMargin = 4
+        app.match_index.kNarrowRatio = 1
+        self.document = app.parser.Parser(app.prefs.Prefs())
+
+    def tearDown(self):
+        app.match_index.kMatchWindow = self.oldWindow
+        app.match_index.kMatchMargin = self.oldMargin
+        app.match_index.kNarrowRatio = self.oldNarrowRatio
+
+    def check_index(self, matchIndex, data):
+        self.document.data = data
+        self.assertTrue(matchIndex.update(self.document))
+        expected = [k.span() for k in matchIndex.pattern.finditer(data)]
+        self.assertEqual(list(zip(matchIndex.begins, matchIndex.ends)), expected)
+
+    def test_update(self):
+        data = u"one two\nthree one\n\none" * 5
+        for pattern in (u"one", u"^", u"o\\w*", u"e\\s+t", u"x*", u"zzz"):
+            matchIndex = app.match_index.MatchIndex()
+            matchIndex.set_pattern(re.compile(pattern, re.MULTILINE))
+            self.check_index(matchIndex, data)
+            self.assertTrue(matchIndex.complete)
+        # A match longer than the window (the window grows to fit it).
+        matchIndex = app.match_index.MatchIndex()
+        matchIndex.set_pattern(re.compile(u"two.*"))
+        self.check_index(matchIndex, u"two" + u" " * 50 + u"one")
+        self.assertEqual(len(matchIndex), 1)
+
+    def test_navigation(self):
+        data = u"ab ab\nab"
+        document = self.document
+        document.data = data
+        matchIndex = app.match_index.MatchIndex()
+        matchIndex.set_pattern(re.compile(u"ab"))
+        # Before indexing, the regex is used.
+        self.assertEqual(matchIndex.search(document, 1), (3, 5))
+        self.assertEqual(matchIndex.search_back(document, 0, 5), (3, 5))
+        self.assertEqual(matchIndex.spans(0, 5), None)
+        # One (smaller) window at a time.
+        app.match_index.kMatchWindow = 6
+        self.assertFalse(matchIndex.update(document, windowLimit=1))
+        self.assertEqual(matchIndex.spans(0, 5), None)
+        self.assertTrue(matchIndex.update(document))
+        self.assertEqual(matchIndex.search(document, 1), (3, 5))
+        self.assertEqual(matchIndex.search(document, 7), None)
+        self.assertEqual(matchIndex.search_back(document, 0, 5), (3, 5))
+        self.assertEqual(matchIndex.search_back(document, 0, 4), (0, 2))
+        self.assertEqual(matchIndex.search_back(document, 1, 4), None)
+        self.assertEqual(matchIndex.spans(1, 7), [(0, 2), (3, 5), (6, 8)])
+        self.assertEqual(matchIndex.position(3), 2)
+        self.assertEqual(matchIndex.position(4), 0)
+
+    def test_invalidate(self):
+        random.seed(7)
+        # (The matches are no longer than the margin.)
+        pattern = re.compile(u"ab{1,3}|^c|\\d x|(?<=a)b", re.MULTILINE)
+        data = u"".join(random.choice(u"abc1 x\n") for i in range(300))
+        matchIndex = app.match_index.MatchIndex()
+        matchIndex.set_pattern(pattern)
+        for i in range(200):
+            if i % 3:
+                self.check_index(matchIndex, data)
+            offset = random.randint(0, len(data))
+            if random.random() < 0.5:
+                data = data[:offset] + random.choice(u"abc1 x\n") + data[offset:]
+            else:
+                data = data[:offset] + data[offset + 1 :]
+            matchIndex.invalidate(offset)
+        self.check_index(matchIndex, data)
+
+    def test_search_back(self):
+        random.seed(11)
+        document = self.document
+        for pattern in (u"ab", u"a{1,3}", u"^c|c$", u"b(?=a)|(?<=a)b"):
+            pattern = re.compile(pattern, re.MULTILINE)
+            data = u"".join(random.choice(u"abc\n") for i in range(200))
+            document.data = data
+            matchIndex = app.match_index.MatchIndex()
+            matchIndex.set_pattern(pattern)
+            for i in range(60):
+                if i % 20 == 10:
+                    # Index a bit more of the document.
+                    matchIndex.update(document, windowLimit=2)
+                pos = random.randint(0, len(data))
+                endPos = random.randint(pos, len(data))
+                expected = None
+                for k in pattern.finditer(data):
+                    if k.start() >= pos and k.end() <= endPos:
+                        expected = k.span()
+                self.assertEqual(
+                    matchIndex.search_back(document, pos, endPos), expected
+                )
+
+    def test_search_end_pos(self):
+        document = self.document
+        document.data = u"ab" + u" " * 40 + u"ab" + u" " * 40
+        matchIndex = app.match_index.MatchIndex()
+        matchIndex.set_pattern(re.compile(u"ab"))
+        self.assertEqual(matchIndex.search(document, 0, 1), (0, 2))
+        self.assertEqual(matchIndex.search(document, 1, 20), None)
+        self.assertEqual(matchIndex.search(document, 1, 42), None)
+        self.assertEqual(matchIndex.search(document, 1, 43), (42, 44))
+        # Stop indexing once there's a match at (or after) |findFrom|.
+        self.assertFalse(matchIndex.update(document, findFrom=30))
+        self.assertEqual(matchIndex.next_match(30), (42, 44))
+        self.assertTrue(matchIndex.update(document))
+        self.assertEqual(matchIndex.search(document, 1, 20), (42, 44))
+
+    def test_narrow(self):
+        random.seed(13)
+        document = self.document
+        # Some matches of "aab" begin within a match of "aa", rather than at
+        # one.
+        document.data = u"aaab"
+        matchIndex = app.match_index.MatchIndex()
+        matchIndex.set_pattern(re.compile(u"aa"))
+        self.assertTrue(matchIndex.update(document))
+        matchIndex.narrow(re.compile(u"aab"), document)
+        self.assertEqual(list(zip(matchIndex.begins, matchIndex.ends)), [(1, 4)])
+        for i in range(30):
+            flags = re.IGNORECASE if i % 2 else 0
+            data = u"".join(random.choice(u"aAb\n") for i in range(200))
+            document.data = data
+            matchIndex = app.match_index.MatchIndex()
+            matchIndex.set_pattern(re.compile(u"a", flags))
+            # Index some (or all) of the document.
+            matchIndex.update(document, windowLimit=i % 3 or None)
+            scannedTo = matchIndex.scannedTo
+            for text in (u"aa", u"aab", u"aab\n"):
+                pattern = re.compile(re.escape(text), flags)
+                matchIndex.narrow(pattern, document)
+                self.assertIs(matchIndex.pattern, pattern)
+                self.assertGreaterEqual(matchIndex.scannedTo, scannedTo)
+                expected = [
+                    k.span() for k in pattern.finditer(data) if k.start() < scannedTo
+                ]
+                self.assertEqual(
+                    [k for k in zip(matchIndex.begins, matchIndex.ends)][
+                        : len(expected)
+                    ],
+                    expected,
+                )
+            self.check_index(matchIndex, data)
+        # With too many matches to try, the text is searched again.
+        app.match_index.kNarrowRatio = 1000
+        matchIndex.narrow(re.compile(u"aab\nb"), document)
+        self.assertEqual(matchIndex.scannedTo, 0)
+        self.check_index(matchIndex, data)
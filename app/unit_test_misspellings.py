@@ -20,6 +20,7 @@ import curses
 
 from app.curses_util import *
 import app.fake_curses_testing
+import app.spelling
 
 
 class MisspellingsTestCases(app.fake_curses_testing.FakeCursesTestCase):
@@ -48,3 +49,59 @@ class MisspellingsTestCases(app.fake_curses_testing.FakeCursesTestCase):
                 u"n",
             ]
         )
+
+    def test_dictionary_cache(self):
+        dictionary = app.spelling.Dictionary(
+            self.prg.prefs.dictionaries[u"base"],
+            self.prg.prefs.dictionaries[u"path_match"],
+        )
+        dictionary.set_up_words_for_path(u"/src/main.cc")
+        self.assertFalse(dictionary.is_correct(u"accname", u"cpp"))
+        self.assertTrue(dictionary.is_correct(u"orange", u"cpp"))
+        # The words for a path are found once per path.
+        dictionary.set_up_words_for_path(u"/src/chromium/main.cc")
+        pathWords = dictionary.pathWords
+        dictionary.set_up_words_for_path(u"/src/chromium/main.cc")
+        self.assertIs(dictionary.pathWords, pathWords)
+        # The verdict depends on the path.
+        self.assertTrue(dictionary.is_correct(u"accname", u"cpp"))
+        dictionary.set_up_words_for_path(u"/src/main.cc")
+        self.assertFalse(dictionary.is_correct(u"accname", u"cpp"))
+        self.assertEqual(len(dictionary.verdicts), 3)
+        # The least recently used verdicts are dropped.
+        kVerdictCacheSize = app.spelling.kVerdictCacheSize
+        app.spelling.kVerdictCacheSize = 3
+        try:
+            dictionary.is_correct(u"orange", u"cpp")
+            dictionary.is_correct(u"apple", u"cpp")
+        finally:
+            app.spelling.kVerdictCacheSize = kVerdictCacheSize
+        self.assertEqual(
+            list(dictionary.verdicts.keys()),
+            [
+                (u"accname", u"cpp", ()),
+                (u"orange", u"cpp", ()),
+                (u"apple", u"cpp", ()),
+            ],
+        )
+
+    def test_dictionary_lazy_load(self):
+        dictionary = app.spelling.Dictionary(
+            self.prg.prefs.dictionaries[u"base"],
+            self.prg.prefs.dictionaries[u"path_match"],
+        )
+        # No words are read until they are needed.
+        self.assertIsNone(dictionary.baseWords.buckets)
+        self.assertEqual(dictionary.grammarWords, {})
+        self.assertTrue(dictionary.is_correct(u"orange", u"cpp"))
+        self.assertIsNotNone(dictionary.baseWords.buckets)
+        self.assertEqual(dictionary.grammarWords, {})
+        self.assertFalse(dictionary.is_correct(u"asdf", u"cpp"))
+        self.assertIn(u"cpp", dictionary.grammarWords)
+        self.assertNotIn(u"py", dictionary.grammarWords)
+        words = dictionary.baseWords
+        self.assertIn(u"orange", words)
+        self.assertIn(u"a", words)
+        self.assertNotIn(u"orang", words)
+        self.assertNotIn(u"oranges\norange", words)
+        self.assertNotIn(u"", words)
@@ -0,0 +1,100 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import app.history
+import app.parse_cache
+import app.parser
+import app.prefs
+
+
+class ParseCacheTestCases(unittest.TestCase):
+    def setUp(self):
+        self.cacheDirectory = tempfile.mkdtemp()
+        self.prefs = app.prefs.Prefs()
+        self.grammar = self.prefs.grammars[u"cpp"]
+        with io.open(u"sample/sample.cc") as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDirectory)
+
+    def parsed(self, data):
+        parser = app.parser.Parser(self.prefs)
+        parser.parse(None, data, self.grammar, 0, sys.maxsize)
+        parser.checksum = app.history.calculate_checksum(None, data)
+        return parser
+
+    def test_save_and_load(self):
+        cache = app.parse_cache.ParseCache(self.cacheDirectory, 1 << 20)
+        expected = self.parsed(self.data)
+        cache.save(expected, self.grammar)
+        self.assertEqual(len(os.listdir(self.cacheDirectory)), 1)
+
+        parser = app.parser.Parser(self.prefs)
+        parser.data = self.data
+        parser.checksum = expected.checksum
+        self.assertTrue(cache.load(parser, self.grammar))
+        self.assertEqual(parser.resumeAtRow, len(expected.rows))
+        self.assertEqual(expected.rows, parser.rows)
+        self.assertEqual(list(expected.parserNodes), list(parser.parserNodes))
+        # Parsing has nothing left to do.
+        parser.parse(None, None, self.grammar, parser.resumeAtRow, sys.maxsize)
+        self.assertEqual(list(expected.parserNodes), list(parser.parserNodes))
+
+        # An edit clears the checksum (the parse no longer matches the file).
+        parser.insert(0, 0, u"x")
+        self.assertEqual(parser.checksum, None)
+        self.assertFalse(cache.load(parser, self.grammar))
+
+    def test_key(self):
+        cache = app.parse_cache.ParseCache(self.cacheDirectory, 1 << 20)
+        cache.save(self.parsed(self.data), self.grammar)
+        parser = self.parsed(self.data + u"\n")
+        self.assertFalse(cache.load(parser, self.grammar))
+        parser = self.parsed(self.data)
+        self.assertFalse(cache.load(parser, self.prefs.grammars[u"c"]))
+        self.assertEqual(app.prefs.Prefs().grammarVersion, self.prefs.grammarVersion)
+        self.prefs.grammarVersion = u"other"
+        self.assertFalse(cache.load(parser, self.grammar))
+
+    def test_evict(self):
+        cache = app.parse_cache.ParseCache(self.cacheDirectory, 0)
+        parsers = [self.parsed(self.data + u"\n" * i) for i in range(3)]
+        cache.save(parsers[0], self.grammar)
+        # A zero size limit leaves nothing after a save.
+        self.assertEqual(os.listdir(self.cacheDirectory), [])
+
+        cache.maxBytes = 1 << 20
+        for i, parser in enumerate(parsers):
+            cache.save(parser, self.grammar)
+            # Give each entry a distinct (increasing) time of use.
+            os.utime(cache._cache_path(parser, self.grammar), (1000 + i, 1000 + i))
+        entryBytes = os.path.getsize(cache._cache_path(parsers[2], self.grammar))
+        # The least recently used entries are removed first.
+        cache.maxBytes = 2 * entryBytes
+        cache.evict()
+        self.assertFalse(cache.load(parsers[0], self.grammar))
+        self.assertTrue(cache.load(parsers[1], self.grammar))
+        self.assertTrue(cache.load(parsers[2], self.grammar))
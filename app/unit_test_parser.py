@@ -24,8 +24,10 @@ import sys
 from timeit import timeit
 import unittest
 
+import app.parallel_parse
 import app.parser
 import app.prefs
+import app.spelling
 
 
 class ParserTestCases(unittest.TestCase):
@@ -141,6 +143,37 @@ void blah();
         )
         self.assertEqual(self.parser.grammar_at(3, 7), self.prefs.grammars[u"cpp"])
 
+    def test_parse_js_regex_after_blank_line(self):
+        # The 'begin' of a regex string may span the new lines before it.
+        test = u"x = foo(\n\n  /abc/)"
+        self.prefs = app.prefs.Prefs()
+        self.parser.parse(None, test, self.prefs.grammars[u"js"], 0, 99999)
+        self.assertEqual(self.parser.row_count(), 3)
+        for row, line in enumerate(test.split(u"\n")):
+            self.assertEqual(self.parser.row_text_and_width(row), (line, len(line)))
+        self.assertEqual(self.parser.grammar_at(0, 7), self.prefs.grammars[u"js"])
+        self.assertEqual(
+            self.parser.grammar_at(2, 3), self.prefs.grammars[u"regex_string"]
+        )
+        self.assertEqual(self.parser.grammar_at(2, 7), self.prefs.grammars[u"js"])
+        self.parser.debug_check_lines(None, test)
+
+    def test_edit_cpp_raw_string_with_tab(self):
+        # Resuming within a raw string finds the end key from the raw string's
+        # begin (rather than from the tab, or text after it).
+        test = u'auto s = R"foo(\n\tR"(x)"\nbar\n)foo";\nint y;\n'
+        self.prefs = app.prefs.Prefs()
+        grammar = self.prefs.grammars[u"cpp"]
+        rawString = self.prefs.grammars[u"cpp_string_literal"]
+        self.parser.parse(None, test, grammar, 0, 99)
+        self.parser.insert(2, 0, u"z")
+        self.parser.parse(None, None, grammar, self.parser.resumeAtRow, 99)
+        self.assertEqual(self.parser.row_text(2), u"zbar")
+        self.assertEqual(self.parser.grammar_at(1, 9), rawString)
+        self.assertEqual(self.parser.grammar_at(2, 1), rawString)
+        self.assertEqual(self.parser.grammar_at(3, 1), rawString)
+        self.assertEqual(self.parser.grammar_at(4, 5), grammar)
+
     def test_parse_rs_raw_string(self):
         test = u"""// one
 let stuff = r###"two
@@ -921,6 +954,169 @@ e
         self.assertEqual(p.data[p.data_offset(0, 3)], u"ち")
         self.assertEqual(p.data[p.data_offset(0, 4)], u"ち")
 
+    def test_parse_line_start(self):
+        # A '^' in a grammar only matches at the start of a line (not wherever
+        # the prior grammar ended).
+        test = u"int a; /* x */#define B\n#define C 1\nint d;\n"
+        self.prefs = app.prefs.Prefs()
+        self.parser.parse(None, test, self.prefs.grammars[u"cpp"], 0, 99999)
+        self.assertEqual(self.parser.grammar_at(0, 14), self.prefs.grammars[u"cpp"])
+        self.assertEqual(
+            self.parser.grammar_at(1, 0), self.prefs.grammars[u"c_preprocessor"]
+        )
+        self.assertEqual(self.parser.grammar_at(2, 0), self.prefs.grammars[u"type"])
+
+    def test_parser_node_list(self):
+        self.prefs = app.prefs.Prefs()
+        cpp = self.prefs.grammars[u"cpp"]
+        keyword = self.prefs.grammars[u"keyword"]
+        nodes = app.parser.ParserNodeList(self.prefs.grammarTable)
+        self.assertEqual(len(nodes), 0)
+        nodes.append((cpp, 0, None, 0))
+        nodes.append((keyword, 3, 0, 3))
+        nodes.append((cpp, 8, None, 9))
+        self.assertEqual(len(nodes), 3)
+        self.assertEqual(nodes[0], (cpp, 0, None, 0))
+        self.assertIs(nodes[1][app.parser.kGrammar], keyword)
+        self.assertEqual(nodes[-1], (cpp, 8, None, 9))
+        self.assertIs(nodes.grammar(-2), keyword)
+        kNoPrior = app.parser.kNoPrior
+        self.assertEqual(list(nodes.priors), [kNoPrior, 0, kNoPrior])
+        head = nodes[:2]
+        self.assertEqual(list(head), [(cpp, 0, None, 0), (keyword, 3, 0, 3)])
+        # A slice is a copy.
+        head.append((cpp, 20, None, 21))
+        self.assertEqual(nodes[2], (cpp, 8, None, 9))
+        self.assertEqual(nodes.pop(), (cpp, 8, None, 9))
+        self.assertEqual(len(nodes), 2)
+        nodes.truncate(1)
+        self.assertEqual(list(nodes), [(cpp, 0, None, 0)])
+
+    def test_incremental_reparse(self):
+        """Editing then reparsing (which reuses the prior parse where it can)
+        should match a parse of the whole edited document."""
+        self.prefs = app.prefs.Prefs()
+        grammar = self.prefs.grammars[u"cpp"]
+        with io.open(u"sample/sample.cc") as f:
+            test = f.read()
+        edits = [
+            # (row, col, text to insert or count of characters to delete).
+            (3, 0, u"int x;\n"),
+            (10, 2, u"/* open comment "),
+            (12, 0, u" close */"),
+            (20, 4, 3),
+            (5, 0, u"\"string\n"),
+            (6, 0, 1),
+            (0, 0, u"//"),
+        ]
+        p = self.parser
+        p.parse(None, test, grammar, 0, sys.maxsize)
+        for row, col, change in edits:
+            if isinstance(change, int):
+                p.delete_range(row, col, row, col + change)
+            else:
+                p.insert(row, col, change)
+            # Parse a screen full (as the editor would) then the rest.
+            p.parse(None, None, grammar, p.resumeAtRow, row + 20)
+            p.parse(None, None, grammar, p.resumeAtRow, sys.maxsize)
+            expected = app.parser.Parser(self.prefs)
+            expected.parse(None, p.data, grammar, 0, sys.maxsize)
+            self.assertEqual(expected.rows, p.rows)
+            self.assertEqual(len(expected.parserNodes), len(p.parserNodes))
+            for expectedNode, actualNode in zip(expected.parserNodes, p.parserNodes):
+                self.assertIs(expectedNode[0], actualNode[0])
+                self.assertEqual(expectedNode[1:], actualNode[1:])
+
+    def test_spell_check(self):
+        """Misspellings are found per row, dropped for edited rows, and kept for
+        rows reused from the prior parse."""
+        prefs = app.prefs.Prefs()
+        grammar = prefs.grammars[u"cpp"]
+        dictionary = app.spelling.Dictionary(
+            prefs.dictionaries[u"base"], prefs.dictionaries[u"path_match"]
+        )
+        p = self.parser
+        test = u"// the qwzx\nint x;\n" * 500 + u"// more wbzq text\n"
+        p.parse(None, test, grammar, 0, sys.maxsize)
+        self.assertTrue(p.spell_check(dictionary, 990, 1001))
+        self.assertEqual(p.row_misspellings(0), ())
+        self.assertEqual(p.row_misspellings(1000), ((8, 12),))
+        # Past the end of the document.
+        self.assertFalse(p.spell_check(dictionary, 0, 2000))
+        self.assertEqual(p.row_misspellings(0), ((7, 11),))
+        # Words outside of comments and strings aren't checked.
+        self.assertEqual(p.row_misspellings(1), ())
+        p.insert(2, 3, u"qz")
+        self.assertEqual(p.row_misspellings(2), ())
+        p.parse(None, None, grammar, p.resumeAtRow, 30)
+        p.parse(None, None, grammar, p.resumeAtRow, sys.maxsize)
+        self.assertEqual(p.row_misspellings(1000), ((8, 12),))
+        self.assertEqual(p.misspellings[3], ())
+        self.assertEqual(p.misspellings[2], None)
+
+    def test_fast_line_parse(self):
+        """Identifying rows (without lexing) in blocks should give each row's
+        offset and visual offset, including for lines that span blocks."""
+        self.prefs = app.prefs.Prefs()
+        grammar = self.prefs.grammars[u"text"]
+        test = u"ab\n\ncdefgh\n中x中\nabé\n\t\x01z\n中中"
+        lineIndexBlock = app.parser.kLineIndexBlock
+        try:
+            app.parser.kLineIndexBlock = 3
+            p = self.parser
+            p.parse(None, test, grammar, 0, 0)
+            self.assertEqual(p.row_count(), 7)
+        finally:
+            app.parser.kLineIndexBlock = lineIndexBlock
+        # The Chinese characters are two columns; the tab and control are counted as
+        # one column each (until the rows are lexed).
+        self.check_parser_nodes(
+            [
+                (u"text", 0, None, 0),
+                (u"text", 3, None, 3),
+                (u"text", 4, None, 4),
+                (u"text", 11, None, 11),
+                (u"text", 15, None, 17),
+                (u"text", 19, None, 21),
+                (u"text", 23, None, 25),
+                (u"text", 25, None, 29),
+            ],
+            p.parserNodes,
+        )
+        self.assertEqual(list(p.rows), [0, 1, 2, 3, 4, 5, 6])
+
+    def test_parallel_parse(self):
+        """Stitching together chunks lexed in worker processes should match a
+        sequential parse (the chunks end within a raw string and a comment)."""
+        self.prefs = app.prefs.Prefs()
+        grammar = self.prefs.grammars[u"cpp"]
+        with io.open(u"sample/sample.cc") as f:
+            test = f.read() * 3
+        chunkLength = app.parallel_parse.kChunkLength
+        minDocumentLength = app.parallel_parse.kMinDocumentLength
+        try:
+            app.parallel_parse.kChunkLength = 700
+            app.parallel_parse.kMinDocumentLength = 0
+            p = self.parser
+            p.data = test
+            p.parse_in_parallel(grammar)
+            self.assertEqual(len(p._speculative), 7)
+            for _, _, result in p._speculative:
+                result.wait()
+            p.parse(None, None, grammar, 0, sys.maxsize)
+            self.assertEqual(p._speculative, [])
+        finally:
+            app.parallel_parse.kChunkLength = chunkLength
+            app.parallel_parse.kMinDocumentLength = minDocumentLength
+            app.parallel_parse.shut_down()
+        expected = app.parser.Parser(self.prefs)
+        expected.parse(None, test, grammar, 0, sys.maxsize)
+        self.assertEqual(expected.rows, p.rows)
+        self.assertEqual(len(expected.parserNodes), len(p.parserNodes))
+        for expectedNode, actualNode in zip(expected.parserNodes, p.parserNodes):
+            self.assertIs(expectedNode[0], actualNode[0])
+            self.assertEqual(expectedNode[1:], actualNode[1:])
+
     if 0:
 
         def test_profile_parse(self):
@@ -57,3 +57,22 @@ class PrefsTestCases(app.fake_curses_testing.FakeCursesTestCase):
         self.assertEqual(tabs_to_spaces("cpp"), True)
         self.assertEqual(tabs_to_spaces(None), False)
         self.assertEqual(tabs_to_spaces("foo"), None)
+
+    def test_compile_grammar(self):
+        grammar = self.prefs.grammars[u"cpp"]
+        grammar.pop(u"matchRe", None)
+        self.assertIs(self.prefs.get_grammar(u"cpp"), grammar)
+        self.assertIsNotNone(grammar.get(u"matchRe"))
+        # The grammars that the parser may reach are compiled as well.
+        for g in grammar[u"matchGrammars"]:
+            if g is not None:
+                self.assertIsNotNone(g.get(u"matchRe"), g[u"name"])
+        # Another Prefs keeps the compiled grammar...
+        matchRe = grammar[u"matchRe"]
+        app.prefs.Prefs()
+        self.assertIs(grammar[u"matchRe"], matchRe)
+        # ...unless the markers changed, and it isn't compiled until used.
+        grammar[u"markers"] = grammar[u"markers"][1:]
+        app.prefs.Prefs()
+        self.assertIsNone(grammar.get(u"matchRe"))
+        self.assertIsNotNone(self.prefs.compile_grammar(grammar))
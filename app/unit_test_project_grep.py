@@ -0,0 +1,194 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+
+import app.ci_program
+import app.log
+import app.parallel_parse
+import app.project_grep
+import app.text_buffer
+import app.trigram_index
+
+
+class ProjectGrepTestCases(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.arrived = threading.Event()
+        self.program = app.ci_program.CiProgram()
+        files = {
+            u"a.txt": b"one\ntwo needle\nNeedle needle\n",
+            u"sub/b.py": b"x = '\xc3\xa9 needle'\r\n",
+            u"sub/deeper/c.log": b"needle\n",
+            u"sub/.gitignore": b"# Logs.\n*.log\n",
+            u"bin.dat": b"needle\0",
+            u"empty.txt": b"",
+            u".git/config": b"needle\n",
+        }
+        for path, data in files.items():
+            path = os.path.join(self.root, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with io.open(path, "wb") as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def relative(self, path):
+        return os.path.relpath(path, self.root)
+
+    def test_walk(self):
+        self.assertEqual(
+            [self.relative(path) for path in app.project_grep.walk(self.root)],
+            [
+                u"a.txt",
+                u"bin.dat",
+                u"empty.txt",
+                os.path.join(u"sub", u".gitignore"),
+                os.path.join(u"sub", u"b.py"),
+            ],
+        )
+
+    def test_grep_files(self):
+        paths = list(app.project_grep.walk(self.root))
+        results = app.project_grep.grep_files(b"needle", 0, paths)
+        self.assertEqual(
+            [(self.relative(r[0]),) + r[1:] for r in results],
+            [
+                (u"a.txt", 1, 4, u"two needle"),
+                (u"a.txt", 2, 7, u"Needle needle"),
+                (os.path.join(u"sub", u"b.py"), 0, 7, u"x = '\xe9 needle'"),
+            ],
+        )
+        results = app.project_grep.grep_files(b"^needle", re.I | re.M, paths)
+        self.assertEqual(
+            [(self.relative(r[0]),) + r[1:] for r in results],
+            [(u"a.txt", 2, 0, u"Needle needle")],
+        )
+        # The column of a match past the cut off of the line text.
+        path = os.path.join(self.root, u"long.txt")
+        with io.open(path, "wb") as f:
+            f.write(b"\xc3\xa9" * 400 + b"needle\n")
+        results = app.project_grep.grep_files(b"needle", 0, [path])
+        self.assertEqual(results[0][1:3], (0, 400))
+        self.assertEqual(len(results[0][3]), app.project_grep.kMaxLineLength // 2)
+
+    def run_to_completion(self, textBuffer):
+        """Wait for the job reporting to |textBuffer| (started with
+        |self.arrived.set| as its callback) to be done."""
+        while not textBuffer.append_incoming():
+            self.assertTrue(self.arrived.wait(30))
+            self.arrived.clear()
+        return textBuffer
+
+    def search(self, indexDirectory=None):
+        search = app.project_grep.ProjectGrep(
+            self.root, u"needle", re.IGNORECASE, self.arrived.set, indexDirectory
+        )
+        textBuffer = app.text_buffer.GrepResultsBuffer(self.program, search)
+        search.start()
+        self.run_to_completion(textBuffer)
+        lines = textBuffer.parser.data.split(u"\n")
+        self.assertEqual(lines[-1], u"")
+        self.assertEqual(textBuffer.resultCount, len(lines) - 1)
+        return search, sorted(self.relative(line) for line in lines[:-1])
+
+    def update_index(self, indexDirectory):
+        update = app.project_grep.IndexUpdate(
+            self.root, indexDirectory, self.arrived.set
+        )
+        textBuffer = app.text_buffer.IndexReportBuffer(self.program, update)
+        update.start()
+        self.run_to_completion(textBuffer)
+        self.assertIsNone(update.error)
+        self.assertTrue(textBuffer.parser.data.startswith(u"Index of "))
+        return update
+
+    def test_search(self):
+        app.log.shouldWritePrintLog = False
+        try:
+            search, lines = self.search()
+        finally:
+            app.parallel_parse.shut_down()
+        self.assertEqual(search.fileCount, 5)
+        self.assertEqual(search.skippedCount, 0)
+        self.assertEqual(
+            lines,
+            [
+                u"a.txt:2:5: two needle",
+                u"a.txt:3:1: Needle needle",
+                os.path.join(u"sub", u"b.py:1:8: x = '\xe9 needle'"),
+            ],
+        )
+
+    def test_search_error(self):
+        app.log.shouldWritePrintLog = False
+
+        def get_index(indexDirectory, root):
+            raise IOError(u"test")
+
+        oldGetIndex = app.trigram_index.get_index
+        app.trigram_index.get_index = get_index
+        try:
+            # The search is done (with no results) rather than stuck.
+            search, lines = self.search(self.root)
+        finally:
+            app.trigram_index.get_index = oldGetIndex
+            app.parallel_parse.shut_down()
+        self.assertTrue(search.is_done())
+        self.assertEqual(lines, [])
+
+    def test_search_with_index(self):
+        app.log.shouldWritePrintLog = False
+        indexDirectory = tempfile.mkdtemp()
+        try:
+            update = self.update_index(indexDirectory)
+            self.assertEqual((update.fileCount, update.readCount), (5, 5))
+            self.assertGreater(update.indexBytes, 0)
+
+            search, lines = self.search(indexDirectory)
+            # The binary, empty, and .gitignore files have no "needle".
+            self.assertEqual((search.fileCount, search.skippedCount), (2, 3))
+            self.assertEqual(len(lines), 3)
+
+            # A file changed since it was indexed is searched.
+            with io.open(os.path.join(self.root, u"empty.txt"), "wb") as f:
+                f.write(b"needle\n")
+            search, lines = self.search(indexDirectory)
+            self.assertEqual((search.fileCount, search.skippedCount), (3, 2))
+            self.assertIn(u"empty.txt:1:1: needle", lines)
+
+            # The search brings the index up to date (or this update does, if
+            # it gets there first).
+            self.update_index(indexDirectory)
+            index = app.trigram_index.get_index(indexDirectory, self.root)
+            with index.lock:
+                self.assertEqual(
+                    sorted(index.unmatched_files(u"needle", 0)),
+                    [u"bin.dat", os.path.join(u"sub", u".gitignore")],
+                )
+        finally:
+            app.parallel_parse.shut_down()
+            shutil.rmtree(indexDirectory)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import app.render
+
+
+class ScreenGridTestCases(unittest.TestCase):
+    def setUp(self):
+        self.grid = app.render.ScreenGrid()
+        self.screen = [[(u" ", 0)] * 10 for _ in range(3)]
+
+    def paint(self, drawList):
+        """Apply |drawList| to self.screen (a simple model of a terminal)."""
+        for row, col, text, style in drawList:
+            for ch in text:
+                width = 2 if ch in u"こ😀" else 1
+                # Overwriting half of a double wide character blanks the other.
+                if self.screen[row][col][0] is None:
+                    self.screen[row][col - 1] = (u" ", self.screen[row][col - 1][1])
+                if col + width < 10 and self.screen[row][col + width][0] is None:
+                    self.screen[row][col + width] = (
+                        u" ",
+                        self.screen[row][col + width][1],
+                    )
+                self.screen[row][col] = (ch, style)
+                if width == 2:
+                    self.screen[row][col + 1] = (None, style)
+                col += width
+
+    def check(self, drawList):
+        """Draw |drawList| through the grid and compare to drawing all of it.
+
+        Returns:
+          The number of cells the grid drew.
+        """
+        self.paint(self.grid.update(drawList, 3, 10))
+        expected = [list(i) for i in self.screen]
+        self.screen, actual = expected, self.screen
+        self.paint(drawList)
+        self.assertEqual(self.screen, actual)
+        return self.grid.cellCount
+
+    def test_unchanged(self):
+        frame = [(0, 0, u"abcdefghij", 1), (1, 0, u"0123456789", 2)]
+        self.assertEqual(self.check(frame), 20)
+        self.assertEqual(self.check(frame), 0)
+        self.assertEqual(self.grid.update(frame, 3, 10), [])
+        self.assertEqual(self.grid.totalCellCount, 20)
+
+    def test_changed_spans(self):
+        self.check([(0, 0, u"abcdefghij", 1), (1, 0, u"0123456789", 2)])
+        self.assertEqual(
+            self.grid.update(
+                [(0, 0, u"abcDefghij", 1), (1, 0, u"0123456789", 2)], 3, 10
+            ),
+            [(0, 3, u"D", 1)],
+        )
+        # A style change alone is drawn; nearby changes are drawn together.
+        self.assertEqual(
+            self.grid.update([(0, 0, u"abcDefghiJ", 1), (1, 4, u"45", 3)], 3, 10),
+            [(0, 9, u"J", 1), (1, 4, u"45", 3)],
+        )
+        self.assertEqual(
+            self.grid.update([(0, 0, u"Xbc", 1), (0, 3, u"dEf", 1)], 3, 10),
+            [(0, 0, u"XbcdE", 1)],
+        )
+
+    def test_double_wide(self):
+        self.check([(0, 0, u"aこbこ😀de", 1)])
+        # Overwrite half of a double wide character.
+        self.assertEqual(self.check([(0, 2, u"x", 1)]), 2)
+        self.assertEqual(self.check([(0, 0, u"aこbcこ😀d", 1)]), 9)
+        self.check([(0, 7, u"12", 2)])
+        # Half of the character wouldn't fit, so it's drawn as is.
+        self.assertEqual(self.grid.update([(2, 9, u"😀", 2)], 3, 10), [(2, 9, u"😀", 2)])
+        self.check([(1, 2, u"ここここ", 3)])
+
+    def test_control_characters(self):
+        self.check([(0, 0, u"abcdefghij", 1)])
+        frame = [(0, 0, u"ab\tc", 1), (0, 5, u"z", 1)]
+        self.assertEqual(self.grid.update(frame, 3, 10), frame)
+        # The contents of the row are unknown, so all of it is drawn.
+        self.assertEqual(
+            self.grid.update([(0, 0, u"abcdefghij", 1)], 3, 10),
+            [(0, 0, u"abcdefghij", 1)],
+        )
+
+    def test_control_characters_in_order(self):
+        # The highlight (style 9) is drawn over the text (style 1) that has a
+        # control character after it.
+        frame = [(0, 0, u'"str"', 1), (0, 5, u" \x01", 2), (0, 0, u'"str" \x01', 9)]
+        self.assertEqual(self.grid.update(frame, 3, 10), frame)
+
+    def test_resize(self):
+        frame = [(0, 0, u"abcdefghij", 1)]
+        self.assertEqual(self.check(frame), 10)
+        self.grid.update(frame, 4, 10)
+        self.assertEqual(self.grid.cellCount, 10)
+        self.assertEqual(self.grid.update(frame, 4, 10), [])
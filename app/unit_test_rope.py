@@ -0,0 +1,88 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import random
+import unittest
+
+import app.rope
+
+
+class RopeTestCases(unittest.TestCase):
+    def setUp(self):
+        self.oldChunkSize = app.rope.kChunkSize
+        # Use tiny chunks so that the tests cross chunk boundaries.
+        app.rope.kChunkSize = 4
+
+    def tearDown(self):
+        app.rope.kChunkSize = self.oldChunkSize
+
+    def test_empty(self):
+        rope = app.rope.Rope()
+        self.assertEqual(len(rope), 0)
+        self.assertEqual(rope.text(), u"")
+        self.assertEqual(rope.slice(0, 10), u"")
+        self.assertRaises(IndexError, rope.char_at, 0)
+        rope.insert(0, u"abc")
+        self.assertEqual(rope.text(), u"abc")
+        rope.delete(0, 3)
+        self.assertEqual(rope.text(), u"")
+
+    def test_slice_and_char_at(self):
+        text = u"one\ntwo\nthree\nfour 😀 five"
+        rope = app.rope.Rope(text)
+        # Invalidate the flat text cache to exercise the chunk lookups.
+        rope.insert(0, u"")
+        rope.insert(0, u"x")
+        rope.delete(0, 1)
+        self.assertEqual(len(rope), len(text))
+        for begin in range(len(text) + 1):
+            self.assertEqual(rope.slice(begin), text[begin:])
+            for end in range(begin, len(text) + 2):
+                self.assertEqual(rope.slice(begin, end), text[begin:end])
+        rope.insert(0, u"x")
+        rope.delete(0, 1)
+        for i in range(len(text)):
+            self.assertEqual(rope.char_at(i), text[i])
+        self.assertEqual(rope.char_at(-1), text[-1])
+
+    def test_random_edits(self):
+        random.seed(314)
+        text = u"The quick brown fox\njumps over\nthe lazy dog."
+        rope = app.rope.Rope(text)
+        for _ in range(500):
+            if random.random() < 0.5:
+                offset = random.randint(0, len(text))
+                insert = u"ab\ncdefghijk"[: random.randint(1, 12)]
+                text = text[:offset] + insert + text[offset:]
+                rope.insert(offset, insert)
+            else:
+                begin = random.randint(0, len(text))
+                end = random.randint(begin, min(len(text), begin + 12))
+                text = text[:begin] + text[end:]
+                rope.delete(begin, end)
+            self.assertEqual(len(rope), len(text))
+            begin = random.randint(0, len(text))
+            self.assertEqual(rope.slice(begin, begin + 7), text[begin : begin + 7])
+        self.assertEqual(rope.text(), text)
+
+    def test_set_text(self):
+        rope = app.rope.Rope(u"abc")
+        rope.set_text(u"defghijklmnop")
+        self.assertEqual(rope.text(), u"defghijklmnop")
+        rope.delete(2, 11)
+        self.assertEqual(rope.text(), u"deop")
@@ -103,6 +103,41 @@ ends with tab>\t
         )
         self.prg.prefs.editor["lineLimitIndicator"] = lineLimitIndicator
 
+    def test_draw_render_cache(self):
+        renderedRows = []
+
+        def count_render_row():
+            textBuffer = self.prg.programWindow.focusedWindow.textBuffer
+            render_row = textBuffer.render_row
+
+            def counting_render_row(row, *args):
+                renderedRows.append(row)
+                return render_row(row, *args)
+
+            textBuffer.render_row = counting_render_row
+
+        def check_rendered(expected):
+            self.assertEqual(renderedRows, expected)
+            del renderedRows[:]
+
+        self.run_with_fake_inputs(
+            [
+                self.write_text(u"one\ntwo\nthree"),
+                self.display_check(2, 7, [u"one  ", u"two  ", u"three"]),
+                self.call(count_render_row),
+                KEY_UP,
+                self.display_check(2, 7, [u"one  ", u"two  ", u"three"]),
+                # Moving the cursor doesn't render the rows again.
+                self.call(check_rendered, []),
+                u"s",
+                self.display_check(2, 7, [u"one  ", u"twos ", u"three"]),
+                # Only the edited row is rendered.
+                self.call(check_rendered, [1]),
+                CTRL_Q,
+                u"n",
+            ]
+        )
+
     def test_draw_line_endings(self):
         # self.set_movie_mode(True)
         assert self.prg.color.get(u"text", 0) != self.prg.color.get(u"selected", 0)
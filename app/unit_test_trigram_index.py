@@ -0,0 +1,106 @@
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import io
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import app.project_grep
+import app.trigram_index
+
+
+class TrigramIndexTestCases(unittest.TestCase):
+    def setUp(self):
+        self.indexDirectory = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.write(u"a.txt", b"def find_needle():\n")
+        self.write(u"b.txt", b"Haystack only.\n")
+        self.write(u"c.bin", b"needle\0")
+
+    def tearDown(self):
+        shutil.rmtree(self.indexDirectory)
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        with io.open(os.path.join(self.root, name), "wb") as f:
+            f.write(data)
+
+    def stats(self):
+        result = []
+        for name in sorted(os.listdir(self.root)):
+            fileStat = os.stat(os.path.join(self.root, name))
+            result.append((name, fileStat.st_mtime, fileStat.st_size))
+        return result
+
+    def update(self, index):
+        stale = index.stale(self.stats())
+        index.add_segment(app.project_grep.index_files(self.root, stale))
+        index.save()
+        return [entry[0] for entry in stale]
+
+    def test_required_literals(self):
+        literals = app.trigram_index.required_literals
+        self.assertEqual(literals(u"needle", 0), [[u"needle"]])
+        self.assertEqual(literals(u"foo.*bar\\.baz", 0), [[u"foo", u"bar.baz"]])
+        self.assertEqual(literals(u"ab?c+d", 0), [[u"a", u"c", u"d"]])
+        self.assertEqual(literals(u"a(bc|d)e[fg]h", 0), [[u"a", u"e", u"h"]])
+        self.assertEqual(literals(u"\\bfoo\\x41bar", 0), [[u"foo", u"bar"]])
+        self.assertEqual(literals(u"one|two", 0), [[u"one"], [u"two"]])
+        self.assertEqual(literals(u"x{2}y{|z}", 0), [[u"y{"], [u"z}"]])
+        self.assertEqual(literals(u"a b", re.VERBOSE), [[]])
+        self.assertIsNone(app.trigram_index.query_trigrams(u"one|tw", 0))
+
+    def test_unmatched_files(self):
+        index = app.trigram_index.TrigramIndex(self.indexDirectory, self.root)
+        self.assertFalse(index.exists())
+        self.assertEqual(self.update(index), [u"a.txt", u"b.txt", u"c.bin"])
+        self.assertTrue(index.exists())
+        stats = dict((entry[0], entry[1:]) for entry in self.stats())
+        self.assertEqual(
+            index.unmatched_files(u"NEEDLE", re.IGNORECASE),
+            {u"b.txt": stats[u"b.txt"], u"c.bin": stats[u"c.bin"]},
+        )
+        self.assertEqual(
+            sorted(index.unmatched_files(u"find_(needle|pin)", 0)),
+            [u"b.txt", u"c.bin"],
+        )
+        self.assertEqual(
+            sorted(index.unmatched_files(u"hay|only", 0)), [u"a.txt", u"c.bin"]
+        )
+        self.assertEqual(index.unmatched_files(u"n.e", 0), {})
+
+        # Only the new and changed files are read again.
+        self.write(u"b.txt", b"A needle in a haystack.\n")
+        self.write(u"d.txt", b"Nothing to see.\n")
+        os.remove(os.path.join(self.root, u"a.txt"))
+        index = app.trigram_index.TrigramIndex(self.indexDirectory, self.root)
+        self.assertTrue(index.load())
+        self.assertEqual(self.update(index), [u"b.txt", u"d.txt"])
+        self.assertEqual(
+            sorted(index.unmatched_files(u"needle", 0)), [u"c.bin", u"d.txt"]
+        )
+        # The first segment still has a file in use; it's kept.
+        self.assertEqual(sorted(index.segments), [0, 1])
+        self.assertEqual(
+            sorted(os.listdir(index.directory)),
+            [u"0.segment", u"1.segment", u"manifest"],
+        )
+        self.assertGreater(index.size_bytes(), 0)
@@ -81,7 +81,7 @@ class ViewWindow:
             app.log.check_le(row, self.rows)
             app.log.check_le(col, self.cols)
         self.program.backgroundFrame.add_str(
-            self.top + row, self.left + col, text.encode("utf-8"), colorPair
+            self.top + row, self.left + col, text, colorPair
         )
 
     def reattach(self):
@@ -347,7 +347,7 @@ class ViewWindow:
         text = text[: self.cols]
         text = text + u" " * max(0, self.cols - len(text))
         self.program.backgroundFrame.add_str(
-            self.top + self.writeLineRow, self.left, text.encode(u"utf-8"), color
+            self.top + self.writeLineRow, self.left, text, color
         )
         self.writeLineRow += 1
 
@@ -455,11 +455,20 @@ class Window(ActiveWindow):
         """returns whether work is finished (no need to call again)."""
         finished = True
         tb = self.textBuffer
-        if tb is not None and tb.parser.resumeAtRow < tb.parser.row_count():
+        if tb is not None:
+            # The find matches are done first, since they're being looked at.
+            finished = tb.index_matches()
+        if (
+            finished
+            and tb is not None
+            and tb.parser.resumeAtRow < tb.parser.row_count()
+        ):
             tb.parse_document()
             # If a user event came in while parsing, the parsing will be paused
             # (to be resumed after handling the event).
             finished = tb.parser.resumeAtRow >= tb.parser.row_count()
+        if finished and tb is not None:
+            finished = tb.spell_check(0, tb.parser.row_count())
         for child in self.zOrder:
             finished = finished and child.long_time_slice()
         return finished
@@ -468,8 +477,13 @@ class Window(ActiveWindow):
         """returns whether work is finished (no need to call again)."""
         tb = self.textBuffer
         if tb is not None:
+            tb.append_incoming()
             tb.parse_screen_maybe()
-            return tb.parser.resumeAtRow >= tb.parser.row_count()
+            tb.spell_check(self.scrollRow, self.scrollRow + self.rows)
+            # A window of find matches is usually enough to count them before
+            # the frame is drawn; the rest are found in long_time_slice().
+            indexed = tb.index_matches(1)
+            return indexed and tb.parser.resumeAtRow >= tb.parser.row_count()
         return True
 
 
@@ -1001,6 +1015,13 @@ class StatusLine(ViewWindow):
                 tb.cursor_grammar_name(),
                 tb.selection_mode_name(),
             )
+        matchPosition = tb.match_position()
+        if matchPosition is not None:
+            matchNumber, matchCount = matchPosition
+            if matchNumber:
+                rightSide += u" match {:,} of {:,} |".format(matchNumber, matchCount)
+            else:
+                rightSide += u" {:,} matches |".format(matchCount)
         rightSide += u" %4d,%2d | %3d%%,%3d%%" % (
             self.host.textBuffer.penRow + 1,
             self.host.textBuffer.penCol + 1,
@@ -28,6 +28,7 @@ except NameError:
     unicode = str
     unichr = chr
 
+import fcntl
 import inspect
 import os
 import signal
@@ -64,11 +65,33 @@ class error(BaseException):
         BaseException.__init__(self)
 
 
-class FakeInput:
+class FakeInput(object):
     def __init__(self, display):
         self.fakeDisplay = display
+        # A pipe that is ready to read while fake input is available (i.e.
+        # while not waiting for a refresh), standing in for the terminal.
+        self.readyFd, self.readyWriteFd = os.pipe()
+        fcntl.fcntl(self.readyFd, fcntl.F_SETFL, os.O_NONBLOCK)
+        self._waitingForRefresh = True
         self.set_inputs([])
 
+    def close(self):
+        os.close(self.readyFd)
+        os.close(self.readyWriteFd)
+
+    @property
+    def waitingForRefresh(self):
+        return self._waitingForRefresh
+
+    @waitingForRefresh.setter
+    def waitingForRefresh(self, value):
+        if value != self._waitingForRefresh:
+            self._waitingForRefresh = value
+            if value:
+                os.read(self.readyFd, 1)
+            else:
+                os.write(self.readyWriteFd, b"\0")
+
     def set_inputs(self, cmdList):
         self.inputs = cmdList
         self.inputsIndex = -1
@@ -76,7 +99,6 @@ class FakeInput:
         self.tupleIndex = -1
         self.waitingForRefresh = True
         self.isVerbose = False
-        self.bgCounter = 1
         if self.isVerbose:
             print("")
 
@@ -95,14 +117,8 @@ class FakeInput:
     def next(self):
         self.log("start")
         if self.waitingForRefresh:
-            if self.bgCounter == 0:
-                self.bgCounter = 1
-                self.log("    ", self.bgCounter, 0)
-                return 0
-            self.bgCounter -= 1
-            self.log("    ", self.bgCounter, -1)
+            self.log("    ", -1)
             return -1
-        self.bgCounter = 1
         if not self.waitingForRefresh:
             while self.inputsIndex + 1 < len(self.inputs):
                 assert not self.waitingForRefresh
@@ -429,6 +445,8 @@ class StandardScreen(FakeCursesWindow):
         self.cmdCount = -1
         fakeDisplay = FakeDisplay()
         self.fakeDisplay = fakeDisplay
+        if fakeInput is not None:
+            fakeInput.close()
         fakeInput = FakeInput(fakeDisplay)
         self.fakeInput = fakeInput
         self.movie = False
@@ -446,6 +464,10 @@ class StandardScreen(FakeCursesWindow):
     def test_find_text(self, screenText):
         return fakeDisplay.find_text(screenText)
 
+    def test_input_fd(self):
+        """A file descriptor that is ready to read when getch() has input."""
+        return self.fakeInput.readyFd
+
     def test_rendered_command_count(self, cmdCount):
         if self.cmdCount != cmdCount:
             fakeInput.waitingForRefresh = False
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark the editor's hot paths, headless (on the fake curses in
+test_fake/).
+
+The documents are generated (see make_corpora()): a huge file, long lines, CJK
+text, and deeply nested HTML/JS; plus each sample/ file repeated to measure the
+parse throughput of its grammar. The measurements are:
+
+  parse.<corpus>              lexing throughput, MB/s
+  first_paint.<corpus>        start up until the first frame is drawn, ms
+  keystroke.<corpus>.median   a key press until its frame is drawn, ms
+  keystroke.<corpus>.p95
+  find.<corpus>               find through the whole document, ms
+  replace.<corpus>            replace a pattern in the whole document, ms
+  memory.<corpus>             bytes allocated per line of a parsed document
+
+The results are printed and may be written as JSON (--out). With --baseline the
+results are compared against stored results (e.g. benchmark_baseline.json)
+and the exit status is non-zero if any is worse by more than --tolerance.
+Baselines depend on the machine, so compare runs made on the same one.
+
+Usage:
+    tools/benchmark.py [--quick] [--only text] [--out path] [--baseline path]
+        [--tolerance fraction]
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ciEditDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Replace curses with a fake version (as unit_tests.py does).
+sys.path = [os.path.join(ciEditDir, u"test_fake"), ciEditDir] + sys.path
+import curses
+
+import app.ci_program
+import app.curses_util
+import app.log
+import app.parser
+import app.prefs
+import app.text_buffer
+
+# Change this when the meaning of the results changes.
+kFormatVersion = 2
+# The units for which a larger value is better (for the rest, smaller is).
+kHigherIsBetter = (u"MB/s",)
+
+
+def make_corpora(megabytes):
+    """Generate the documents to measure.
+
+    Args:
+      megabytes (float): the approximate size of most of the documents (the
+        huge document is ten times larger).
+
+    Returns:
+      A list of (name, fileName, text, isEditorBenchmark) tuples. The editor
+      benchmarks (first paint, keystrokes, find...) are run on the documents
+      where |isEditorBenchmark| is True; all of them are parsed.
+    """
+    size = int(megabytes * 1e6)
+
+    def repeat(text, length):
+        return text * max(1, length // len(text))
+
+    def read_sample(name):
+        with io.open(os.path.join(ciEditDir, u"sample", name), encoding=u"utf-8") as f:
+            return f.read()
+
+    corpora = []
+    for name in (
+        u"sample.cc",
+        u"sample.go",
+        u"sample.html",
+        u"sample.js",
+        u"sample.py",
+        u"sample.rs",
+    ):
+        extension = name.split(u".")[-1]
+        corpora.append((extension, name, repeat(read_sample(name), size), False))
+    corpora.append(
+        (u"huge", u"huge.cc", repeat(read_sample(u"sample.cc"), size * 10), True)
+    )
+    # Minified script: each line is about 100k characters.
+    script = read_sample(u"sample.js").replace(u"\n", u" ")
+    longLine = repeat(script, 100000) + u"\n"
+    corpora.append((u"long_lines", u"long_lines.js", repeat(longLine, size), True))
+    cjk = (
+        u"中文的文本，包括一些标点符号。 Some ASCII words as well 😀.\n"
+        u"日本語のテキストとカタカナ、ひらがな。\t한국어 텍스트도 있습니다.\n"
+        u"\n"
+    )
+    corpora.append((u"cjk", u"cjk.txt", repeat(cjk, size), True))
+    depth = 200
+    nested = (
+        u"".join(u'%s<div class="d%d">\n' % (u" " * i, i) for i in range(depth))
+        + u"<script>\n"
+        + u"".join(
+            u"%sif (x%d) { f(function() {\n" % (u" " * i, i) for i in range(depth)
+        )
+        + u"".join(u"%s}); }\n" % (u" " * i,) for i in range(depth - 1, -1, -1))
+        + u"</script>\n"
+        + u"".join(u"%s</div>\n" % (u" " * i,) for i in range(depth - 1, -1, -1))
+    )
+    corpora.append((u"nested", u"nested.html", repeat(nested, size), True))
+    return corpora
+
+
+def measure_parse(prefs, fileName, text):
+    """Lex all of |text|. Returns the throughput in MB/s."""
+    grammar = prefs.get_grammar(prefs.get_file_type(fileName))
+    parser = app.parser.Parser(prefs)
+    parser.data = text
+    startTime = time.time()
+    parser.lex_all(grammar)
+    seconds = time.time() - startTime
+    return len(text) / 1e6 / max(seconds, 1e-9)
+
+
+def run_program(path, fakeInputs):
+    """Run the editor on |path| with |fakeInputs| (which must end by quitting).
+
+    Returns:
+      The time the program was started.
+    """
+    startTime = time.time()
+    cursesScreen = curses.StandardScreen()
+    program = app.ci_program.CiProgram()
+    program.set_up_curses(cursesScreen)
+    program.clipboard.set_os_handlers(None, None)
+    cursesScreen.set_fake_inputs(fakeInputs)
+    sys.argv = [u"benchmark", path]
+    # Only open |path|, even when stdin isn't a terminal (reading stdin would
+    # open /dev/tty, which may not exist, and show stdin rather than |path|).
+    program.bufferManager.read_stdin = lambda: None
+    program.run()
+    return startTime
+
+
+def measure_first_paint(path):
+    """The time (in ms) from start up until the first frame is drawn."""
+    marks = []
+
+    def mark(display, cmdIndex):
+        # A function input is called after the prior input has been drawn.
+        marks.append(time.time())
+
+    startTime = run_program(path, [mark, app.curses_util.CTRL_Q, u"n"])
+    return (marks[0] - startTime) * 1000
+
+
+def measure_keystrokes(path, count):
+    """The times (in ms) from key presses until their frames are drawn.
+
+    Returns:
+      (median, 95th percentile) of the times.
+    """
+    marks = []
+
+    def mark(display, cmdIndex):
+        marks.append(time.time())
+
+    keys = (
+        u"a",
+        app.curses_util.KEY_DOWN,
+        u"b",
+        app.curses_util.KEY_RIGHT,
+        app.curses_util.KEY_BACKSPACE1,
+        app.curses_util.KEY_END,
+    )
+    fakeInputs = [mark]
+    for i in range(count):
+        fakeInputs += [keys[i % len(keys)], mark]
+    run_program(path, fakeInputs + [app.curses_util.CTRL_Q, u"n"])
+    durations = sorted(
+        (end - begin) * 1000 for begin, end in zip(marks[:-1], marks[1:])
+    )
+    return (
+        durations[len(durations) // 2],
+        durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+    )
+
+
+class FakeView:
+    def __init__(self):
+        self.cursorWindow = None
+        self.top = 0
+        self.left = 0
+        self.rows = 40
+        self.cols = 120
+        self.scrollRow = 0
+        self.scrollCol = 0
+
+
+def load_text_buffer(program, fileName, text):
+    """Make a fully parsed TextBuffer holding |text|."""
+    textBuffer = app.text_buffer.TextBuffer(program)
+    textBuffer.set_view(FakeView())
+    textBuffer.file_filter(text)
+    textBuffer.set_file_type(program.prefs.get_file_type(fileName))
+    # (parse_document() may stop early in a large document, leaving the rest
+    # to be parsed as rows are used.)
+    textBuffer.parser.lex_all(textBuffer.rootGrammar)
+    return textBuffer
+
+
+def measure_find(textBuffer):
+    """The time (in ms) to search the whole document (for a missing
+    pattern)."""
+    startTime = time.time()
+    textBuffer.find(u"not in the document")
+    return (time.time() - startTime) * 1000
+
+
+def measure_replace(textBuffer):
+    """The time (in ms) to replace a (common) pattern in the whole document,
+    as the substitute command does (including recording the change)."""
+    startTime = time.time()
+    textBuffer.find_replace(u"/e/E/")
+    return (time.time() - startTime) * 1000
+
+
+def measure_memory(program, fileName, text):
+    """Load |text| into a parsed TextBuffer.
+
+    Returns:
+      (textBuffer, the bytes allocated per line to hold it). The |text| itself
+      is allocated before the measurement starts.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        textBuffer = load_text_buffer(program, fileName, text)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return textBuffer, (after - before) / textBuffer.parser.row_count()
+
+
+def run_benchmarks(megabytes, keystrokeCount, only):
+    """Returns a dict of name: {"value": number, "unit": text}."""
+    results = {}
+
+    def record(name, value, unit):
+        results[name] = {u"value": round(value, 3), u"unit": unit}
+        print(u"%-32s %12.3f %s" % (name, value, unit))
+        sys.stdout.flush()
+
+    prefs = app.prefs.Prefs()
+    program = app.ci_program.CiProgram()
+    tempDir = tempfile.mkdtemp()
+    try:
+        for name, fileName, text, isEditorBenchmark in make_corpora(megabytes):
+            if only and only not in name:
+                continue
+            record(u"parse." + name, measure_parse(prefs, fileName, text), u"MB/s")
+            if not isEditorBenchmark:
+                continue
+            path = os.path.join(tempDir, fileName)
+            with io.open(path, u"w", encoding=u"utf-8") as f:
+                f.write(text)
+            record(u"first_paint." + name, measure_first_paint(path), u"ms")
+            median, p95 = measure_keystrokes(path, keystrokeCount)
+            record(u"keystroke.%s.median" % (name,), median, u"ms")
+            record(u"keystroke.%s.p95" % (name,), p95, u"ms")
+            textBuffer, bytesPerLine = measure_memory(program, fileName, text)
+            record(u"memory." + name, bytesPerLine, u"bytes/line")
+            record(u"find." + name, measure_find(textBuffer), u"ms")
+            record(u"replace." + name, measure_replace(textBuffer), u"ms")
+    finally:
+        shutil.rmtree(tempDir)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of each result from the |baseline|.
+
+    Returns:
+      The names of the results that are worse by more than |tolerance|.
+    """
+    regressions = []
+    print(u"\n%-32s %12s %12s" % (u"compared to baseline", u"baseline", u"now"))
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        now = results[name][u"value"]
+        was = baseline[name][u"value"]
+        if was == 0:
+            continue
+        change = (now - was) / was
+        if results[name][u"unit"] in kHigherIsBetter:
+            change = -change
+        isWorse = change > tolerance
+        if isWorse:
+            regressions.append(name)
+        print(
+            u"%-32s %12.3f %12.3f %+7.0f%% %s"
+            % (name, was, now, change * 100, u"WORSE" if isWorse else u"")
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=u"Benchmark the editor on generated documents."
+    )
+    parser.add_argument(
+        u"--quick", action=u"store_true", help=u"use smaller documents"
+    )
+    parser.add_argument(u"--only", help=u"run the corpora with this in the name")
+    parser.add_argument(u"--out", help=u"write the results to this JSON file")
+    parser.add_argument(u"--baseline", help=u"compare to this JSON results file")
+    parser.add_argument(
+        u"--tolerance",
+        type=float,
+        default=0.25,
+        help=u"the fraction worse than the baseline to report as a regression",
+    )
+    args = parser.parse_args()
+    # Keep the log quiet (it's kept in memory).
+    app.log.enabledChannels = {}
+    app.log.shouldWritePrintLog = False
+
+    megabytes = 0.02 if args.quick else 0.25
+    keystrokeCount = 20 if args.quick else 100
+    results = run_benchmarks(megabytes, keystrokeCount, args.only)
+    output = {
+        u"formatVersion": kFormatVersion,
+        u"megabytes": megabytes,
+        u"python": platform.python_version(),
+        u"results": results,
+    }
+    if args.out:
+        with io.open(args.out, u"w", encoding=u"utf-8") as f:
+            f.write(json.dumps(output, indent=2, sort_keys=True) + u"\n")
+    if args.baseline:
+        with io.open(args.baseline, encoding=u"utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get(u"formatVersion") != kFormatVersion:
+            print(u"\nThe baseline was measured differently (see kFormatVersion).")
+            return 2
+        if baseline.get(u"megabytes") != megabytes:
+            print(u"\nThe baseline used other document sizes (see --quick).")
+            return 2
+        if compare(results, baseline[u"results"], args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Report the memory used per parser node.
+
+Compares the columnar ParserNodeList against the prior storage (a Python list
+of (grammar, begin, prior, visual) tuples, with a list of ints for the rows).
+
+Usage:
+    tools/benchmark_parser_memory.py [path [copies]]
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+ciEditDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ciEditDir)
+import app.parser
+import app.prefs
+
+
+def list_of_tuples_bytes(parser):
+    """The bytes allocated to hold the parse as lists of tuples."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = list(parser.parserNodes)
+        rows = list(parser.rows)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert len(nodes) and len(rows)
+    return after - before
+
+
+def columnar_bytes(parser):
+    """The bytes held by the ParserNodeList and row array."""
+    nodes = parser.parserNodes
+    return sum(
+        sys.getsizeof(column)
+        for column in (
+            nodes.grammarIds,
+            nodes.begins,
+            nodes.priors,
+            nodes.visuals,
+            parser.rows,
+        )
+    )
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "sample/sample.cc"
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    prefs = app.prefs.Prefs()
+    with io.open(os.path.join(ciEditDir, path), encoding=u"utf-8") as f:
+        data = f.read() * copies
+    grammar = prefs.get_grammar(prefs.get_file_type(path))
+    parser = app.parser.Parser(prefs)
+    startTime = time.time()
+    parser.parse(None, data, grammar, 0, sys.maxsize)
+    parseTime = time.time() - startTime
+    nodeCount = len(parser.parserNodes)
+    print("document:", path, "x", copies)
+    print(
+        "rows: %d, nodes: %d, parse: %.2fs" % (len(parser.rows), nodeCount, parseTime)
+    )
+    before = list_of_tuples_bytes(parser)
+    after = columnar_bytes(parser)
+    print("%-16s %12s %14s" % ("storage", "bytes", "bytes per node"))
+    print("%-16s %12d %14.1f" % ("list of tuples", before, before / nodeCount))
+    print("%-16s %12d %14.1f" % ("columnar", after, after / nodeCount))
+
+
+if __name__ == "__main__":
+    main()
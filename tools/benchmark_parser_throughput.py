@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Report the parser (lexer) throughput in MB/s.
+
+Each file in sample/ is lexed, then a synthetic input of |megabytes| MB is built
+(by repeating a sample file) and lexed.
+
+Usage:
+    tools/benchmark_parser_throughput.py [megabytes [sample_file]]
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import time
+
+ciEditDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ciEditDir)
+import app.parser
+import app.prefs
+
+
+def lex(prefs, data, grammar):
+    """Lex all of |data|. Returns the time taken, in seconds."""
+    parser = app.parser.Parser(prefs)
+    parser.parse(None, u"", grammar, 0, 0)
+    parser.data = data
+    startTime = time.time()
+    # Drive the lexer directly, as a background parse would (but without the
+    # line identification that parse() does for rows that are not yet lexed).
+    parser.pauseAtRow = sys.maxsize
+    while True:
+        resumeAtRow = parser.resumeAtRow
+        parser._begin_parsing_at(resumeAtRow)
+        parser._build_grammar_list(None)
+        if parser.resumeAtRow == resumeAtRow:
+            break
+    return time.time() - startTime
+
+
+def report(prefs, label, data, grammar, runs):
+    seconds = min(lex(prefs, data, grammar) for _ in range(runs))
+    megabytes = len(data) / 1e6
+    print(
+        "%-28s %-10s %9.3f MB %8.2f s %8.2f MB/s"
+        % (label, grammar["name"], megabytes, seconds, megabytes / seconds)
+    )
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+    synthetic = sys.argv[2] if len(sys.argv) > 2 else u"sample/sample.cc"
+    prefs = app.prefs.Prefs()
+    sampleDir = os.path.join(ciEditDir, u"sample")
+    for name in sorted(os.listdir(sampleDir)):
+        path = os.path.join(sampleDir, name)
+        grammar = prefs.get_grammar(prefs.get_file_type(path))
+        if grammar is None or not os.path.isfile(path):
+            continue
+        with io.open(path, encoding=u"utf-8") as f:
+            try:
+                data = f.read()
+            except UnicodeDecodeError:
+                continue
+        report(prefs, u"sample/" + name, data, grammar, 3)
+    path = os.path.join(ciEditDir, synthetic)
+    grammar = prefs.get_grammar(prefs.get_file_type(path))
+    with io.open(path, encoding=u"utf-8") as f:
+        data = f.read()
+    data *= max(1, int(megabytes * 1e6 / len(data)))
+    report(prefs, u"synthetic " + synthetic, data, grammar, 1)
+
+
+if __name__ == "__main__":
+    main()
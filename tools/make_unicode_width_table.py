@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Generate app/unicode_width_table.py from the unicodedata module.
+
+The table lists the ranges of characters with an East Asian Width of wide (W)
+or full width (F). See app.curses_util.char_width().
+
+Usage:
+    tools/make_unicode_width_table.py
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import unicodedata
+
+ciEditDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+outPath = os.path.join(ciEditDir, u"app", u"unicode_width_table.py")
+
+kHeader = u'''\
+# Copyright 2026 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Ranges of double width characters (see app.curses_util.char_width()).
+
+Generated by tools/make_unicode_width_table.py; do not edit by hand.
+"""
+
+# The unicodedata version the table was made from.
+kUnidataVersion = u"{version}"
+'''
+
+
+def east_asian_width_ranges(widthClass, assignedOnly):
+    """Get the (first, last) code point ranges having |widthClass|."""
+    ranges = []
+    for code in range(sys.maxunicode + 1):
+        ch = chr(code)
+        if unicodedata.east_asian_width(ch) != widthClass:
+            continue
+        if assignedOnly and unicodedata.category(ch) == u"Cn":
+            continue
+        if ranges and ranges[-1][1] == code - 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    return ranges
+
+
+def write_ranges(out, name, comment, ranges):
+    out.write(u"\n%s\n%s = (\n" % (comment, name))
+    for first, last in ranges:
+        out.write(u"    (0x%04X, 0x%04X),\n" % (first, last))
+    out.write(u")\n")
+
+
+def main():
+    with io.open(outPath, u"w", encoding=u"utf-8") as out:
+        out.write(kHeader.format(version=unicodedata.unidata_version))
+        write_ranges(
+            out,
+            u"kWideRanges",
+            u"# The (first, last) code points of wide (W) characters.",
+            east_asian_width_ranges(u"W", False),
+        )
+        write_ranges(
+            out,
+            u"kFullWidthRanges",
+            u"# The (first, last) code points of full width (F) characters.",
+            # Some versions of unicodedata report unassigned code points as
+            # full width.
+            east_asian_width_ranges(u"F", True),
+        )
+    print(u"wrote", outPath)
+
+
+if __name__ == "__main__":
+    main()
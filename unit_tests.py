@@ -50,21 +50,29 @@ import app.unit_test_brace_matching
 import app.unit_test_buffer_file
 import app.unit_test_copy_paste
 import app.unit_test_curses_util
+import app.unit_test_event_loop
 import app.unit_test_execute_prompt
 import app.unit_test_file_manager
 import app.unit_test_find_window
 import app.unit_test_intention
 import app.unit_test_line_buffer
+import app.unit_test_literal_pattern
+import app.unit_test_match_index
 import app.unit_test_misspellings
+import app.unit_test_parse_cache
 import app.unit_test_parser
 import app.unit_test_performance
 import app.unit_test_prediction_window
 import app.unit_test_prefs
+import app.unit_test_project_grep
 import app.unit_test_regex
+import app.unit_test_render
+import app.unit_test_rope
 import app.unit_test_selectable
 import app.unit_test_startup
 import app.unit_test_string
 import app.unit_test_text_buffer
+import app.unit_test_trigram_index
 import app.unit_test_ui
 import app.unit_test_undo_redo
 
@@ -82,21 +90,29 @@ TESTS = {
     "buffer_file": app.unit_test_buffer_file.pathRowColumnTestCases,
     "copy_paste": app.unit_test_copy_paste.CopyPasteTestCases,
     "curses_util": app.unit_test_curses_util.CursesUtilTestCases,
+    "event_loop": app.unit_test_event_loop.EventLoopTestCases,
     "file_manager": app.unit_test_file_manager.FileManagerTestCases,
     "find": app.unit_test_find_window.FindWindowTestCases,
     "execute": app.unit_test_execute_prompt.ExecutePromptTestCases,
     "intention": app.unit_test_intention.IntentionTestCases,
     "line_buffer": app.unit_test_line_buffer.LineBufferTestCases,
+    "literal_pattern": app.unit_test_literal_pattern.LiteralPatternTestCases,
+    "match_index": app.unit_test_match_index.MatchIndexTestCases,
     "misspellings": app.unit_test_misspellings.MisspellingsTestCases,
+    "parse_cache": app.unit_test_parse_cache.ParseCacheTestCases,
     "parser": app.unit_test_parser.ParserTestCases,
     "performance": app.unit_test_performance.PerformanceTestCases,
     "prediction": app.unit_test_prediction_window.PredictionWindowTestCases,
     "prefs": app.unit_test_prefs.PrefsTestCases,
+    "project_grep": app.unit_test_project_grep.ProjectGrepTestCases,
     "regex": app.unit_test_regex.RegexTestCases,
+    "render": app.unit_test_render.ScreenGridTestCases,
+    "rope": app.unit_test_rope.RopeTestCases,
     "selectable": app.unit_test_selectable.SelectableTestCases,
     "startup": app.unit_test_startup.StartupTestCases,
     "string": app.unit_test_string.StringTestCases,
     "draw": app.unit_test_text_buffer.DrawTestCases,
+    "trigram_index": app.unit_test_trigram_index.TrigramIndexTestCases,
     "ui": app.unit_test_ui.UiBasicsTestCases,
     "undo": app.unit_test_undo_redo.UndoRedoTestCases,
 }